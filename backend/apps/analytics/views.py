@@ -8,6 +8,7 @@ from django.db.models import Count, Sum,Q
 from django.utils import timezone 
 from datetime import datetime, timedelta
 from apps.reports.models import CSVFile, Report
+from apps.reports.utils.cache_manager import ReportCacheManager
 import logging
 
 from .models import UserActivity
@@ -179,12 +180,14 @@ class AnalyticsViewSet(ViewSet):
             user = request.user
             csv_id = request.query_params.get('csv_id')
             
+            # analysis_data se sirve desde la caché por su huella (sin leer el JSON de la BD)
+            csv_files = CSVFile.objects.defer('analysis_data')
             if csv_id:
                 # Obtener CSV específico
-                csv_file = CSVFile.objects.get(id=csv_id, user=user)
+                csv_file = csv_files.get(id=csv_id, user=user)
             else:
                 # Obtener el CSV más reciente
-                csv_file = CSVFile.objects.filter(
+                csv_file = csv_files.filter(
                     user=user,
                     processing_status='completed'
                 ).order_by('-processed_date').first()
@@ -194,14 +197,14 @@ class AnalyticsViewSet(ViewSet):
                     'error': 'No se encontraron archivos CSV procesados'
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            if not csv_file.analysis_data:
+            # Devolver análisis completo
+            analysis_data = ReportCacheManager.get_analysis_payload(csv_file)
+            
+            if not analysis_data:
                 return Response({
                     'error': 'El archivo CSV no tiene análisis disponible'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Devolver análisis completo
-            analysis_data = csv_file.analysis_data
-            
             response_data = {
                 'csv_info': {
                     'id': str(csv_file.id),
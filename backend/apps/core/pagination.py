@@ -0,0 +1,129 @@
+# apps/core/pagination.py
+"""
+Paginación por cursor (keyset) sobre (campo de orden, id).
+
+En vez de OFFSET (que recorre y descarta todas las filas anteriores) cada
+página filtra a partir de la última fila de la anterior:
+
+    WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC LIMIT n
+
+El coste es O(página) sea cual sea la posición, y el orden es estable aunque
+varias filas compartan fecha o se inserten filas nuevas mientras se pagina.
+El cursor es opaco para el cliente: sigue las URLs next/previous.
+
+Sin ?limit= la página tiene PAGE_SIZE filas. La respuesta no incluye un total
+(contarlo recorrería todas las filas): hay más páginas mientras next no sea null.
+"""
+import json
+import base64
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Subclases: ordering_fields (campos no nulos por los que se puede ordenar)
+    y default_ordering ('-campo' para descendente). El desempate es siempre id.
+    """
+    ordering_fields = ('created_at',)
+    default_ordering = '-created_at'
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    # 'limit' es el parámetro que ya usa el frontend
+    page_size_query_param = 'limit'
+    ordering_query_param = 'ordering'
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request):
+        """(campo, descendente) pedido, si está permitido"""
+        ordering = request.query_params.get(self.ordering_query_param) or self.default_ordering
+        if ordering.lstrip('-') not in self.ordering_fields:
+            ordering = self.default_ordering
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    def encode_cursor(self, row, reverse: bool) -> str:
+        payload = {
+            'v': self.field.value_to_string(row),
+            'id': str(row.pk),
+            'r': int(reverse),
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            return self.field.to_python(payload['v']), payload['id'], bool(payload['r'])
+        except Exception:
+            raise NotFound('Cursor inválido')
+
+    def order_queryset(self, queryset, request, reverse: bool = False):
+        """queryset en el orden pedido, con id como desempate (invertido si reverse)"""
+        field_name, descending = self.get_ordering(request)
+        prefix = '-' if descending != reverse else ''
+        return queryset.order_by(f'{prefix}{field_name}', f'{prefix}pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Filas de la página pedida (la primera si no hay ?cursor=)"""
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        field_name, descending = self.get_ordering(request)
+        self.field = queryset.model._meta.get_field(field_name)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        value, pk, reverse = self.decode_cursor(cursor) if cursor else (None, None, False)
+
+        # Página anterior: se recorre en sentido contrario y se invierte el resultado
+        walk_descending = descending != reverse
+        queryset = self.order_queryset(queryset, request, reverse)
+
+        if cursor:
+            lookup = 'lt' if walk_descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field_name}__{lookup}': value}) |
+                Q(**{field_name: value, f'pk__{lookup}': pk})
+            )
+
+        # Una fila de más indica si hay otra página en ese sentido
+        rows = list(queryset[:self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else bool(cursor)
+        self.has_previous = bool(cursor) if not reverse else has_more
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_row, False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.first_row is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.first_row, True))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        })
@@ -1,5 +1,9 @@
 # apps/reports/analyzers/__init__.py
 from .csv_analyzer import AzureAdvisorCSVAnalyzer
 from .base_analyzer import BaseAnalyzer
+from .advisor_engine import AdvisorAggregates, aggregate_advisor_csv
+from .advisor_schema import ADVISOR_DTYPES, read_advisor_csv
+from .advisor_delta import compute_advisor_delta, diff_advisor_frames
 
-__all__ = ['AzureAdvisorCSVAnalyzer', 'BaseAnalyzer']
\ No newline at end of file
+__all__ = ['AzureAdvisorCSVAnalyzer', 'BaseAnalyzer', 'AdvisorAggregates', 'aggregate_advisor_csv',
+           'ADVISOR_DTYPES', 'read_advisor_csv', 'compute_advisor_delta', 'diff_advisor_frames']
\ No newline at end of file
@@ -0,0 +1,304 @@
+# backend/apps/reports/analyzers/advisor_delta.py
+"""
+Delta entre dos exports de Azure Advisor del mismo cliente.
+
+Cada recomendación se identifica por (Subscription ID, Resource Name,
+Recommendation). Comparando los snapshots Parquet de ambos CSVFile se obtienen
+las recomendaciones nuevas, resueltas y sin cambios, y los agregados del
+export nuevo se derivan de los del anterior sumando/restando solo las filas
+que cambiaron. El resultado es un resumen compacto (analysis_data['delta'])
+que los generadores muestran como "qué cambió desde el último análisis".
+"""
+import logging
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+from typing import Dict, Any, List, Optional
+from .advisor_engine import AdvisorAggregates, aggregate_advisor_snapshot, get_stored_aggregates
+from .advisor_snapshot import load_advisor_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Identidad de una recomendación entre exports
+DELTA_KEY_COLUMNS = ['Subscription ID', 'Resource Name', 'Recommendation']
+
+# Atributos comparados en las recomendaciones presentes en ambos exports
+DELTA_VALUE_COLUMNS = [
+    'Category',
+    'Business Impact',
+    'Type',
+    'Resource Group',
+    'Potential Annual Cost Savings',
+    'Potential Cost Savings Currency',
+]
+
+DELTA_COLUMNS = DELTA_KEY_COLUMNS + DELTA_VALUE_COLUMNS
+
+# Versión del formato serializado en analysis_data['delta']
+DELTA_VERSION = 1
+
+# Recomendaciones nuevas/resueltas que se listan en el delta
+DELTA_TOP_ITEMS = getattr(settings, 'CSV_DELTA_TOP_ITEMS', 20)
+
+# Calcular el delta contra el export anterior al terminar cada análisis
+DELTA_ON_UPLOAD = getattr(settings, 'CSV_DELTA_ON_UPLOAD', True)
+
+IMPACT_ORDER = {'High': 0, 'Medium': 1, 'Low': 2}
+
+
+def _as_text(frame: pd.DataFrame, column: str) -> np.ndarray:
+    """Valores de una columna como texto comparable (ausente -> '')"""
+    if column not in frame.columns:
+        return np.full(len(frame), '', dtype=object)
+    return frame[column].astype('string').fillna('').to_numpy(dtype=object)
+
+
+def _keys(frame: pd.DataFrame, row_column: str) -> pd.DataFrame:
+    """
+    Claves de las filas; las claves repetidas se distinguen por su número de
+    aparición para comparar los exports como multiconjuntos
+    """
+    keys = pd.DataFrame({column: _as_text(frame, column) for column in DELTA_KEY_COLUMNS})
+    keys['_occurrence'] = keys.groupby(DELTA_KEY_COLUMNS, sort=False).cumcount()
+    keys[row_column] = np.arange(len(frame))
+    return keys
+
+
+def _aggregate(frame: pd.DataFrame, rows: np.ndarray) -> AdvisorAggregates:
+    aggregates = AdvisorAggregates()
+    if len(rows):
+        aggregates.update(frame.iloc[rows])
+    return aggregates
+
+
+def _items(frame: pd.DataFrame, rows: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+    """Recomendaciones más relevantes (mayor impacto primero) en formato compacto"""
+    if not len(rows) or not limit:
+        return []
+    subset = frame.iloc[rows]
+    impact = pd.Series(_as_text(subset, 'Business Impact'), index=subset.index)
+    order = impact.map(IMPACT_ORDER).fillna(len(IMPACT_ORDER)).sort_values(kind='stable').index[:limit]
+    subset = subset.loc[order]
+
+    columns = {
+        'subscription_id': 'Subscription ID',
+        'resource_name': 'Resource Name',
+        'recommendation': 'Recommendation',
+        'category': 'Category',
+        'impact': 'Business Impact',
+        'resource_type': 'Type',
+    }
+    values = {key: _as_text(subset, column) for key, column in columns.items()}
+    return [{key: values[key][i] for key in columns} for i in range(len(subset))]
+
+
+class AdvisorDelta:
+    """
+    Diferencia entre dos exports de Advisor
+
+    added/resolved: agregados de las recomendaciones nuevas y resueltas.
+    changed_before/changed_after: las recomendaciones presentes en ambos con
+    algún atributo distinto (impacto, ahorro...), en su versión anterior y nueva.
+    """
+
+    def __init__(self, added: AdvisorAggregates, resolved: AdvisorAggregates,
+                 changed_before: AdvisorAggregates, changed_after: AdvisorAggregates,
+                 unchanged_count: int, current_unique_resources: int,
+                 current_unique_resource_groups: int,
+                 top_added: List[Dict[str, Any]], top_resolved: List[Dict[str, Any]]):
+        self.added = added
+        self.resolved = resolved
+        self.changed_before = changed_before
+        self.changed_after = changed_after
+        self.unchanged_count = unchanged_count
+        self.current_unique_resources = current_unique_resources
+        self.current_unique_resource_groups = current_unique_resource_groups
+        self.top_added = top_added
+        self.top_resolved = top_resolved
+
+    @property
+    def changed_count(self) -> int:
+        return self.changed_after.rows_read
+
+    def apply(self, previous: AdvisorAggregates) -> AdvisorAggregates:
+        """Agregados del export nuevo a partir de los del anterior (sin recorrer las filas sin cambios)"""
+        current = previous.copy()
+        current.merge(self.added)
+        current.merge(self.changed_after)
+        current.merge(self.resolved, sign=-1)
+        current.merge(self.changed_before, sign=-1)
+        current._unique_resources = self.current_unique_resources
+        current._unique_resource_groups = self.current_unique_resource_groups
+        return current
+
+    def to_dict(self, previous: AdvisorAggregates, current: AdvisorAggregates) -> Dict[str, Any]:
+        """Resumen compacto y serializable en JSON"""
+        def by(index_counts_added, index_counts_resolved):
+            keys = list(dict.fromkeys(list(index_counts_added) + list(index_counts_resolved)))
+            return {
+                key: {'added': index_counts_added.get(key, 0), 'resolved': index_counts_resolved.get(key, 0)}
+                for key in keys
+            }
+
+        return {
+            'version': DELTA_VERSION,
+            'key_columns': DELTA_KEY_COLUMNS,
+            'counts': {
+                'added': self.added.rows_read,
+                'resolved': self.resolved.rows_read,
+                'unchanged': self.unchanged_count,
+                'changed': self.changed_count,
+                'previous_total': previous.rows_read,
+                'current_total': current.rows_read,
+            },
+            'by_category': by(self.added.category_counts, self.resolved.category_counts),
+            'by_impact': by(self.added.impact_counts, self.resolved.impact_counts),
+            'annual_savings': {
+                'added': round(self.added.annual_savings_total, 2),
+                'resolved': round(self.resolved.annual_savings_total, 2),
+                'previous': round(previous.annual_savings_total, 2),
+                'current': round(current.annual_savings_total, 2),
+                'net_change': round(current.annual_savings_total - previous.annual_savings_total, 2),
+                'currency': current.main_currency,
+            },
+            'top_added': self.top_added,
+            'top_resolved': self.top_resolved,
+        }
+
+
+def diff_advisor_frames(previous: pd.DataFrame, current: pd.DataFrame,
+                        top_items: int = DELTA_TOP_ITEMS) -> AdvisorDelta:
+    """
+    Comparar dos exports (DataFrames con DELTA_COLUMNS)
+
+    Las claves se cruzan con un merge; solo las filas nuevas, resueltas o
+    modificadas pasan por el motor de agregación.
+    """
+    previous = previous.reset_index(drop=True)
+    current = current.reset_index(drop=True)
+
+    merged = _keys(previous, '_previous_row').merge(
+        _keys(current, '_current_row'),
+        on=DELTA_KEY_COLUMNS + ['_occurrence'],
+        how='outer',
+        indicator=True,
+        sort=False
+    )
+    state = merged['_merge']
+    resolved_rows = merged.loc[state == 'left_only', '_previous_row'].to_numpy(dtype=np.int64)
+    added_rows = merged.loc[state == 'right_only', '_current_row'].to_numpy(dtype=np.int64)
+    matched = merged[state == 'both']
+    matched_previous = matched['_previous_row'].to_numpy(dtype=np.int64)
+    matched_current = matched['_current_row'].to_numpy(dtype=np.int64)
+
+    # Recomendaciones presentes en ambos exports con algún atributo distinto
+    differs = np.zeros(len(matched), dtype=bool)
+    for column in DELTA_VALUE_COLUMNS:
+        differs |= _as_text(previous, column)[matched_previous] != _as_text(current, column)[matched_current]
+
+    # Recursos únicos del export nuevo (sobre filas con categoría, como el motor)
+    with_category = current[current['Category'].notna()] if 'Category' in current.columns else current
+    unique_resources = int(with_category['Resource Name'].nunique()) if 'Resource Name' in current.columns else 0
+    unique_groups = int(with_category['Resource Group'].nunique()) if 'Resource Group' in current.columns else 0
+
+    return AdvisorDelta(
+        added=_aggregate(current, added_rows),
+        resolved=_aggregate(previous, resolved_rows),
+        changed_before=_aggregate(previous, matched_previous[differs]),
+        changed_after=_aggregate(current, matched_current[differs]),
+        unchanged_count=int((~differs).sum()),
+        current_unique_resources=unique_resources,
+        current_unique_resource_groups=unique_groups,
+        top_added=_items(current, added_rows, top_items),
+        top_resolved=_items(previous, resolved_rows, top_items),
+    )
+
+
+def find_previous_csv(csv_file):
+    """Último CSVFile procesado del mismo usuario anterior a csv_file"""
+    from apps.reports.models import CSVFile
+    return CSVFile.objects.filter(
+        user_id=csv_file.user_id,
+        processing_status='completed',
+        upload_date__lt=csv_file.upload_date
+    ).exclude(id=csv_file.id).order_by('-upload_date').first()
+
+
+def compute_advisor_delta(csv_file, previous=None) -> Optional[Dict[str, Any]]:
+    """
+    Calcular el delta de csv_file contra previous (por defecto el export anterior)
+
+    Returns:
+        Dict con el delta (ver AdvisorDelta.to_dict) o None si no hay export
+        anterior o falta alguno de los snapshots
+    """
+    previous = previous or find_previous_csv(csv_file)
+    if previous is None:
+        return None
+
+    previous_frame = load_advisor_snapshot(previous.id, DELTA_COLUMNS)
+    current_frame = load_advisor_snapshot(csv_file.id, DELTA_COLUMNS)
+    if previous_frame is None or current_frame is None:
+        logger.warning(f"Delta no disponible {previous.id} -> {csv_file.id}: falta el snapshot")
+        return None
+
+    previous_aggregates = get_stored_aggregates(previous.analysis_data) or aggregate_advisor_snapshot(previous.id)
+    if previous_aggregates is None:
+        return None
+
+    delta = diff_advisor_frames(previous_frame, current_frame)
+    current_aggregates = delta.apply(previous_aggregates)
+    current_aggregates.columns = (
+        getattr(get_stored_aggregates(csv_file.analysis_data), 'columns', None) or previous_aggregates.columns
+    )
+
+    result = delta.to_dict(previous_aggregates, current_aggregates)
+    result.update({
+        'previous_file_id': str(previous.id),
+        'previous_filename': previous.original_filename,
+        'previous_upload_date': previous.upload_date.isoformat(),
+        'computed_at': timezone.now().isoformat(),
+        'aggregates': current_aggregates.to_dict(),
+    })
+
+    counts = result['counts']
+    logger.info(f"Delta {previous.id} -> {csv_file.id}: +{counts['added']} -{counts['resolved']} "
+                f"={counts['unchanged']} ~{counts['changed']}")
+    return result
+
+
+def attach_advisor_delta(csv_file, previous=None) -> Optional[Dict[str, Any]]:
+    """
+    Calcular el delta y guardarlo en csv_file.analysis_data['delta']. Si el
+    análisis no tiene agregados del motor se completan con los derivados del
+    delta en lugar de volver a recorrer el archivo. Nunca interrumpe el flujo
+    que lo llama.
+    """
+    try:
+        result = compute_advisor_delta(csv_file, previous)
+        if result is None:
+            return None
+
+        aggregates = result.pop('aggregates')
+        analysis_data = dict(csv_file.analysis_data or {})
+        analysis_data['delta'] = result
+        if get_stored_aggregates(analysis_data) is None:
+            analysis_data['aggregates'] = aggregates
+        csv_file.analysis_data = analysis_data
+        csv_file.save(update_fields=['analysis_data'])
+        return result
+
+    except Exception as e:
+        logger.error(f"Error calculando el delta de {csv_file.id}: {e}")
+        return None
+
+
+def get_stored_delta(analysis_data: Optional[Dict[str, Any]], previous_id=None) -> Optional[Dict[str, Any]]:
+    """Delta guardado en analysis_data, si es compatible (y contra previous_id, si se indica)"""
+    delta = (analysis_data or {}).get('delta')
+    if not delta or delta.get('version') != DELTA_VERSION:
+        return None
+    if previous_id is not None and delta.get('previous_file_id') != str(previous_id):
+        return None
+    return delta
@@ -0,0 +1,310 @@
+# backend/apps/reports/analyzers/advisor_engine.py
+"""
+Motor de agregación único para CSV de Azure Advisor.
+
+Parsea el archivo una sola vez (en chunks) y calcula todas las métricas en una
+pasada agrupada. Los analizadores (analyze_csv_content, AzureCSVAnalyzer y el
+fallback de EnhancedHTMLReportGenerator) construyen sus vistas a partir de
+AdvisorAggregates en lugar de volver a leer el CSV.
+"""
+import os
+import pandas as pd
+from collections import Counter
+from django.conf import settings
+import logging
+from typing import Callable, Dict, List, Any, Optional, Union, IO
+from .savings_parser import normalize_savings
+from .advisor_schema import ADVISOR_COLUMNS, ColumnSelector, ENGINE_COLUMNS, read_advisor_csv
+from .advisor_snapshot import PYARROW_AVAILABLE, AdvisorSnapshotWriter, iter_advisor_snapshot, snapshot_exists
+
+logger = logging.getLogger(__name__)
+
+# Filas por chunk; la memoria pico queda acotada por este valor
+DEFAULT_CHUNK_SIZE = getattr(settings, 'CSV_ANALYSIS_CHUNK_SIZE', 50000)
+
+# Columnas de la pasada agrupada
+GROUP_COLUMNS = ['Category', 'Business Impact', 'Type']
+
+# Versión del formato serializado en analysis_data['aggregates']
+AGGREGATES_VERSION = 1
+
+
+def _clean_key(value):
+    """Normalizar claves de grupo (NaN -> None) para que sean serializables"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+class AdvisorAggregates:
+    """
+    Agregados de un CSV de Azure Advisor calculados en una sola pasada.
+
+    group_counts guarda el número de filas por (Category, Business Impact, Type);
+    los conteos por columna se derivan de ahí sin recorrer de nuevo los datos.
+    """
+
+    def __init__(self):
+        self.columns: List[str] = []
+        self.rows_read = 0
+        self.group_counts: Counter = Counter()
+        self.currency_counts: Counter = Counter()
+        self.annual_savings_total = 0.0
+        self.rows_with_savings = 0
+        self.savings_by_currency: Counter = Counter()
+        self._resource_names = set()
+        self._resource_groups = set()
+        self._unique_resources: Optional[int] = None
+        self._unique_resource_groups: Optional[int] = None
+
+    # -----------------------------------------
+    # Acumulación
+    # -----------------------------------------
+
+    def update(self, chunk: pd.DataFrame):
+        """Incorporar un chunk a los agregados"""
+        if not self.columns:
+            self.columns = list(chunk.columns)
+        self.rows_read += len(chunk)
+
+        # Pasada agrupada: un solo groupby por chunk para categoría, impacto y tipo
+        group_columns = [c for c in GROUP_COLUMNS if c in chunk.columns]
+        if group_columns:
+            sizes = chunk.groupby(group_columns, dropna=False, sort=False, observed=True).size()
+            for key, count in sizes.items():
+                key = key if isinstance(key, tuple) else (key,)
+                values = dict(zip(group_columns, key))
+                group_key = tuple(_clean_key(values.get(c)) for c in GROUP_COLUMNS)
+                self.group_counts[group_key] += int(count)
+
+        # Recursos únicos (sobre filas con categoría, igual que el análisis principal;
+        # los vacíos no cuentan, como en nunique())
+        with_category = chunk[chunk['Category'].notna()] if 'Category' in chunk.columns else chunk
+        if 'Resource Name' in chunk.columns:
+            self._resource_names.update(_clean_key(v) for v in with_category['Resource Name'].dropna().unique())
+        if 'Resource Group' in chunk.columns:
+            self._resource_groups.update(_clean_key(v) for v in with_category['Resource Group'].dropna().unique())
+
+        currencies = chunk['Potential Cost Savings Currency'] if 'Potential Cost Savings Currency' in chunk.columns else None
+        if 'Potential Annual Cost Savings' in chunk.columns:
+            savings = normalize_savings(chunk['Potential Annual Cost Savings'], currencies)
+            self.annual_savings_total += float(savings['amount'].sum())
+            self.rows_with_savings += int(len(savings))
+            by_currency = savings.groupby('currency', sort=False)['amount'].sum()
+            self.savings_by_currency.update({str(k): float(v) for k, v in by_currency.items()})
+
+        if currencies is not None:
+            # Con dtype category value_counts incluye categorías sin filas en el chunk
+            self.currency_counts.update({str(k): int(v) for k, v in currencies.value_counts().items() if v})
+
+    def merge(self, other: 'AdvisorAggregates', sign: int = 1):
+        """
+        Sumar (sign=1) o restar (sign=-1) los conteos y ahorros de otros agregados.
+        Los recursos únicos no son aditivos: quien combine agregados debe fijarlos aparte.
+        """
+        self.rows_read += sign * other.rows_read
+        self.annual_savings_total += sign * other.annual_savings_total
+        self.rows_with_savings += sign * other.rows_with_savings
+        for target, source in ((self.group_counts, other.group_counts),
+                               (self.currency_counts, other.currency_counts),
+                               (self.savings_by_currency, other.savings_by_currency)):
+            for key, value in source.items():
+                target[key] += sign * value
+
+        # Claves que quedan a cero tras restar (con tolerancia para los importes)
+        self.group_counts = Counter({k: v for k, v in self.group_counts.items() if v > 0})
+        self.currency_counts = Counter({k: v for k, v in self.currency_counts.items() if v > 0})
+        self.savings_by_currency = Counter({k: v for k, v in self.savings_by_currency.items() if abs(v) >= 0.005})
+
+    def copy(self) -> 'AdvisorAggregates':
+        return AdvisorAggregates.from_dict(self.to_dict())
+
+    # -----------------------------------------
+    # Vistas derivadas
+    # -----------------------------------------
+
+    def _counts_by(self, index: int, only_with_category: bool) -> Dict[str, int]:
+        counts = Counter()
+        for key, count in self.group_counts.items():
+            if only_with_category and key[0] is None:
+                continue
+            if key[index] is not None:
+                counts[key[index]] += count
+        return {k: v for k, v in counts.most_common()}
+
+    @property
+    def has_category(self) -> bool:
+        return 'Category' in self.columns
+
+    @property
+    def total_actions(self) -> int:
+        """Filas con Category informada"""
+        return sum(count for key, count in self.group_counts.items() if key[0] is not None)
+
+    @property
+    def category_counts(self) -> Dict[str, int]:
+        return self._counts_by(0, only_with_category=True)
+
+    @property
+    def impact_counts(self) -> Dict[str, int]:
+        """Conteo de Business Impact sobre filas con categoría"""
+        return self._counts_by(1, only_with_category=True)
+
+    @property
+    def all_impact_counts(self) -> Dict[str, int]:
+        """Conteo de Business Impact sobre todas las filas"""
+        return self._counts_by(1, only_with_category=False)
+
+    @property
+    def type_counts(self) -> Dict[str, int]:
+        return self._counts_by(2, only_with_category=True)
+
+    @property
+    def all_type_counts(self) -> Dict[str, int]:
+        """Conteo de Type sobre todas las filas"""
+        return self._counts_by(2, only_with_category=False)
+
+    @property
+    def unique_resources(self) -> int:
+        if self._unique_resources is not None:
+            return self._unique_resources
+        return len(self._resource_names)
+
+    @property
+    def unique_resource_groups(self) -> int:
+        if self._unique_resource_groups is not None:
+            return self._unique_resource_groups
+        return len(self._resource_groups)
+
+    @property
+    def main_currency(self) -> Optional[str]:
+        """Moneda más común"""
+        if not self.currency_counts:
+            return None
+        return self.currency_counts.most_common(1)[0][0]
+
+    # -----------------------------------------
+    # Serialización (analysis_data['aggregates'])
+    # -----------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Representación compacta y serializable en JSON (sin sets de recursos)"""
+        return {
+            'version': AGGREGATES_VERSION,
+            'columns': self.columns,
+            'rows_read': self.rows_read,
+            'group_counts': [list(key) + [count] for key, count in self.group_counts.items()],
+            'currency_counts': dict(self.currency_counts),
+            'annual_savings_total': round(self.annual_savings_total, 2),
+            'rows_with_savings': self.rows_with_savings,
+            'savings_by_currency': {k: round(v, 2) for k, v in self.savings_by_currency.items()},
+            'unique_resources': self.unique_resources,
+            'unique_resource_groups': self.unique_resource_groups,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AdvisorAggregates':
+        """Reconstruir los agregados guardados en analysis_data"""
+        aggregates = cls()
+        aggregates.columns = list(data.get('columns', []))
+        aggregates.rows_read = data.get('rows_read', 0)
+        for *key, count in data.get('group_counts', []):
+            aggregates.group_counts[tuple(key)] = count
+        aggregates.currency_counts = Counter(data.get('currency_counts', {}))
+        aggregates.annual_savings_total = data.get('annual_savings_total', 0.0)
+        aggregates.rows_with_savings = data.get('rows_with_savings', 0)
+        aggregates.savings_by_currency = Counter(data.get('savings_by_currency', {}))
+        aggregates._unique_resources = data.get('unique_resources', 0)
+        aggregates._unique_resource_groups = data.get('unique_resource_groups', 0)
+        return aggregates
+
+
+def _bytes_read(handle) -> Optional[int]:
+    """Posición actual del file-like (bytes consumidos por el parser), si se puede saber"""
+    try:
+        return handle.tell()
+    except Exception:
+        return None
+
+
+def aggregate_advisor_csv(source: Union[str, IO], chunk_size: Optional[int] = None,
+                          snapshot_path: Optional[str] = None,
+                          progress: Optional[Callable[[int, Optional[int]], None]] = None) -> AdvisorAggregates:
+    """
+    Parsear un CSV de Azure Advisor una sola vez y devolver sus agregados
+
+    Args:
+        source: Path del archivo o file-like (texto o binario, p.ej. un UploadedFile)
+        chunk_size: Filas por chunk (por defecto CSV_ANALYSIS_CHUNK_SIZE)
+        snapshot_path: Si se indica, los mismos chunks se escriben como snapshot
+            Parquet (ver advisor_snapshot); un fallo ahí no afecta al análisis
+        progress: Callback (filas_leídas, bytes_leídos) llamado tras cada chunk
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    # Los streams no posicionables (p.ej. el upload pass-through) se leen tal cual
+    if hasattr(source, 'seek') and getattr(source, 'seekable', lambda: True)():
+        source.seek(0)
+
+    # Con un path se abre aquí el archivo para poder informar los bytes leídos
+    handle = open(source, 'rb') if progress and isinstance(source, (str, os.PathLike)) else source
+
+    writer = AdvisorSnapshotWriter(snapshot_path) if snapshot_path and PYARROW_AVAILABLE else None
+
+    aggregates = AdvisorAggregates()
+    chunks = 0
+    # Solo se leen las columnas que usa el motor (todas las de Advisor si además
+    # se escribe el snapshot), ya tipadas (category)
+    selector = ColumnSelector(ADVISOR_COLUMNS if writer else ENGINE_COLUMNS)
+    try:
+        with read_advisor_csv(handle, chunksize=chunk_size, selector=selector) as reader:
+            for chunk in reader:
+                aggregates.update(chunk)
+                chunks += 1
+                if progress:
+                    progress(aggregates.rows_read, _bytes_read(handle))
+                if writer:
+                    try:
+                        writer.write(chunk)
+                    except Exception as e:
+                        logger.warning(f"Snapshot descartado ({snapshot_path}): {e}")
+                        writer.abort()
+                        writer = None
+    except Exception:
+        if writer:
+            writer.abort()
+        raise
+    finally:
+        if handle is not source:
+            handle.close()
+
+    if writer:
+        try:
+            writer.close()
+        except Exception as e:
+            logger.warning(f"Snapshot descartado ({snapshot_path}): {e}")
+            writer.abort()
+
+    # Cabecera completa del archivo, no solo las columnas leídas
+    aggregates.columns = selector.header
+
+    logger.info(f"CSV agregado en una pasada: {aggregates.rows_read} filas en {chunks} chunks de {chunk_size}")
+    return aggregates
+
+
+def aggregate_advisor_snapshot(csv_file_id, chunk_size: Optional[int] = None) -> Optional[AdvisorAggregates]:
+    """Recalcular los agregados desde el snapshot Parquet (None si no existe)"""
+    if not snapshot_exists(csv_file_id):
+        return None
+
+    aggregates = AdvisorAggregates()
+    for batch in iter_advisor_snapshot(csv_file_id, ENGINE_COLUMNS, chunk_size or DEFAULT_CHUNK_SIZE):
+        aggregates.update(batch)
+    return aggregates
+
+
+def get_stored_aggregates(analysis_data: Optional[Dict[str, Any]]) -> Optional[AdvisorAggregates]:
+    """Obtener los agregados guardados en analysis_data, si existen y son compatibles"""
+    stored = (analysis_data or {}).get('aggregates')
+    if not stored or stored.get('version') != AGGREGATES_VERSION:
+        return None
+    return AdvisorAggregates.from_dict(stored)
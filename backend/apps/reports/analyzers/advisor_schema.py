@@ -0,0 +1,136 @@
+# backend/apps/reports/analyzers/advisor_schema.py
+"""
+Esquema de ingesta de los CSV de Azure Advisor.
+
+Todas las lecturas de datos de Advisor (motor de agregación, DataFrames
+guardados en Azure, fallbacks) usan estos tipos en lugar de dejar que pandas
+infiera object para cada columna. Las columnas de baja cardinalidad se leen
+como category, de modo que los value_counts/groupby trabajan sobre códigos
+enteros y la memoria por chunk baja notablemente.
+"""
+import pandas as pd
+from typing import Dict, List, Iterable, Optional, Union, IO
+
+# Columnas del export estándar de Azure Advisor
+ADVISOR_COLUMNS = [
+    'Category',
+    'Business Impact',
+    'Recommendation',
+    'Subscription ID',
+    'Subscription Name',
+    'Resource Group',
+    'Resource Name',
+    'Type',
+    'Updated Date',
+    'Potential benefits',
+    'Potential Annual Cost Savings',
+    'Potential Cost Savings Currency',
+    'Retirement date',
+    'Retiring feature',
+]
+
+# Valores muy repetidos: se almacenan como códigos
+CATEGORICAL_COLUMNS = [
+    'Category',
+    'Business Impact',
+    'Recommendation',
+    'Subscription ID',
+    'Subscription Name',
+    'Resource Group',
+    'Type',
+    'Potential Cost Savings Currency',
+    'Retiring feature',
+]
+
+# Texto libre / alta cardinalidad: se deja el tipo de texto por defecto de pandas
+STRING_COLUMNS = [
+    'Resource Name',
+    'Potential benefits',
+]
+
+DATE_COLUMNS = [
+    'Updated Date',
+    'Retirement date',
+]
+
+# 'Potential Annual Cost Savings' no se tipa: si es numérica pandas la lee como
+# float64 y el parser de ahorros toma el camino rápido; si viene con formato
+# ("$1,234.50") queda como texto para savings_parser. Las fechas se convierten
+# después de leer (parse_dates falla si la columna no existe en el archivo).
+ADVISOR_DTYPES: Dict[str, str] = {column: 'category' for column in CATEGORICAL_COLUMNS}
+
+# Columnas que necesita el motor de agregación
+ENGINE_COLUMNS = [
+    'Category',
+    'Business Impact',
+    'Type',
+    'Resource Name',
+    'Resource Group',
+    'Potential Annual Cost Savings',
+    'Potential Cost Savings Currency',
+]
+
+
+class ColumnSelector:
+    """
+    Filtro para usecols que tolera columnas ausentes y recuerda la cabecera
+    completa del archivo (para informar el número real de columnas)
+    """
+
+    def __init__(self, columns: Optional[Iterable[str]] = None):
+        self.columns = set(columns) if columns is not None else None
+        self._header: Dict[str, None] = {}
+
+    def __call__(self, name: str) -> bool:
+        self._header[name] = None
+        return self.columns is None or name in self.columns
+
+    @property
+    def header(self) -> List[str]:
+        return list(self._header)
+
+
+def parse_advisor_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """Convertir las columnas de fecha presentes (valores inválidos -> NaT)"""
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+    return df
+
+
+def apply_advisor_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Aplicar el esquema a un DataFrame construido por otra vía (p.ej. JSON)"""
+    dtypes = {c: t for c, t in ADVISOR_DTYPES.items() if c in df.columns}
+    if dtypes:
+        df = df.astype(dtypes)
+    return parse_advisor_dates(df)
+
+
+def read_advisor_csv(source: Union[str, IO],
+                     columns: Optional[Iterable[str]] = ADVISOR_COLUMNS,
+                     chunksize: Optional[int] = None,
+                     selector: Optional[ColumnSelector] = None,
+                     **kwargs):
+    """
+    pd.read_csv con el esquema de Advisor
+
+    Args:
+        source: Path o file-like
+        columns: Columnas a leer (None = todas); las ausentes se ignoran
+        chunksize: Si se indica devuelve un lector por chunks; quien necesite
+            las fechas las convierte en cada chunk con parse_advisor_dates
+        selector: ColumnSelector propio, para consultar la cabecera tras leer
+    """
+    selector = selector or ColumnSelector(columns)
+    options = {
+        'usecols': selector,
+        'dtype': ADVISOR_DTYPES,
+        'encoding': 'utf-8-sig',
+        'chunksize': chunksize,
+    }
+    options.update(kwargs)
+
+    result = pd.read_csv(source, **options)
+    if chunksize:
+        return result
+    return parse_advisor_dates(result)
@@ -0,0 +1,229 @@
+# backend/apps/reports/analyzers/advisor_snapshot.py
+"""
+Snapshot columnar (Parquet) de los datos de Azure Advisor de cada CSVFile.
+
+Se escribe una sola vez, durante la misma pasada en streaming del análisis, y
+pasa a ser el formato canónico de lectura rápida: reanálisis, DataFrames para
+Azure y download_dataframe leen de aquí (memory-map y solo las columnas
+necesarias) en lugar de volver al CSV o a los blobs csv.gz/json.gz.
+"""
+import os
+import logging
+import pandas as pd
+from django.conf import settings
+from typing import Iterator, List, Optional
+from .advisor_schema import ADVISOR_COLUMNS, CATEGORICAL_COLUMNS, DATE_COLUMNS, read_advisor_csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    logging.warning("pyarrow not available. Install with: pip install pyarrow")
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = getattr(settings, 'ADVISOR_SNAPSHOT_DIR', os.path.join(settings.MEDIA_ROOT, 'snapshots'))
+
+# Filas por row group: coincide con el chunk de lectura para poder iterar por lotes
+SNAPSHOT_BATCH_SIZE = getattr(settings, 'CSV_ANALYSIS_CHUNK_SIZE', 50000)
+
+
+def get_snapshot_path(csv_file_id) -> str:
+    """Ruta del snapshot de un CSVFile"""
+    return os.path.join(str(SNAPSHOT_DIR), f"{csv_file_id}.parquet")
+
+
+def snapshot_exists(csv_file_id) -> bool:
+    return PYARROW_AVAILABLE and os.path.exists(get_snapshot_path(csv_file_id))
+
+
+class AdvisorSnapshotWriter:
+    """
+    Escritor incremental del snapshot: recibe los chunks del análisis y los
+    añade como row groups. Escribe en un archivo temporal y lo publica con un
+    rename atómico al cerrar, de modo que nunca se lee un snapshot a medias.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.rows_written = 0
+        self._schema = None
+        self._writer = None
+
+    def _to_table(self, chunk: pd.DataFrame) -> 'pa.Table':
+        # Tipos fijos para todos los chunks: texto (dictionary en disco) o timestamp
+        columns = {}
+        for column in ADVISOR_COLUMNS:
+            if column not in chunk.columns:
+                continue
+            if column in DATE_COLUMNS:
+                columns[column] = pd.to_datetime(chunk[column], errors='coerce')
+            else:
+                columns[column] = chunk[column].astype('string')
+        frame = pd.DataFrame(columns)
+
+        if self._schema is None:
+            self._schema = pa.schema([
+                pa.field(column, pa.timestamp('us') if column in DATE_COLUMNS else pa.string())
+                for column in frame.columns
+            ])
+        return pa.Table.from_pandas(frame, preserve_index=False).cast(self._schema)
+
+    def write(self, chunk: pd.DataFrame):
+        table = self._to_table(chunk)
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._writer = pq.ParquetWriter(self.temp_path, self._schema, use_dictionary=True, compression='snappy')
+        self._writer.write_table(table, row_group_size=SNAPSHOT_BATCH_SIZE)
+        self.rows_written += table.num_rows
+
+    def close(self) -> Optional[str]:
+        """Publicar el snapshot; devuelve la ruta final (None si no hubo datos)"""
+        if self._writer is None:
+            return None
+        self._writer.close()
+        self._writer = None
+        os.replace(self.temp_path, self.path)
+        logger.info(f"Snapshot Parquet escrito: {self.path} ({self.rows_written} filas)")
+        return self.path
+
+    def abort(self):
+        """Descartar el snapshot parcial"""
+        try:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+        except Exception as e:
+            logger.warning(f"Error descartando snapshot parcial {self.temp_path}: {e}")
+
+
+def write_advisor_snapshot(csv_file_id, source, chunk_size: Optional[int] = None) -> Optional[str]:
+    """
+    Escribir el snapshot de un CSV ya existente (p.ej. uploads anteriores a los
+    snapshots). En el flujo normal se escribe desde aggregate_advisor_csv.
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+
+    writer = AdvisorSnapshotWriter(get_snapshot_path(csv_file_id))
+    try:
+        with read_advisor_csv(source, chunksize=chunk_size or SNAPSHOT_BATCH_SIZE) as reader:
+            for chunk in reader:
+                writer.write(chunk)
+        return writer.close()
+    except Exception as e:
+        logger.error(f"Error escribiendo snapshot de {csv_file_id}: {e}")
+        writer.abort()
+        return None
+
+
+def link_advisor_snapshot(source_id, target_id) -> bool:
+    """
+    Compartir el snapshot de un CSVFile con otro de idéntico contenido
+    (hard link: no ocupa espacio adicional; symlink si no es posible)
+    """
+    if not snapshot_exists(source_id):
+        return False
+
+    source_path = get_snapshot_path(source_id)
+    target_path = get_snapshot_path(target_id)
+    try:
+        if os.path.exists(target_path):
+            return True
+        try:
+            os.link(source_path, target_path)
+        except OSError:
+            os.symlink(source_path, target_path)
+        return True
+    except Exception as e:
+        logger.warning(f"No se pudo enlazar el snapshot {source_id} -> {target_id}: {e}")
+        return False
+
+
+def _snapshot_symlinks_to(path: str) -> List[str]:
+    """Snapshots que son symlinks a path (enlazados con el fallback de link_advisor_snapshot)"""
+    real_path = os.path.realpath(path)
+    links = []
+    for entry in os.scandir(str(SNAPSHOT_DIR)):
+        if entry.is_symlink() and os.path.realpath(entry.path) == real_path:
+            links.append(entry.path)
+    return links
+
+
+def delete_advisor_snapshot(csv_file_id):
+    """
+    Eliminar el snapshot de un CSVFile (ignora errores). Con hard links basta
+    con quitar la entrada; si es un symlink solo se quita el enlace, y si otros
+    snapshots apuntan a este con symlinks el archivo pasa al primero de ellos.
+    """
+    try:
+        path = get_snapshot_path(csv_file_id)
+        if not os.path.lexists(path):
+            return
+        if os.path.islink(path):
+            os.remove(path)
+            return
+
+        links = _snapshot_symlinks_to(path)
+        if not links:
+            os.remove(path)
+            return
+
+        heir = links.pop(0)
+        os.replace(path, heir)
+        for link in links:
+            os.remove(link)
+            os.symlink(heir, link)
+    except Exception as e:
+        logger.warning(f"No se pudo eliminar el snapshot de {csv_file_id}: {e}")
+
+
+def _open_snapshot(csv_file_id) -> Optional['pq.ParquetFile']:
+    if not snapshot_exists(csv_file_id):
+        return None
+    return pq.ParquetFile(get_snapshot_path(csv_file_id), memory_map=True,
+                          read_dictionary=CATEGORICAL_COLUMNS)
+
+
+def _present(parquet_file: 'pq.ParquetFile', columns: Optional[List[str]]) -> Optional[List[str]]:
+    if columns is None:
+        return None
+    available = set(parquet_file.schema_arrow.names)
+    return [c for c in columns if c in available]
+
+
+def load_advisor_snapshot(csv_file_id, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Cargar el snapshot de un CSVFile
+
+    Args:
+        csv_file_id: ID del CSVFile
+        columns: Columnas a leer (None = todas); las ausentes se ignoran
+
+    Returns:
+        DataFrame con las columnas categóricas como category, o None si no hay snapshot
+    """
+    try:
+        parquet_file = _open_snapshot(csv_file_id)
+        if parquet_file is None:
+            return None
+        return parquet_file.read(columns=_present(parquet_file, columns)).to_pandas()
+    except Exception as e:
+        logger.error(f"Error leyendo snapshot de {csv_file_id}: {e}")
+        return None
+
+
+def iter_advisor_snapshot(csv_file_id, columns: Optional[List[str]] = None,
+                          batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Recorrer el snapshot por lotes (memoria acotada, como la lectura por chunks del CSV)"""
+    parquet_file = _open_snapshot(csv_file_id)
+    if parquet_file is None:
+        return
+    for batch in parquet_file.iter_batches(batch_size=batch_size or SNAPSHOT_BATCH_SIZE,
+                                           columns=_present(parquet_file, columns)):
+        yield batch.to_pandas()
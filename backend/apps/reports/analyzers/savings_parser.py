@@ -0,0 +1,162 @@
+# backend/apps/reports/analyzers/savings_parser.py
+"""
+Normalización vectorizada de importes de ahorro de Azure Advisor.
+
+Convierte 'Potential Annual Cost Savings' a float sin bucles por fila:
+separadores de miles, símbolos de moneda, coma decimal (locales europeos),
+rangos ("100 - 200" -> punto medio) y negativos ("-50", "(50)", "-10 - -20").
+
+Un punto seguido de exactamente 3 dígitos es ambiguo ("1.500"): en monedas que
+agrupan miles con punto (EUR, BRL...) se lee como separador de miles (1500),
+en el resto como decimal (1.5). La moneda es la declarada en la columna de
+moneda o, si falta, la del símbolo del importe.
+"""
+import pandas as pd
+from typing import Optional
+
+# Parte entera de un importe. Se reconocen como separador de miles: la coma
+# seguida de grupos de 3 dígitos ("1,234"), el punto repetido ("1.234.567") o
+# seguido de coma decimal ("1.234,5") y el espacio ("1 234"). El separador que
+# queda después es el decimal ("12,5", "0.125").
+_INTEGER = (
+    r'\d{1,3}(?:,\d{3})+'
+    r'|\d{1,3}(?:\.\d{3}){2,}'
+    r'|\d{1,3}(?:\.\d{3})+(?=,\d)'
+    r'|\d{1,3}(?:[ \u00a0]\d{3})+'
+    r'|\d+'
+)
+
+
+def _number(name: str) -> str:
+    # Signo propio de cada extremo: "-50", "$-50", "USD -50", "€(50)", "-10 - -20"
+    return (rf'(?P<{name}_sign>[-−(])?\s*'
+            rf'(?P<{name}_int>{_INTEGER})(?:(?P<{name}_sep>[.,])(?P<{name}_frac>\d+))?')
+
+
+# Primer número y, opcionalmente, el extremo superior de un rango
+_AMOUNT_PATTERN = rf'{_number("low")}(?:\s*(?:-|–|—|to)\s*{_number("high")})?'
+
+# Importe que to_numeric acepta pero es ambiguo por el punto ("1.500")
+_DOT_GROUPED_PATTERN = r'\s*-?\d{1,3}\.\d{3}\s*'
+
+# Símbolos usados cuando la columna de moneda viene vacía
+CURRENCY_SYMBOLS = {
+    '$': 'USD',
+    '€': 'EUR',
+    '£': 'GBP',
+    '¥': 'JPY',
+    '₹': 'INR',
+    'R$': 'BRL',
+}
+
+DEFAULT_CURRENCY = 'USD'
+
+# Monedas cuyos importes se suelen escribir con punto de miles ("€1.500")
+DOT_GROUPING_CURRENCIES = {'EUR', 'BRL', 'ARS', 'CLP', 'COP', 'IDR', 'TRY', 'VND', 'DKK'}
+
+
+def _to_float(integer: pd.Series, fraction: pd.Series) -> pd.Series:
+    """Unir parte entera (sin separadores) y decimal en un float"""
+    digits = integer.str.replace(r'\D', '', regex=True)
+    return pd.to_numeric(digits + '.' + fraction.fillna('0'), errors='coerce').astype('float64')
+
+
+def _parse_text_amounts(text: pd.Series, dot_grouping: pd.Series) -> pd.Series:
+    """Parsear importes con formato (símbolos, separadores, rangos)"""
+    parts = text.str.extract(_AMOUNT_PATTERN)
+
+    endpoints = []
+    for name in ('low', 'high'):
+        integer, fraction = parts[f'{name}_int'], parts[f'{name}_frac']
+        # "1.500" en una moneda con punto de miles: el punto no es decimal
+        grouped = (dot_grouping & (parts[f'{name}_sep'] == '.') & (fraction.str.len() == 3)
+                   & integer.str.fullmatch(r'\d{1,3}')).fillna(False).astype(bool)
+        integer = integer.where(~grouped, integer + fraction)
+        fraction = fraction.where(~grouped)
+
+        value = _to_float(integer, fraction)
+        negative = parts[f'{name}_sign'].notna().to_numpy()
+        endpoints.append(value.where(~negative, -value))
+    low, high = endpoints
+
+    # Paréntesis contables alrededor de un rango: "(100 - 200)" niega ambos extremos
+    wrapped = ((parts['low_sign'] == '(') & parts['high_sign'].isna()).fillna(False).to_numpy()
+    high = high.where(~wrapped, -high)
+
+    # Rangos: punto medio; valores simples: tal cual
+    return low.where(high.isna(), (low + high) / 2)
+
+
+def parse_savings_amounts(amounts: pd.Series, currencies: Optional[pd.Series] = None) -> pd.Series:
+    """
+    Parsear una columna de importes a float (NaN si no hay número)
+
+    Args:
+        amounts: Serie con los valores tal como vienen en el CSV
+        currencies: Moneda de cada fila (ver detect_currency); si no se indica se
+            deduce del símbolo de cada importe. Decide cómo leer "1.500"
+
+    Returns:
+        Serie float alineada con la entrada
+    """
+    # Camino rápido: valores ya numéricos (el caso habitual en los exports de Advisor)
+    values = pd.to_numeric(amounts, errors='coerce').astype('float64')
+    if pd.api.types.is_numeric_dtype(amounts.dtype):
+        return values
+
+    if currencies is None:
+        currencies = detect_currency(amounts)
+    dot_grouping = currencies.isin(DOT_GROUPING_CURRENCIES).to_numpy()
+
+    pending = values.isna() & amounts.notna()
+    # to_numeric ya leyó "1.500" como 1.5; en monedas con punto de miles se reparsea
+    text = amounts.astype('string')
+    pending |= (dot_grouping & text.str.fullmatch(_DOT_GROUPED_PATTERN)).fillna(False).astype(bool)
+    if not pending.any():
+        return values
+
+    # El resto se parsea una vez por (valor, agrupación) distinto y se expande con los códigos
+    keys = pd.MultiIndex.from_arrays([text[pending], dot_grouping[pending.to_numpy()]])
+    codes, uniques = pd.factorize(keys)
+    parsed = _parse_text_amounts(
+        pd.Series(uniques.get_level_values(0), dtype='string'),
+        pd.Series(uniques.get_level_values(1), dtype=bool),
+    ).to_numpy(dtype='float64')
+    values[pending] = parsed[codes]
+    return values
+
+
+def detect_currency(amounts: pd.Series, currencies: Optional[pd.Series] = None) -> pd.Series:
+    """
+    Moneda de cada fila: la columna 'Potential Cost Savings Currency' si está
+    informada, si no el símbolo presente en el importe, si no USD
+    """
+    if currencies is not None:
+        declared = currencies.astype('string').str.strip().str.upper()
+        declared = declared.where(declared != '')
+    else:
+        declared = pd.Series(pd.NA, index=amounts.index, dtype='string')
+
+    # Solo se buscan símbolos en las filas sin moneda declarada
+    missing = declared.isna() & amounts.notna()
+    if missing.any():
+        symbols = amounts[missing].astype('string').str.extract(r'(R\$|[$€£¥₹])', expand=False)
+        declared[missing] = symbols.map(CURRENCY_SYMBOLS)
+
+    return declared.fillna(DEFAULT_CURRENCY).astype(str)
+
+
+def normalize_savings(amounts: pd.Series, currencies: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    Etapa de normalización completa
+
+    Returns:
+        DataFrame con columnas 'amount' (float) y 'currency' (str), solo para las
+        filas que contienen un importe válido
+    """
+    currency = detect_currency(amounts, currencies)
+    frame = pd.DataFrame({
+        'amount': parse_savings_amounts(amounts, currency),
+        'currency': currency,
+    })
+    return frame[frame['amount'].notna()]
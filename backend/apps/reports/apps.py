@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reports'
-    verbose_name = 'Reportes'
\ No newline at end of file
+    verbose_name = 'Reportes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
\ No newline at end of file
@@ -1,6 +1,5 @@
 # apps/reports/management/commands/clear_report_cache.py
 from django.core.management.base import BaseCommand
-from django.core.cache import cache
 from apps.reports.utils.cache_manager import ReportCacheManager
 
 class Command(BaseCommand):
@@ -9,9 +8,14 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             '--report-id',
-            type=int,
+            type=str,
             help='ID específico del reporte a limpiar',
         )
+        parser.add_argument(
+            '--user-id',
+            type=str,
+            help='Limpiar el caché de todos los reportes de un usuario',
+        )
 
     def handle(self, *args, **options):
         if options['report_id']:
@@ -26,9 +30,14 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.ERROR(f'Reporte {options["report_id"]} no encontrado')
                 )
+        elif options['user_id']:
+            ReportCacheManager.invalidate_user(options['user_id'])
+            self.stdout.write(
+                self.style.SUCCESS(f'Caché limpiado para los reportes del usuario {options["user_id"]}')
+            )
         else:
-            # Limpiar todo el caché de reportes
-            cache.delete_pattern(f"{ReportCacheManager.CACHE_PREFIX}_*")
+            # Limpiar todo el caché de reportes (nueva generación global, sin recorrer claves en Redis)
+            ReportCacheManager.invalidate_all()
             self.stdout.write(
                 self.style.SUCCESS('Todo el caché de reportes ha sido limpiado')
-            )
\ No newline at end of file
+            )
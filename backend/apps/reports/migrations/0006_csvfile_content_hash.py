@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-16 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0005_rename_reports_rep_csv_fil_idx_reports_rep_csv_fil_3c2bfd_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.24 on 2026-10-16 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0006_csvfile_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='analysis_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='analysis_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
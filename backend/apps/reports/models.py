@@ -8,6 +8,22 @@ import os
 
 User = get_user_model()
 
+
+def update_analysis_fingerprint(instance, save_kwargs):
+    """
+    Recalcular la huella de analysis_data antes de guardar (la usa la caché de
+    HTML en lugar de leer el CSV). Con update_fields solo si se guarda analysis_data.
+    """
+    from .utils.cache_manager import compute_analysis_fingerprint
+
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None:
+        if 'analysis_data' not in update_fields:
+            return
+        save_kwargs['update_fields'] = set(update_fields) | {'analysis_fingerprint'}
+    instance.analysis_fingerprint = compute_analysis_fingerprint(instance.analysis_data)
+
+
 class CSVFile(models.Model):
     """Archivos CSV subidos para análisis"""
     PROCESSING_STATUS_CHOICES = [
@@ -24,6 +40,7 @@ class CSVFile(models.Model):
     original_filename = models.CharField(max_length=255)
     file_size = models.BigIntegerField()
     content_type = models.CharField(max_length=100, default='text/csv')
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)  # SHA-256 del contenido
     
     # Azure Storage info
     azure_blob_url = models.URLField(null=True, blank=True)
@@ -41,6 +58,7 @@ class CSVFile(models.Model):
     rows_count = models.PositiveIntegerField(null=True, blank=True)
     columns_count = models.PositiveIntegerField(null=True, blank=True)
     analysis_data = models.JSONField(default=dict, blank=True)
+    analysis_fingerprint = models.CharField(max_length=64, blank=True, default='')  # SHA-256 de analysis_data
     
     # Timestamps
     upload_date = models.DateTimeField(auto_now_add=True)
@@ -62,6 +80,7 @@ class CSVFile(models.Model):
     def save(self, *args, **kwargs):
         if self.processing_status == 'completed' and not self.processed_date:
             self.processed_date = timezone.now()
+        update_analysis_fingerprint(self, kwargs)
         super().save(*args, **kwargs)
 
     @property
@@ -120,6 +139,7 @@ class Report(models.Model):
     
     # Metadatos
     analysis_data = models.JSONField(default=dict, blank=True)
+    analysis_fingerprint = models.CharField(max_length=64, blank=True, default='')  # SHA-256 de analysis_data
     generation_time_seconds = models.PositiveIntegerField(null=True, blank=True)
     pages_count = models.PositiveIntegerField(null=True, blank=True)
     download_count = models.PositiveIntegerField(default=0)
@@ -147,6 +167,7 @@ class Report(models.Model):
     def save(self, *args, **kwargs):
         if self.status == 'completed' and not self.completed_at:
             self.completed_at = timezone.now()
+        update_analysis_fingerprint(self, kwargs)
         super().save(*args, **kwargs)
     
     @property
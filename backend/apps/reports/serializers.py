@@ -64,21 +64,14 @@ class CSVFileUploadSerializer(serializers.ModelSerializer):
                 processing_status='pending'
             )
             
-            # Guardar el archivo temporalmente y obtener su path
+            # Guardar el archivo en staging y obtener su path
             # NO pasamos el objeto InMemoryUploadedFile directamente a Celery
-            import tempfile
-            import os
+            from apps.storage.services.upload_staging import stage_uploaded_file
+            staged_path = stage_uploaded_file(file, csv_file.id)
             
-            # Crear archivo temporal
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-                # Escribir el contenido del archivo
-                for chunk in file.chunks():
-                    tmp_file.write(chunk)
-                temp_file_path = tmp_file.name
-            
-            # Procesar archivo de forma asíncrona con el path del archivo temporal
+            # Procesar archivo de forma asíncrona con el path del archivo en staging
             from .tasks import process_csv_file
-            process_csv_file.delay(csv_file.id, temp_file_path)
+            process_csv_file.delay(str(csv_file.id), staged_path)
             
             logger.info(f"CSV file {csv_file.id} created and queued for processing")
             
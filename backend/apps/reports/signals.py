@@ -0,0 +1,39 @@
+# apps/reports/signals.py
+"""
+Invalidación de la caché de HTML cuando cambian los datos de un reporte.
+La huella guardada ya impide servir HTML obsoleto; esto libera las entradas.
+Al borrar un CSVFile se elimina también su snapshot Parquet.
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import CSVFile, Report
+from .utils.cache_manager import ReportCacheManager
+from .analyzers.advisor_snapshot import delete_advisor_snapshot
+
+# Campos de CSVFile que aparecen en el HTML de sus reportes
+CSV_RENDER_FIELDS = {'analysis_data', 'original_filename'}
+
+
+@receiver(post_save, sender=Report)
+@receiver(post_delete, sender=Report)
+def invalidate_report_html(sender, instance, created=False, **kwargs):
+    if not created:
+        ReportCacheManager.invalidate_cache(instance)
+
+
+@receiver(post_save, sender=CSVFile)
+def invalidate_csv_reports_html(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not CSV_RENDER_FIELDS & set(update_fields)):
+        return
+    ReportCacheManager.invalidate_csv_file(instance)
+
+
+@receiver(pre_delete, sender=CSVFile)
+def invalidate_deleted_csv_reports_html(sender, instance, **kwargs):
+    # Antes del borrado: después los reportes ya no apuntan al CSV (SET_NULL)
+    ReportCacheManager.invalidate_csv_file(instance)
+
+
+@receiver(post_delete, sender=CSVFile)
+def delete_csv_snapshot(sender, instance, **kwargs):
+    delete_advisor_snapshot(instance.id)
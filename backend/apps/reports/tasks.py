@@ -4,8 +4,11 @@ from django.apps import apps
 from django.utils import timezone
 import pandas as pd
 import numpy as np
+from io import StringIO
 import logging
 import os
+from apps.storage.services.upload_staging import discard_staged_file
+from apps.reports.utils.progress import ProgressReporter
 
 logger = logging.getLogger(__name__)
 
@@ -29,10 +32,17 @@ def convert_to_json_serializable(obj):
         return obj
 
 @shared_task
-def process_csv_file(csv_file_id):
-    """Procesar archivo CSV con análisis real de Azure Advisor"""
+def process_csv_file(csv_file_id, staged_path=None):
+    """
+    Procesar archivo CSV con análisis real de Azure Advisor
+    
+    Args:
+        csv_file_id: ID del CSVFile
+        staged_path: Archivo en el área de staging (upload asíncrono). Se analiza
+            en streaming desde disco y se elimina al terminar.
+    """
     csv_file = None
-    temp_file_path = None
+    progress = None
     
     try:
         from django.apps import apps
@@ -41,23 +51,31 @@ def process_csv_file(csv_file_id):
         
         logger.info(f"Iniciando procesamiento de CSV {csv_file_id}: {csv_file.original_filename}")
         
+        progress = ProgressReporter('csv', csv_file.id, user_id=csv_file.user_id)
+        progress.update('reading', total_bytes=csv_file.file_size)
+        
         # Actualizar estado
         csv_file.processing_status = 'processing'
         csv_file.save(update_fields=['processing_status'])
         
-        # Leer contenido del archivo
+        # Origen del CSV: archivo en staging (sin cargarlo en memoria) o contenido descargado
+        csv_source = None
+        if staged_path and os.path.exists(staged_path):
+            csv_source = staged_path
+            logger.info(f"Analizando archivo en staging: {staged_path}")
+        
         csv_content = None
-        if csv_file.azure_blob_url:
+        if not csv_source and csv_file.azure_blob_url:
             # Si está en Azure Storage
             try:
-                from apps.storage.services.azure_storage_service import AzureStorageService
-                storage_service = AzureStorageService()
-                csv_content = storage_service.download_file_content(csv_file.azure_blob_name)
+                from apps.storage.services.azure_storage_service import azure_storage
+                csv_bytes = azure_storage.download_file(csv_file.azure_blob_name)
+                csv_content = csv_bytes.decode('utf-8-sig') if csv_bytes else None
                 logger.info(f"Archivo descargado desde Azure Storage: {csv_file.azure_blob_name}")
             except Exception as e:
                 logger.warning(f"Error descargando desde Azure Storage: {e}")
         
-        if not csv_content and csv_file.file_path:
+        if not csv_source and not csv_content and getattr(csv_file, 'file_path', None):
             # Leer desde archivo local
             try:
                 with open(csv_file.file_path, 'r', encoding='utf-8-sig') as f:
@@ -66,21 +84,33 @@ def process_csv_file(csv_file_id):
             except Exception as e:
                 logger.warning(f"Error leyendo archivo local: {e}")
         
-        if not csv_content:
+        if csv_content:
+            csv_source = StringIO(csv_content)
+        
+        if not csv_source:
             raise Exception("No se pudo obtener el contenido del archivo CSV")
         
         # **USAR EL NUEVO ANALIZADOR REAL**
         try:
-            from apps.reports.analyzers.csv_analyzer import analyze_csv_content
-            analysis_results = analyze_csv_content(csv_content)
+            from apps.reports.analyzers.csv_analyzer import analyze_csv_stream
+            from apps.reports.analyzers.advisor_snapshot import get_snapshot_path
+            progress.update('parsing', bytes_parsed=0, rows_aggregated=0)
+            analysis_results = analyze_csv_stream(
+                csv_source,
+                snapshot_path=get_snapshot_path(csv_file.id),
+                progress=lambda rows, bytes_read: progress.update(
+                    rows_aggregated=rows, bytes_parsed=bytes_read or 0
+                )
+            )
+            if 'error' in analysis_results:
+                raise ValueError(analysis_results['error'])
             logger.info("✅ Usando analizador real de Azure Advisor")
         except ImportError:
             logger.warning("⚠️  Analizador real no disponible, usando análisis básico")
             # Análisis básico como fallback
-            import pandas as pd
-            from io import StringIO
+            from apps.reports.analyzers.advisor_schema import read_advisor_csv
             
-            df = pd.read_csv(StringIO(csv_content))
+            df = read_advisor_csv(csv_source, columns=None)
             analysis_results = {
                 'executive_summary': {
                     'total_actions': len(df),
@@ -98,19 +128,31 @@ def process_csv_file(csv_file_id):
                 'metadata': {
                     'analysis_date': timezone.now().isoformat(),
                     'csv_rows': len(df),
+                    'rows_read': len(df),
                     'csv_columns': len(df.columns),
                     'data_source': 'Basic CSV Analysis'
                 }
             }
         
         # Guardar resultados
-        csv_file.rows_count = analysis_results.get('metadata', {}).get('csv_rows', 0)
+        progress.update('saving')
+        csv_file.rows_count = analysis_results.get('metadata', {}).get('rows_read', 0)
         csv_file.columns_count = analysis_results.get('metadata', {}).get('csv_columns', 0)
         csv_file.analysis_data = analysis_results
         csv_file.processing_status = 'completed'
         csv_file.processed_date = timezone.now()
         csv_file.save()
         
+        # Cambios respecto al export anterior del mismo usuario
+        from apps.reports.analyzers.advisor_delta import DELTA_ON_UPLOAD, attach_advisor_delta
+        if DELTA_ON_UPLOAD:
+            progress.update('delta')
+            attach_advisor_delta(csv_file)
+        
+        # El snapshot Parquet sustituye al archivo en staging para lecturas posteriores
+        discard_staged_file(staged_path)
+        progress.complete(rows_aggregated=csv_file.rows_count)
+        
         logger.info(f"✅ CSV {csv_file_id} procesado exitosamente: {csv_file.rows_count} filas")
         logger.info(f"📊 Acciones totales: {analysis_results.get('executive_summary', {}).get('total_actions', 0)}")
         logger.info(f"💰 Ahorros estimados: ${analysis_results.get('cost_optimization', {}).get('estimated_monthly_optimization', 0):,}")
@@ -125,23 +167,25 @@ def process_csv_file(csv_file_id):
             csv_file.processing_status = 'failed'
             csv_file.error_message = str(e)
             csv_file.save(update_fields=['processing_status', 'error_message'])
+        if progress:
+            progress.fail(str(e))
         
-        # Limpiar archivo temporal en caso de error
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except Exception:
-                pass
-        # Guardar también el path del archivo para acceso posterior
-        if not csv_file.file_path and temp_file_path:
-            csv_file.file_path = temp_file_path
-            csv_file.save()
+        # Limpiar archivo en staging en caso de error
+        discard_staged_file(staged_path)
 
         raise Exception(error_msg)
+
 @shared_task
-def generate_report(report_id):
-    """Generar reporte PDF de forma asíncrona"""
+def generate_report(report_id, job_id=None):
+    """
+    Generar reporte PDF de forma asíncrona
+    
+    Usa el mismo pipeline que la vista generate_pdf (HTML -> PDF -> Azure) y
+    publica el progreso por etapas en caché (ver utils.progress). job_id es el
+    handle devuelto al cliente (id de la tarea), publicado junto al progreso.
+    """
     report = None
+    progress = None
     
     try:
         Report = apps.get_model('reports', 'Report')
@@ -149,40 +193,22 @@ def generate_report(report_id):
         
         logger.info(f"Iniciando generación de reporte {report_id}")
         
+        progress = ProgressReporter('report', report.id, user_id=report.user_id)
+        progress.update('queued', job_id=job_id)
+        
         # Actualizar estado
         report.status = 'generating'
         report.save(update_fields=['status'])
         
-        # Generar PDF (implementación básica)
-        try:
-            from apps.storage.services.report_service import ReportGenerator
-            generator = ReportGenerator(report)
-            pdf_file_path, html_content = generator.generate()
-            
-            # Subir a Azure Storage
-            try:
-                from apps.storage.services.azure_storage_service import upload_file
-                blob_name = f"reports/{report.id}.pdf"
-                blob_url = upload_file(pdf_file_path, blob_name)
-                
-                # Actualizar reporte
-                report.pdf_file_url = blob_url
-                report.pdf_azure_blob_name = blob_name
-                report.html_preview_url = html_content
-            except ImportError:
-                logger.warning("Azure Storage no disponible, guardando localmente")
-                report.pdf_file_url = pdf_file_path
-                
-        except ImportError:
-            logger.warning("ReportGenerator no disponible, creando reporte básico")
-            # Crear reporte básico
-            report.pdf_file_url = f"/tmp/basic_report_{report_id}.pdf"
-            report.html_preview_url = "<p>Reporte básico generado</p>"
+        from apps.storage.services.complete_report_service import complete_report_service
+        result = complete_report_service.generate_complete_report(report, progress=progress)
+        
+        if result.get('cancelled'):
+            logger.info(f"Generación de reporte {report_id} cancelada")
+            return f"Reporte {report_id} cancelado"
         
-        # Finalizar
-        report.status = 'completed'
-        report.completed_at = timezone.now()
-        report.save()
+        if not result.get('success'):
+            raise Exception('; '.join(result.get('errors', [])) or 'Generación incompleta')
         
         logger.info(f"Reporte {report_id} generado exitosamente")
         return f"Reporte {report_id} completado"
@@ -193,7 +219,99 @@ def generate_report(report_id):
         
         if report:
             report.status = 'failed'
-            report.error_message = str(e)
-            report.save(update_fields=['status', 'error_message'])
+            report.save(update_fields=['status'])
+        if progress:
+            progress.fail(str(e))
+        
+        raise Exception(error_msg)
+
+@shared_task
+def generate_category_report(report_id, category, job_id=None):
+    """
+    Generar el PDF de una categoría de forma asíncrona (vista
+    generate_category_pdf con ?async=true); el resultado queda en el progreso
+    """
+    progress = None
+    
+    try:
+        Report = apps.get_model('reports', 'Report')
+        report = Report.objects.select_related('csv_file').get(id=report_id)
+        
+        progress = ProgressReporter('report', report.id, user_id=report.user_id)
+        progress.update('queued', job_id=job_id, category=category)
+        
+        from apps.storage.services.complete_report_service import complete_report_service
+        from apps.storage.services.pdf_render_pool import PDFRenderCancelled
+        try:
+            result = complete_report_service.generate_category_pdf(report, category, progress=progress)
+        except PDFRenderCancelled as e:
+            progress.cancel(str(e))
+            return f"PDF de {category} del reporte {report_id} cancelado"
+        
+        if not result['success']:
+            raise Exception(result.get('error') or 'Error generando PDF de categoría')
+        
+        return f"PDF de {category} del reporte {report_id} completado"
+        
+    except Exception as e:
+        error_msg = f"Error generando PDF de {category} del reporte {report_id}: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        if progress:
+            progress.fail(str(e))
+        raise Exception(error_msg)
+
+@shared_task
+def generate_batch_report(report_id, batch_id):
+    """
+    Generar un reporte de un lote (ver batch_pdf_service). No lanza excepciones:
+    un fallo no debe detener el resto de reportes de su carril.
+    """
+    report = None
+    progress = None
+    
+    try:
+        Report = apps.get_model('reports', 'Report')
+        report = Report.objects.select_related('csv_file').get(id=report_id)
+        
+        progress = ProgressReporter('report', report.id, user_id=report.user_id)
+        progress.update('queued', batch_id=batch_id)
+        
+        report.status = 'generating'
+        report.save(update_fields=['status'])
+        
+        from apps.storage.services.complete_report_service import complete_report_service
+        result = complete_report_service.generate_complete_report(report, progress=progress)
+        
+        return {
+            'report_id': str(report_id),
+            'success': result['success'],
+            'pdf_url': result['urls'].get('pdf'),
+            'errors': result['errors']
+        }
+        
+    except Exception as e:
+        logger.error(f"Error generando reporte {report_id} del lote {batch_id}: {str(e)}", exc_info=True)
+        
+        if report:
+            report.status = 'failed'
+            report.save(update_fields=['status'])
+        if progress:
+            progress.fail(str(e))
         
-        raise Exception(error_msg)
\ No newline at end of file
+        return {'report_id': str(report_id), 'success': False, 'errors': [str(e)]}
+
+@shared_task
+def finalize_pdf_batch(batch_id):
+    """Cerrar un lote cuando terminaron todos sus carriles (callback del chord)"""
+    from apps.storage.services.batch_pdf_service import summarize_batch
+    
+    progress = ProgressReporter.resume('batch', batch_id)
+    summary = summarize_batch(progress.state)
+    counts = summary['counts']
+    progress.complete(
+        success_count=counts.get('completed', 0),
+        error_count=counts.get('failed', 0) + counts.get('cancelled', 0)
+    )
+    
+    logger.info(f"Lote {batch_id} terminado: {counts}")
+    return counts
@@ -1,3 +1,565 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+import threading
+import time
+import uuid
+from unittest import mock
+import pandas as pd
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from apps.authentication.models import User
+from apps.storage.services.batch_pdf_service import split_lanes
+from .analyzers import advisor_snapshot
+from .analyzers.advisor_delta import diff_advisor_frames
+from .analyzers.advisor_engine import AdvisorAggregates, aggregate_advisor_csv
+from .analyzers.advisor_schema import ENGINE_COLUMNS, ColumnSelector, read_advisor_csv
+from .analyzers.advisor_engine import aggregate_advisor_snapshot
+from .analyzers.advisor_snapshot import (
+    delete_advisor_snapshot, get_snapshot_path, link_advisor_snapshot, load_advisor_snapshot, snapshot_exists,
+)
+from .analyzers.savings_parser import normalize_savings, parse_savings_amounts
+from .models import CSVFile, Report
+from .utils.cache_manager import ReportCacheManager
+from .utils.tiered_cache import (
+    GENERATION_TIMEOUT, CacheGenerations, LocalLRUCache, TieredCache, deserialize, report_cache, report_generations,
+    serialize,
+)
+from .utils.progress import ProgressReporter, get_progress, get_progress_for_user
+from .utils.stage_graph import StageGraph
+from .views import ReportKeysetPagination
 
-# Create your tests here.
+ADVISOR_CSV = (
+    "Category,Business Impact,Recommendation,Subscription ID,Subscription Name,Resource Group,"
+    "Resource Name,Type,Updated Date,Potential benefits,Potential Annual Cost Savings,"
+    "Potential Cost Savings Currency,Retirement date,Retiring feature\n"
+    "Cost,High,Resize VM,s1,Sub 1,rg1,vm1,vm,2024-01-01,,1200,USD,,\n"
+    "Cost,Medium,Resize VM,s1,Sub 1,rg1,vm2,vm,2024-01-01,,600,USD,,\n"
+    "Security,High,Enable MFA,s1,Sub 1,rg2,,subscription,2024-01-01,,,,,\n"
+    "Reliability,Low,Enable backup,s2,Sub 2,,db1,sql,2024-01-01,,,,,\n"
+    "Security,Low,Enable MFA,s2,Sub 2,rg2,vm1,vm,2024-01-01,,,,,\n"
+)
+
+
+class AdvisorEngineTests(SimpleTestCase):
+
+    def test_single_pass_aggregates(self):
+        aggregates = aggregate_advisor_csv(io.StringIO(ADVISOR_CSV), chunk_size=2)
+        self.assertEqual(aggregates.rows_read, 5)
+        self.assertEqual(aggregates.category_counts, {'Cost': 2, 'Security': 2, 'Reliability': 1})
+        self.assertAlmostEqual(aggregates.annual_savings_total, 1800)
+        self.assertEqual(aggregates.main_currency, 'USD')
+
+    def test_unique_counts_skip_empty_values_like_nunique(self):
+        frame = pd.read_csv(io.StringIO(ADVISOR_CSV))
+        aggregates = aggregate_advisor_csv(io.StringIO(ADVISOR_CSV), chunk_size=2)
+        self.assertEqual(aggregates.unique_resources, frame['Resource Name'].nunique())
+        self.assertEqual(aggregates.unique_resources, 3)
+        self.assertEqual(aggregates.unique_resource_groups, 2)
+
+    def test_stored_aggregates_round_trip(self):
+        aggregates = aggregate_advisor_csv(io.StringIO(ADVISOR_CSV))
+        restored = AdvisorAggregates.from_dict(aggregates.to_dict())
+        self.assertEqual(restored.rows_read, aggregates.rows_read)
+        self.assertEqual(restored.category_counts, aggregates.category_counts)
+        self.assertEqual(restored.unique_resources, aggregates.unique_resources)
+
+
+class AdvisorSchemaTests(SimpleTestCase):
+
+    def test_low_cardinality_columns_are_categorical_and_dates_parsed(self):
+        frame = read_advisor_csv(io.StringIO(ADVISOR_CSV))
+        self.assertEqual(frame['Category'].dtype.name, 'category')
+        self.assertEqual(frame['Resource Group'].dtype.name, 'category')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(frame['Updated Date']))
+        self.assertTrue(pd.api.types.is_float_dtype(frame['Potential Annual Cost Savings']))
+
+    def test_selector_reads_only_requested_columns_and_keeps_full_header(self):
+        selector = ColumnSelector(ENGINE_COLUMNS + ['Not In File'])
+        frame = read_advisor_csv(io.StringIO(ADVISOR_CSV), selector=selector)
+        self.assertEqual(set(frame.columns), set(ENGINE_COLUMNS))
+        self.assertEqual(len(selector.header), 14)
+
+
+class SnapshotDirMixin:
+    """Snapshots en un directorio temporal por test"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(advisor_snapshot, 'SNAPSHOT_DIR', directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class AdvisorSnapshotTests(SnapshotDirMixin, SimpleTestCase):
+
+    def test_snapshot_is_written_in_the_analysis_pass(self):
+        csv_file_id = uuid.uuid4()
+        aggregates = aggregate_advisor_csv(io.StringIO(ADVISOR_CSV), chunk_size=2,
+                                           snapshot_path=get_snapshot_path(csv_file_id))
+        self.assertTrue(snapshot_exists(csv_file_id))
+
+        frame = load_advisor_snapshot(csv_file_id, ['Category', 'Resource Name', 'Missing'])
+        self.assertEqual(list(frame.columns), ['Category', 'Resource Name'])
+        self.assertEqual(len(frame), 5)
+        self.assertEqual(frame['Category'].dtype.name, 'category')
+
+        reread = aggregate_advisor_snapshot(csv_file_id)
+        self.assertEqual(reread.rows_read, aggregates.rows_read)
+        self.assertEqual(reread.category_counts, aggregates.category_counts)
+        self.assertAlmostEqual(reread.annual_savings_total, aggregates.annual_savings_total)
+
+    def test_linked_snapshot_survives_deleting_the_original(self):
+        original, copy = uuid.uuid4(), uuid.uuid4()
+        aggregate_advisor_csv(io.StringIO(ADVISOR_CSV), snapshot_path=get_snapshot_path(original))
+        self.assertTrue(link_advisor_snapshot(original, copy))
+
+        delete_advisor_snapshot(original)
+        self.assertFalse(snapshot_exists(original))
+        self.assertEqual(len(load_advisor_snapshot(copy)), 5)
+
+    def test_failed_snapshot_leaves_no_partial_file(self):
+        csv_file_id = uuid.uuid4()
+        with mock.patch.object(advisor_snapshot.AdvisorSnapshotWriter, 'write', side_effect=OSError('disk full')):
+            aggregates = aggregate_advisor_csv(io.StringIO(ADVISOR_CSV), snapshot_path=get_snapshot_path(csv_file_id))
+        self.assertEqual(aggregates.rows_read, 5)
+        self.assertFalse(snapshot_exists(csv_file_id))
+
+
+class CSVFileSnapshotCleanupTests(SnapshotDirMixin, TestCase):
+
+    def test_deleting_a_csv_file_removes_its_snapshot(self):
+        user = User.objects.create(email='snapshot@example.com', username='snapshot')
+        csv_file = CSVFile.objects.create(user=user, original_filename='advisor.csv', file_size=len(ADVISOR_CSV))
+        aggregate_advisor_csv(io.StringIO(ADVISOR_CSV), snapshot_path=get_snapshot_path(csv_file.id))
+        path = get_snapshot_path(csv_file.id)
+
+        csv_file.delete()
+        self.assertFalse(os.path.exists(path))
+
+
+class ProgressReporterTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_updates_are_throttled_but_stage_changes_are_published(self):
+        reporter = ProgressReporter('csv', 'file-1', user_id=7)
+        reporter.update('parsing', total_bytes=1000, bytes_parsed=0)
+        reporter.update(bytes_parsed=250)
+        self.assertEqual(get_progress('csv', 'file-1')['bytes_parsed'], 0)
+
+        reporter.update('saving', bytes_parsed=500)
+        state = get_progress('csv', 'file-1')
+        self.assertEqual((state['stage'], state['percent']), ('saving', 50.0))
+
+        reporter.complete(rows_aggregated=3)
+        state = get_progress('csv', 'file-1')
+        self.assertEqual((state['status'], state['percent'], state['rows_aggregated']), ('completed', 100.0, 3))
+
+    def test_progress_is_only_visible_to_its_owner(self):
+        ProgressReporter('report', 'r1', user_id=7).update('rendering_html')
+        self.assertIsNotNone(get_progress_for_user('report', 'r1', mock.Mock(id=7)))
+        self.assertIsNone(get_progress_for_user('report', 'r1', mock.Mock(id=8)))
+
+    def test_cache_errors_do_not_interrupt_the_task(self):
+        reporter = ProgressReporter('csv', 'file-2')
+        with mock.patch.object(cache, 'set', side_effect=ConnectionError('redis down')):
+            reporter.update('parsing')
+            reporter.fail('boom')
+        self.assertEqual(reporter.state['status'], 'failed')
+
+
+class TieredCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.tiered = TieredCache(local=LocalLRUCache(max_bytes=10000))
+
+    def test_local_lru_is_bounded_by_bytes(self):
+        lru = LocalLRUCache(max_bytes=100)
+        lru.set('a', 'A', 40)
+        lru.set('b', 'B', 40)
+        lru.get('a')
+        lru.set('c', 'C', 40)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c')), ('A', 'C'))
+        self.assertLessEqual(lru.current_bytes, 100)
+
+    def test_large_values_are_compressed_in_the_remote_tier(self):
+        html = '<tr><td>vm</td></tr>' * 500
+        data = serialize(html)
+        self.assertLess(len(data), len(html))
+        self.assertEqual(deserialize(data), html)
+
+        self.tiered.set('html', html, 60)
+        self.tiered.local.clear()
+        self.assertEqual(self.tiered.get('html'), html)
+
+    def test_concurrent_misses_run_the_producer_once(self):
+        calls = []
+
+        def producer():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.tiered.get_or_set('key', producer, 60)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def test_remote_errors_are_cache_misses(self):
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError('redis down')), \
+                mock.patch.object(cache, 'add', side_effect=ConnectionError('redis down')), \
+                mock.patch.object(cache, 'set', side_effect=ConnectionError('redis down')):
+            self.assertEqual(self.tiered.get_or_set('key', lambda: 'value', 60), 'value')
+        self.assertEqual(self.tiered.local.get('key'), 'value')
+
+
+class CacheGenerationsTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.generations = CacheGenerations('test', local_ttl=0)
+
+    def test_bump_changes_only_its_scope(self):
+        before = self.generations.get_many(['global', 'report:1'])
+        self.generations.bump('report:1')
+        after = self.generations.get_many(['global', 'report:1'])
+        self.assertEqual(after['global'], before['global'])
+        self.assertGreater(after['report:1'], before['report:1'])
+
+    def test_counters_expire_after_the_entries(self):
+        self.assertGreater(GENERATION_TIMEOUT, ReportCacheManager.CACHE_TIMEOUT)
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add, \
+                mock.patch.object(cache, 'touch', wraps=cache.touch) as touch:
+            self.generations.get_many(['global'])
+            self.generations.bump('global')
+        self.assertEqual(add.call_args.args[2], GENERATION_TIMEOUT)
+        touch.assert_called_once_with('test:gen:global', GENERATION_TIMEOUT)
+
+    def test_unreadable_generations_bypass_the_cache(self):
+        with mock.patch.object(cache, 'get_many', side_effect=ConnectionError('redis down')):
+            self.assertIsNone(self.generations.get_many(['global']))
+
+
+class CountingGenerator:
+    """Generador de HTML de prueba: cuenta los renders"""
+    CACHE_NAME = 'test'
+    CACHE_VERSION = 1
+
+    def __init__(self, fallback=False):
+        self.fallback = fallback
+        self.calls = 0
+        self.used_fallback = False
+
+    def generate_complete_html(self, report):
+        self.calls += 1
+        self.used_fallback = self.fallback
+        return f"<h1>{report.title}</h1><p>{self.calls}</p>"
+
+
+class ReportHTMLCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        report_cache.local.clear()
+        self.user = User.objects.create(email='html@example.com', username='html')
+        self.csv_file = CSVFile.objects.create(user=self.user, original_filename='a.csv', file_size=1,
+                                               analysis_data={'rows': 1})
+        self.report = Report.objects.create(user=self.user, csv_file=self.csv_file, title='Costs')
+
+    def test_html_is_rendered_once_per_data_version(self):
+        generator = CountingGenerator()
+        first = ReportCacheManager.render_html(self.report, generator)
+        self.assertEqual(ReportCacheManager.render_html(self.report, generator), first)
+        self.assertEqual(generator.calls, 1)
+
+        # Nuevos datos del CSV: nueva huella (y la señal invalida las variantes)
+        self.csv_file.analysis_data = {'rows': 2}
+        self.csv_file.save()
+        self.report.refresh_from_db()
+        ReportCacheManager.render_html(self.report, generator)
+        self.assertEqual(generator.calls, 2)
+
+    def test_stale_entry_is_not_served_without_invalidation(self):
+        generator = CountingGenerator()
+        ReportCacheManager.render_html(self.report, generator)
+
+        # Cambio que no pasa por save(): la huella lo detecta igualmente
+        self.report.title = 'Security'
+        self.assertIn('Security', ReportCacheManager.render_html(self.report, generator))
+        self.assertEqual(generator.calls, 2)
+
+    def test_html_is_rendered_uncached_when_generations_are_unavailable(self):
+        generator = CountingGenerator()
+        ReportCacheManager.render_html(self.report, generator)
+
+        # Sin generaciones la entrada local podría estar invalidada desde otro proceso
+        report_generations._local.clear()
+        with mock.patch.object(cache, 'get_many', side_effect=ConnectionError('redis down')):
+            ReportCacheManager.render_html(self.report, generator)
+        self.assertEqual(generator.calls, 2)
+
+    def test_fallback_html_is_not_cached(self):
+        generator = CountingGenerator(fallback=True)
+        ReportCacheManager.render_html(self.report, generator)
+        ReportCacheManager.render_html(self.report, generator)
+        self.assertEqual(generator.calls, 2)
+
+
+class PDFBatchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='batch@example.com', username='batch')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.reports = [Report.objects.create(user=self.user, title=f'r{i}') for i in range(5)]
+
+    def test_reports_are_split_round_robin(self):
+        self.assertEqual(split_lanes(['a', 'b', 'c', 'd', 'e'], 2), [['a', 'c', 'e'], ['b', 'd']])
+        self.assertEqual(split_lanes(['a'], 4), [['a']])
+
+    def test_batch_runs_in_bounded_lanes(self):
+        ids = [str(report.id) for report in self.reports]
+        with mock.patch('celery.chord') as chord:
+            response = self.client.post(reverse('reports-batch-generate-pdfs'),
+                                        {'report_ids': ids, 'concurrency': 2}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['concurrency'], 2)
+
+        header = chord.call_args.args[0]
+        lanes = [[task.args[0] for task in lane.tasks] for lane in header.tasks]
+        self.assertEqual([len(lane) for lane in lanes], [3, 2])
+        self.assertEqual(sorted(sum(lanes, [])), sorted(ids))
+
+    def test_batch_status_reports_each_report(self):
+        def generate(report, progress=None):
+            if report.title == 'r1':
+                raise RuntimeError('render failed')
+            progress.complete(pdf_url=f'https://blobs/{report.id}.pdf')
+            return {'success': True, 'urls': {'pdf': f'https://blobs/{report.id}.pdf'}, 'errors': []}
+
+        ids = [str(report.id) for report in self.reports[:3]]
+        # Sin broker el lote se genera en la propia petición
+        with mock.patch('celery.chord', side_effect=ConnectionError('no broker')), \
+                mock.patch('apps.storage.services.complete_report_service.complete_report_service.generate_complete_report',
+                           side_effect=generate):
+            response = self.client.post(reverse('reports-batch-generate-pdfs'), {'report_ids': ids}, format='json')
+
+        status_response = self.client.get(response['Location'])
+        self.assertEqual(status_response.data['status'], 'completed')
+        self.assertEqual(status_response.data['counts']['completed'], 2)
+        self.assertEqual(status_response.data['counts']['failed'], 1)
+        self.assertEqual(status_response.data['percent'], 100.0)
+        failed = [item for item in status_response.data['reports'] if item['status'] == 'failed']
+        self.assertEqual(failed[0]['error'], 'render failed')
+
+    def test_other_users_reports_are_not_batched(self):
+        other = User.objects.create(email='other@example.com', username='other')
+        foreign = Report.objects.create(user=other, title='foreign')
+        response = self.client.post(reverse('reports-batch-generate-pdfs'),
+                                    {'report_ids': [str(foreign.id)]}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class StageGraphTests(SimpleTestCase):
+
+    def test_independent_stages_overlap_and_dependents_get_results(self):
+        def slow(value):
+            def stage(inputs):
+                time.sleep(0.2)
+                return value
+            return stage
+
+        graph = StageGraph('test')
+        graph.add('html', slow('<html>'))
+        graph.add('dataframe', slow('parquet'))
+        graph.add('pdf', lambda inputs: inputs['html'] + ' -> pdf', after=['html'])
+        outcome = graph.run(max_workers=2)
+
+        self.assertEqual(outcome.results['pdf'], '<html> -> pdf')
+        self.assertEqual(outcome.results['dataframe'], 'parquet')
+        self.assertLess(outcome.timings['total'], 380)
+        self.assertEqual(set(outcome.timings), {'html', 'dataframe', 'pdf', 'total'})
+
+    def test_failure_skips_only_its_dependents(self):
+        def fail(inputs):
+            raise RuntimeError('render failed')
+
+        graph = StageGraph('test')
+        graph.add('html', lambda inputs: '<html>')
+        graph.add('pdf', fail, after=['html'])
+        graph.add('report_update', lambda inputs: True, after=['pdf'])
+        graph.add('notify', lambda inputs: True, after=['report_update'])
+        graph.add('dataframe', lambda inputs: 'parquet')
+        outcome = graph.run()
+
+        self.assertIsInstance(outcome.errors['pdf'], RuntimeError)
+        self.assertEqual(outcome.skipped, ['report_update', 'notify'])
+        self.assertTrue(outcome.ok('dataframe'))
+
+    def test_unknown_dependency_is_rejected(self):
+        with self.assertRaises(ValueError):
+            StageGraph().add('pdf', lambda inputs: None, after=['html'])
+
+
+def advisor_frame(rows):
+    return pd.DataFrame(rows, columns=[
+        'Subscription ID', 'Resource Name', 'Recommendation', 'Category', 'Business Impact',
+        'Type', 'Resource Group', 'Potential Annual Cost Savings', 'Potential Cost Savings Currency',
+    ])
+
+
+def aggregate(frame):
+    aggregates = AdvisorAggregates()
+    aggregates.update(frame)
+    return aggregates
+
+
+class AdvisorDeltaTests(SimpleTestCase):
+    previous = advisor_frame([
+        ['s1', 'vm1', 'Resize VM', 'Cost', 'High', 'vm', 'rg1', 1200, 'USD'],
+        ['s1', 'vm2', 'Resize VM', 'Cost', 'Medium', 'vm', 'rg1', 600, 'USD'],
+        ['s1', 'db1', 'Enable backup', 'Reliability', 'High', 'sql', 'rg2', None, None],
+        ['s2', 'kv1', 'Enable purge protection', 'Security', 'Low', 'kv', 'rg3', None, None],
+    ])
+    current = advisor_frame([
+        # Sin cambios
+        ['s1', 'vm1', 'Resize VM', 'Cost', 'High', 'vm', 'rg1', 1200, 'USD'],
+        # Modificada: impacto y ahorro distintos
+        ['s1', 'vm2', 'Resize VM', 'Cost', 'High', 'vm', 'rg1', 900, 'USD'],
+        # Sin cambios
+        ['s2', 'kv1', 'Enable purge protection', 'Security', 'Low', 'kv', 'rg3', None, None],
+        # Nuevas (db1 resuelta)
+        ['s2', 'vm9', 'Shut down VM', 'Cost', 'High', 'vm', 'rg4', 3000, 'USD'],
+        ['s2', 'app1', 'Use HTTPS', 'Security', 'Medium', 'web', 'rg4', None, None],
+    ])
+
+    def test_counts(self):
+        delta = diff_advisor_frames(self.previous, self.current)
+        self.assertEqual(delta.added.rows_read, 2)
+        self.assertEqual(delta.resolved.rows_read, 1)
+        self.assertEqual(delta.changed_count, 1)
+        self.assertEqual(delta.unchanged_count, 2)
+        self.assertEqual({item['resource_name'] for item in delta.top_added}, {'vm9', 'app1'})
+
+    def test_apply_matches_full_recompute(self):
+        delta = diff_advisor_frames(self.previous, self.current)
+        applied = delta.apply(aggregate(self.previous))
+        full = aggregate(self.current)
+
+        self.assertEqual(applied.rows_read, full.rows_read)
+        self.assertEqual(dict(applied.group_counts), dict(full.group_counts))
+        self.assertEqual(applied.category_counts, full.category_counts)
+        self.assertEqual(applied.impact_counts, full.impact_counts)
+        self.assertEqual(dict(applied.currency_counts), dict(full.currency_counts))
+        self.assertAlmostEqual(applied.annual_savings_total, full.annual_savings_total)
+        self.assertEqual(applied.rows_with_savings, full.rows_with_savings)
+        self.assertEqual(applied.unique_resources, full.unique_resources)
+        self.assertEqual(applied.unique_resource_groups, full.unique_resource_groups)
+
+    def test_duplicate_keys_are_compared_as_multisets(self):
+        row = ['s1', 'vm1', 'Resize VM', 'Cost', 'High', 'vm', 'rg1', 100, 'USD']
+        delta = diff_advisor_frames(advisor_frame([row]), advisor_frame([row, row]))
+        self.assertEqual(delta.added.rows_read, 1)
+        self.assertEqual(delta.unchanged_count, 1)
+        self.assertEqual(delta.resolved.rows_read, 0)
+
+
+class SavingsParserTests(SimpleTestCase):
+
+    def parse(self, *values):
+        return parse_savings_amounts(pd.Series(values, dtype=object)).tolist()
+
+    def test_sign_before_or_after_currency(self):
+        self.assertEqual(
+            self.parse('-50', '(50)', '$-50', 'USD -50', '€(50)', '$50', 'USD 1,234.5', '100 - 200'),
+            [-50, -50, -50, -50, -50, 50, 1234.5, 150],
+        )
+
+    def test_each_range_endpoint_keeps_its_sign(self):
+        self.assertEqual(self.parse('-10 - -20', '-10 - 20', '(100 - 200)'), [-15, 5, -150])
+
+    def test_dot_followed_by_three_digits_depends_on_currency(self):
+        # Con símbolo: EUR/BRL agrupan miles con punto, USD no
+        self.assertEqual(self.parse('€1.500', 'R$ 2.500,75', '$1.500', '0.125'), [1500, 2500.75, 1.5, 0.125])
+
+        # Sin símbolo decide la moneda declarada
+        frame = normalize_savings(pd.Series(['1.500', '1.500', '12'], dtype=object),
+                                  pd.Series(['EUR', 'USD', None], dtype=object))
+        self.assertEqual(frame['amount'].tolist(), [1500, 1.5, 12])
+        self.assertEqual(frame['currency'].tolist(), ['EUR', 'USD', 'USD'])
+
+    def test_numeric_columns_are_returned_as_is(self):
+        self.assertEqual(parse_savings_amounts(pd.Series([1.5, 2.0, None])).tolist()[:2], [1.5, 2.0])
+
+
+class ReportKeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='keyset@example.com', username='keyset')
+        base = timezone.now()
+        for i in range(25):
+            report = Report.objects.create(user=cls.user, title=f'r{i}', report_type='comprehensive')
+            # Grupos de 3 reportes con el mismo created_at
+            Report.objects.filter(pk=report.pk).update(created_at=base - datetime.timedelta(minutes=i // 3))
+        cls.expected = list(Report.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def page(self, url):
+        paginator = ReportKeysetPagination()
+        rows = paginator.paginate_queryset(Report.objects.filter(user=self.user),
+                                           Request(APIRequestFactory().get(url)))
+        return [row.pk for row in rows], paginator.get_next_link(), paginator.get_previous_link()
+
+    def test_next_links_walk_all_rows_across_ties(self):
+        seen, url, previous_links = [], '/api/reports/?limit=4', []
+        while url:
+            rows, url, previous = self.page(url)
+            seen += rows
+            previous_links.append(previous)
+        self.assertEqual(seen, self.expected)
+        self.assertIsNone(previous_links[0])
+
+    def test_previous_link_returns_the_previous_page(self):
+        first, next_url, _ = self.page('/api/reports/?limit=4')
+        second, next_url, previous_url = self.page(next_url)
+        third, _, previous_url = self.page(next_url)
+        self.assertEqual(self.page(previous_url)[0], second)
+        self.assertEqual(first + second + third, self.expected[:12])
+
+    def test_ascending_ordering(self):
+        rows, _, _ = self.page('/api/reports/?limit=100&ordering=created_at')
+        self.assertEqual(rows, list(reversed(self.expected)))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.page('/api/reports/?cursor=not-a-cursor')
+
+    def test_list_is_paged_by_default(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = client.get(reverse('reports-list')).data
+        self.assertEqual(len(data['results']), ReportKeysetPagination.page_size)
+        self.assertNotIn('count', data)
+
+        rest = client.get(data['next']).data
+        self.assertIsNone(rest['next'])
+        self.assertEqual([row['id'] for row in data['results'] + rest['results']],
+                         [str(pk) for pk in self.expected])
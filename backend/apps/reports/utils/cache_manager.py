@@ -1,56 +1,170 @@
-# apps/reports/utils/cache_manager.py
-from django.core.cache import cache
 from django.conf import settings
 import hashlib
 import json
+import logging
+from .tiered_cache import report_cache, report_generations
+
+logger = logging.getLogger(__name__)
+
+
+def compute_analysis_fingerprint(analysis_data) -> str:
+    """Huella (SHA-256) de un analysis_data; se guarda en el modelo al salvarlo"""
+    if not analysis_data:
+        return ''
+    payload = json.dumps(analysis_data, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
 
 class ReportCacheManager:
-    """Gestor de caché para reportes HTML"""
-    
+    """
+    Caché del HTML renderizado de los reportes.
+
+    La entrada de cada (reporte, generador, categoría) guarda junto al HTML la
+    huella de los datos con los que se renderizó: las huellas de analysis_data
+    del reporte y del CSV (calculadas al guardar, sin leer el archivo), la
+    versión del generador y los campos que aparecen en el HTML. Si cualquiera
+    cambia la entrada deja de ser válida aunque no se haya invalidado.
+
+    Las entradas viven en report_cache (LRU en memoria + Redis comprimido) y sus
+    claves incluyen las generaciones global, del usuario y del reporte: invalidar
+    es incrementar uno de esos contadores (report_generations). Si las
+    generaciones no se pueden leer no hay clave y se renderiza sin caché.
+    """
+
     CACHE_PREFIX = 'azure_report_html'
     CACHE_TIMEOUT = getattr(settings, 'REPORT_CACHE_TIMEOUT', 3600)  # 1 hora
-    
-    @classmethod
-    def get_cache_key(cls, report_id, csv_hash=None):
-        """Genera clave de caché única"""
-        key_data = f"{report_id}_{csv_hash or 'no_csv'}"
-        return f"{cls.CACHE_PREFIX}_{hashlib.md5(key_data.encode()).hexdigest()}"
-    
-    @classmethod
-    def get_csv_hash(cls, csv_file_path):
-        """Calcula hash del archivo CSV"""
-        try:
-            import hashlib
-            with open(csv_file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
-        except (FileNotFoundError, OSError):
+
+    @staticmethod
+    def _scopes(report):
+        return ['global', f'user:{report.user_id}', f'report:{report.id}']
+
+    @classmethod
+    def get_cache_key(cls, report, renderer, category=None):
+        """Genera clave de caché única (incluye las generaciones vigentes); None sin generaciones"""
+        scopes = cls._scopes(report)
+        generations = report_generations.get_many(scopes)
+        if generations is None:
+            return None
+        generation = '.'.join(str(generations[scope]) for scope in scopes)
+        return f"{cls.CACHE_PREFIX}:{generation}:{report.id}:{renderer}:{category or 'all'}"
+
+    @classmethod
+    def get_fingerprint(cls, report, version) -> str:
+        """Huella de todo lo que determina el HTML de un reporte"""
+        csv_file = report.csv_file
+        key_data = '|'.join([
+            str(version),
+            report.analysis_fingerprint or '',
+            report.title or '',
+            report.status or '',
+            str(report.csv_file_id or ''),
+            csv_file.analysis_fingerprint if csv_file else '',
+            csv_file.original_filename if csv_file else '',
+        ])
+        return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_cached_html(cls, report, renderer, version, category=None):
+        """Obtiene HTML del caché si existe y corresponde a los datos actuales"""
+        cache_key = cls.get_cache_key(report, renderer, category)
+        entry = report_cache.get(cache_key) if cache_key else None
+        if not entry or entry.get('fingerprint') != cls.get_fingerprint(report, version):
             return None
-    
-    @classmethod
-    def get_cached_html(cls, report):
-        """Obtiene HTML del caché si existe"""
-        csv_hash = None
-        if report.get_csv_file_path():
-            csv_hash = cls.get_csv_hash(report.get_csv_file_path())
-        
-        cache_key = cls.get_cache_key(report.id, csv_hash)
-        return cache.get(cache_key)
-    
-    @classmethod
-    def cache_html(cls, report, html_content):
+        return entry.get('html')
+
+    @classmethod
+    def cache_html(cls, report, html_content, renderer, version, category=None):
         """Guarda HTML en caché"""
-        csv_hash = None
-        if report.get_csv_file_path():
-            csv_hash = cls.get_csv_hash(report.get_csv_file_path())
-        
-        cache_key = cls.get_cache_key(report.id, csv_hash)
-        cache.set(cache_key, html_content, cls.CACHE_TIMEOUT)
+        cache_key = cls.get_cache_key(report, renderer, category)
+        if cache_key is None:
+            return None
+        report_cache.set(cache_key, {
+            'fingerprint': cls.get_fingerprint(report, version),
+            'html': html_content,
+        }, cls.CACHE_TIMEOUT)
         return cache_key
-    
+
+    @classmethod
+    def render_html(cls, report, generator, category=None):
+        """
+        HTML del reporte con el generador indicado, renderizado como mucho una
+        vez por versión de los datos (también con peticiones concurrentes).
+        El HTML de fallback no se guarda.
+
+        Args:
+            report: Report
+            generator: EnhancedHTMLReportGenerator o RealDataHTMLGenerator
+                (definen CACHE_NAME y CACHE_VERSION)
+            category: Categoría (solo generate_category_html)
+        """
+        renderer, version = generator.CACHE_NAME, generator.CACHE_VERSION
+        fingerprint = cls.get_fingerprint(report, version)
+        rendered = {}
+
+        def render():
+            generator.used_fallback = False
+            if category:
+                rendered['html'] = generator.generate_category_html(report, category)
+            else:
+                rendered['html'] = generator.generate_complete_html(report)
+            if generator.used_fallback:
+                return None
+            return {'fingerprint': fingerprint, 'html': rendered['html']}
+
+        cache_key = cls.get_cache_key(report, renderer, category)
+        if cache_key is None:
+            render()
+            return rendered['html']
+
+        entry = report_cache.get_or_set(
+            cache_key,
+            render,
+            cls.CACHE_TIMEOUT,
+            validate=lambda cached: cached.get('fingerprint') == fingerprint
+        )
+        if entry is None:
+            return rendered.get('html')
+        if 'html' not in rendered:
+            logger.info(f"HTML de {report.id} servido desde caché ({renderer}, {category or 'all'})")
+        return entry['html']
+
+    @classmethod
+    def get_analysis_payload(cls, csv_file):
+        """
+        analysis_data de un CSVFile desde la caché, por su huella. Si csv_file
+        se cargó con defer('analysis_data') el JSON solo se lee de la base de
+        datos en un fallo de caché.
+        """
+        if not csv_file.analysis_fingerprint:
+            return csv_file.analysis_data
+
+        generations = report_generations.get_many(['global'])
+        if generations is None:
+            return csv_file.analysis_data
+        generation = generations['global']
+        return report_cache.get_or_set(
+            f"azure_analysis:{generation}:{csv_file.id}:{csv_file.analysis_fingerprint}",
+            lambda: csv_file.analysis_data or None,
+            cls.CACHE_TIMEOUT
+        )
+
     @classmethod
     def invalidate_cache(cls, report):
-        """Invalida caché del reporte"""
-        # Eliminar múltiples versiones posibles
-        for csv_hash in [None, cls.get_csv_hash(report.get_csv_file_path())]:
-            cache_key = cls.get_cache_key(report.id, csv_hash)
-            cache.delete(cache_key)
\ No newline at end of file
+        """Invalida caché del reporte (todas sus variantes)"""
+        report_generations.bump(f'report:{report.id}')
+
+    @classmethod
+    def invalidate_csv_file(cls, csv_file):
+        """Invalida caché de los reportes que usan un CSV"""
+        for report_id in csv_file.reports.values_list('id', flat=True):
+            report_generations.bump(f'report:{report_id}')
+
+    @classmethod
+    def invalidate_user(cls, user_id):
+        """Invalida caché de todos los reportes de un usuario"""
+        report_generations.bump(f'user:{user_id}')
+
+    @classmethod
+    def invalidate_all(cls):
+        """Invalida toda la caché de reportes y análisis"""
+        report_generations.bump('global')
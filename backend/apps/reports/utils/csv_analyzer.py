@@ -1,9 +1,7 @@
 # backend/apps/reports/utils/csv_analyzer.py
-import pandas as pd
 import logging
 from typing import Dict, Any
-from decimal import Decimal, InvalidOperation
-import re
+from apps.reports.analyzers.advisor_engine import AdvisorAggregates, aggregate_advisor_csv
 
 logger = logging.getLogger(__name__)
 
@@ -49,24 +47,35 @@ class AzureCSVAnalyzer:
         - Retiring feature: String
         """
         try:
-            # Leer CSV
-            df = pd.read_csv(csv_file_path)
-            logger.info(f"CSV cargado: {len(df)} filas")
+            # Una sola pasada sobre el CSV; el resto del análisis trabaja sobre los agregados
+            aggregates = aggregate_advisor_csv(csv_file_path)
+            logger.info(f"CSV cargado: {aggregates.rows_read} filas")
+            return self.analyze_aggregates(aggregates)
             
+        except Exception as e:
+            logger.error(f"Error analizando CSV: {e}")
+            return self._get_default_template_data()
+
+    def analyze_aggregates(self, aggregates: AdvisorAggregates) -> Dict[str, Any]:
+        """
+        Construir los datos del template a partir de agregados ya calculados
+        (p.ej. los guardados en csv_file.analysis_data['aggregates'])
+        """
+        try:
             # Análisis básico
-            total_recommendations = len(df)
+            total_recommendations = aggregates.rows_read
             
             # 1. ANÁLISIS POR CATEGORÍA
-            category_analysis = self._analyze_categories(df)
+            category_analysis = self._analyze_categories(aggregates)
             
             # 2. ANÁLISIS POR IMPACTO DE NEGOCIO  
-            impact_analysis = self._analyze_business_impact(df)
+            impact_analysis = self._analyze_business_impact(aggregates)
             
             # 3. ANÁLISIS DE COSTOS
-            cost_analysis = self._analyze_cost_savings(df)
+            cost_analysis = self._analyze_cost_savings(aggregates)
             
             # 4. ANÁLISIS DE RECURSOS
-            resource_analysis = self._analyze_resources(df)
+            resource_analysis = self._analyze_resources(aggregates)
             
             # 5. CALCULAR MÉTRICAS PARA EL TEMPLATE
             template_data = self._calculate_template_metrics(
@@ -81,17 +90,17 @@ class AzureCSVAnalyzer:
             return template_data
             
         except Exception as e:
-            logger.error(f"Error analizando CSV: {e}")
+            logger.error(f"Error analizando agregados del CSV: {e}")
             return self._get_default_template_data()
 
-    def _analyze_categories(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_categories(self, aggregates: AdvisorAggregates) -> Dict[str, Any]:
         """Analizar columna 'Category'"""
         try:
-            if 'Category' not in df.columns:
+            if not aggregates.has_category:
                 logger.warning("Columna 'Category' no encontrada")
                 return {}
                 
-            category_counts = df['Category'].value_counts().to_dict()
+            category_counts = aggregates.category_counts
             
             # Mapear a nombres estándar
             mapped_categories = {}
@@ -106,14 +115,14 @@ class AzureCSVAnalyzer:
             logger.error(f"Error analizando categorías: {e}")
             return {}
 
-    def _analyze_business_impact(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_business_impact(self, aggregates: AdvisorAggregates) -> Dict[str, Any]:
         """Analizar columna 'Business Impact'"""
         try:
-            if 'Business Impact' not in df.columns:
+            if 'Business Impact' not in aggregates.columns:
                 logger.warning("Columna 'Business Impact' no encontrada")
                 return {}
                 
-            impact_counts = df['Business Impact'].value_counts().to_dict()
+            impact_counts = aggregates.all_impact_counts
             
             # Calcular métricas específicas
             high_priority = impact_counts.get('High', 0)
@@ -142,27 +151,15 @@ class AzureCSVAnalyzer:
             logger.error(f"Error analizando impacto de negocio: {e}")
             return {}
 
-    def _analyze_cost_savings(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_cost_savings(self, aggregates: AdvisorAggregates) -> Dict[str, Any]:
         """Analizar columna 'Potential Annual Cost Savings'"""
         try:
-            if 'Potential Annual Cost Savings' not in df.columns:
+            if 'Potential Annual Cost Savings' not in aggregates.columns:
                 logger.warning("Columna de ahorros no encontrada")
                 return {'total_annual_savings': 0, 'total_monthly_savings': 0}
             
-            # Limpiar y convertir valores de ahorro
-            total_annual_savings = 0
-            valid_savings = 0
-            
-            for savings_str in df['Potential Annual Cost Savings'].fillna('0'):
-                try:
-                    # Limpiar string: remover símbolos de moneda, comas, etc.
-                    cleaned = re.sub(r'[^\d.-]', '', str(savings_str))
-                    if cleaned:
-                        savings_value = float(cleaned)
-                        total_annual_savings += savings_value
-                        valid_savings += 1
-                except (ValueError, InvalidOperation):
-                    continue
+            # Los valores ya se limpiaron y sumaron durante la pasada del motor
+            total_annual_savings = aggregates.annual_savings_total
             
             # Calcular ahorros mensuales
             total_monthly_savings = total_annual_savings / 12
@@ -172,34 +169,33 @@ class AzureCSVAnalyzer:
             return {
                 'total_annual_savings': round(total_annual_savings, 2),
                 'total_monthly_savings': round(total_monthly_savings, 2),
-                'rows_with_savings': valid_savings,
-                'currency': self._detect_currency(df)
+                'rows_with_savings': aggregates.rows_with_savings,
+                'currency': self._detect_currency(aggregates),
+                'savings_by_currency': {k: round(v, 2) for k, v in aggregates.savings_by_currency.items()}
             }
             
         except Exception as e:
             logger.error(f"Error analizando ahorros de costo: {e}")
             return {'total_annual_savings': 0, 'total_monthly_savings': 0}
 
-    def _analyze_resources(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_resources(self, aggregates: AdvisorAggregates) -> Dict[str, Any]:
         """Analizar recursos (Resource Name, Type, Resource Group)"""
         try:
             resource_data = {}
             
             # Recursos únicos
-            if 'Resource Name' in df.columns:
-                unique_resources = df['Resource Name'].nunique()
-                resource_data['unique_resources'] = unique_resources
+            if 'Resource Name' in aggregates.columns:
+                resource_data['unique_resources'] = aggregates.unique_resources
             
             # Tipos de recursos
-            if 'Type' in df.columns:
-                resource_types = df['Type'].value_counts().to_dict()
+            if 'Type' in aggregates.columns:
+                resource_types = aggregates.all_type_counts
                 resource_data['resource_types'] = resource_types
                 resource_data['unique_types'] = len(resource_types)
             
             # Grupos de recursos
-            if 'Resource Group' in df.columns:
-                resource_groups = df['Resource Group'].nunique()
-                resource_data['unique_resource_groups'] = resource_groups
+            if 'Resource Group' in aggregates.columns:
+                resource_data['unique_resource_groups'] = aggregates.unique_resource_groups
             
             logger.info(f"Análisis de recursos: {resource_data.get('unique_resources', 0)} recursos únicos")
             return resource_data
@@ -208,16 +204,9 @@ class AzureCSVAnalyzer:
             logger.error(f"Error analizando recursos: {e}")
             return {}
 
-    def _detect_currency(self, df: pd.DataFrame) -> str:
+    def _detect_currency(self, aggregates: AdvisorAggregates) -> str:
         """Detectar moneda desde la columna Currency"""
-        try:
-            if 'Potential Cost Savings Currency' in df.columns:
-                currencies = df['Potential Cost Savings Currency'].value_counts()
-                if len(currencies) > 0:
-                    return currencies.index[0]  # Moneda más común
-            return 'USD'  # Default
-        except:
-            return 'USD'
+        return aggregates.main_currency or 'USD'  # Moneda más común o default
 
     def _calculate_template_metrics(self, total_recs: int, categories: Dict, impacts: Dict, 
                                   costs: Dict, resources: Dict) -> Dict[str, Any]:
@@ -295,6 +284,7 @@ class AzureCSVAnalyzer:
             
             # Datos adicionales
             'currency': costs.get('currency', 'USD'),
+            'annual_savings_by_currency': costs.get('savings_by_currency', {}),
             'unique_resources': resources.get('unique_resources', 0),
             'resource_types': resources.get('unique_types', 0),
             
@@ -16,8 +16,13 @@ class EnhancedHTMLReportGenerator:
     Generador de reportes HTML usando el nuevo template profesional
     """
     
+    # Identificación en ReportCacheManager; subir la versión al cambiar el HTML generado
+    CACHE_NAME = 'professional'
+    CACHE_VERSION = 1
+    
     def __init__(self):
         self.client_name = "Azure Client"
+        self.used_fallback = False
         
     def generate_complete_html(self, report) -> str:
         """
@@ -28,7 +33,7 @@ class EnhancedHTMLReportGenerator:
             
             # 1. Analizar CSV si existe
             csv_analysis = {}
-            if report.csv_file and os.path.exists(report.cs
+            if report.csv_file:
                 csv_analysis = self._analyze_csv_file(report.csv_file)
             
             # 2. Extraer nombre del cliente
@@ -53,39 +58,53 @@ class EnhancedHTMLReportGenerator:
 
     def _analyze_csv_file(self, csv_file) -> Dict[str, Any]:
         """
-        Analizar archivo CSV usando el analizador específico
+        Analizar archivo CSV usando el analizador específico.
+        El CSV se parsea como mucho una vez; si el upload ya guardó los agregados
+        del motor en analysis_data no se vuelve a leer, y si no los hay se
+        recalculan desde el snapshot Parquet antes de recurrir al CSV.
         """
+        try:
+            from apps.reports.analyzers.advisor_engine import (
+                aggregate_advisor_csv, aggregate_advisor_snapshot, get_stored_aggregates
+            )
+            
+            aggregates = get_stored_aggregates(csv_file.analysis_data)
+            if aggregates is None:
+                aggregates = aggregate_advisor_snapshot(csv_file.id)
+            if aggregates is None:
+                aggregates = aggregate_advisor_csv(csv_file.file.path)
+        except Exception as e:
+            logger.error(f"Error analizando CSV: {e}")
+            return self._get_default_analysis()
+        
         try:
             # Importar el analizador específico
             from .csv_analyzer import AzureCSVAnalyzer
             
             analyzer = AzureCSVAnalyzer()
-            analysis = analyzer.analyze_csv_for_template(csv_file.file.path)
+            analysis = analyzer.analyze_aggregates(aggregates)
             
             logger.info(f"CSV analizado: {analysis.get('total_recommendations', 0)} recomendaciones")
             return analysis
             
         except ImportError:
             logger.error("AzureCSVAnalyzer no disponible, usando análisis básico")
-            return self._basic_csv_analysis(csv_file)
+            return self._basic_csv_analysis(aggregates)
         except Exception as e:
             logger.error(f"Error analizando CSV: {e}")
             return self._get_default_analysis()
 
-    def _basic_csv_analysis(self, csv_file) -> Dict[str, Any]:
+    def _basic_csv_analysis(self, aggregates) -> Dict[str, Any]:
         """
-        Análisis básico del CSV como fallback
+        Análisis básico del CSV como fallback (sobre los mismos agregados)
         """
         try:
-            import pandas as pd
-            
-            df = pd.read_csv(csv_file.file.path)
-            total_rows = len(df)
+            total_rows = aggregates.rows_read
             
             # Análisis básico de categorías
             categories = {}
-            if 'Category' in df.columns:
-                category_counts = df['Category'].value_counts().to_dict()
+            if aggregates.has_category:
+                category_counts = aggregates.category_counts
                 categories = {
                     'cost_optimization': category_counts.get('Cost', 0),
                     'security': category_counts.get('Security', 0),
@@ -94,9 +113,7 @@ class EnhancedHTMLReportGenerator:
                 }
             
             # Análisis básico de impacto
-            high_priority = 0
-            if 'Business Impact' in df.columns:
-                high_priority = len(df[df['Business Impact'] == 'High'])
+            high_priority = aggregates.all_impact_counts.get('High', 0)
             
             return {
                 'total_recommendations': total_rows,
@@ -233,6 +250,7 @@ class EnhancedHTMLReportGenerator:
         """
         Generar HTML básico como fallback
         """
+        self.used_fallback = True
         current_date = timezone.now().strftime('%A, %B %d, %Y')
         
         return f"""
@@ -0,0 +1,143 @@
+# backend/apps/reports/utils/progress.py
+"""
+Progreso de tareas largas (análisis de CSV, generación de reportes) publicado
+en la caché (Redis). El frontend lo consulta sin tocar las tablas de
+CSVFile/Report: el estado incluye el usuario dueño para validar el acceso.
+"""
+import time
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_PREFIX = 'task_progress'
+PROGRESS_TIMEOUT = getattr(settings, 'TASK_PROGRESS_TIMEOUT', 3600)
+
+# Intervalo mínimo entre escrituras en caché para actualizaciones frecuentes
+PROGRESS_MIN_INTERVAL = 0.5
+
+
+def get_progress_key(kind: str, object_id) -> str:
+    return f"{PROGRESS_PREFIX}:{kind}:{object_id}"
+
+
+def get_progress(kind: str, object_id) -> Optional[Dict[str, Any]]:
+    """Último estado publicado para un CSVFile ('csv') o Report ('report')"""
+    try:
+        return cache.get(get_progress_key(kind, object_id))
+    except Exception as e:
+        logger.warning(f"Error leyendo progreso {kind}:{object_id}: {e}")
+        return None
+
+
+def get_progress_for_user(kind: str, object_id, user) -> Optional[Dict[str, Any]]:
+    """Estado publicado si pertenece al usuario (sin consultar la base de datos)"""
+    state = get_progress(kind, object_id)
+    if not state or state.get('user_id') != str(user.id):
+        return None
+    return state
+
+
+def mark_cancelled(kind: str, object_id) -> Optional[Dict[str, Any]]:
+    """Marcar como cancelada una tarea en curso (p. ej. aún en cola, sin reporter activo)"""
+    state = get_progress(kind, object_id)
+    if not state or state.get('status') != 'running':
+        return state
+    state.update(status='cancelled', error='Cancelado', updated_at=timezone.now().isoformat())
+    try:
+        cache.set(get_progress_key(kind, object_id), state, PROGRESS_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Error publicando cancelación {kind}:{object_id}: {e}")
+    return state
+
+
+class ProgressReporter:
+    """
+    Publica el progreso de una tarea por etapas con métricas libres
+    (bytes_parsed, rows_aggregated, html_chars, pdf_pages, upload_bytes_sent...)
+
+    Las actualizaciones se agrupan (como mucho una escritura cada
+    PROGRESS_MIN_INTERVAL segundos) salvo los cambios de etapa y el estado final.
+    Un fallo de la caché nunca interrumpe la tarea.
+    """
+
+    def __init__(self, kind: str, object_id, user_id=None):
+        self.key = get_progress_key(kind, object_id)
+        self.state: Dict[str, Any] = {
+            'kind': kind,
+            'id': str(object_id),
+            'user_id': str(user_id) if user_id is not None else None,
+            'status': 'running',
+            'stage': 'queued',
+            'started_at': timezone.now().isoformat(),
+        }
+        self._last_publish = 0.0
+        # Inicio (epoch) para ignorar cancelaciones anteriores a esta ejecución
+        self.started = time.time()
+
+    @classmethod
+    def resume(cls, kind: str, object_id) -> 'ProgressReporter':
+        """Reporter que continúa el último estado publicado (p. ej. desde otra tarea)"""
+        reporter = cls(kind, object_id)
+        state = get_progress(kind, object_id)
+        if state:
+            reporter.state.update(state)
+        return reporter
+
+    @property
+    def scope(self) -> str:
+        """'<kind>:<id>' (ámbito de cancelación de los renders PDF de la tarea)"""
+        return f"{self.state['kind']}:{self.state['id']}"
+
+    def update(self, stage: Optional[str] = None, **metrics):
+        """Actualizar etapa y/o métricas"""
+        force = stage is not None and stage != self.state['stage']
+        if stage is not None:
+            self.state['stage'] = stage
+        self.state.update(metrics)
+        self._publish(force)
+
+    def bytes_callback(self, stage: str, sent_key: str, total_key: str):
+        """Callback (current, total) para hooks de progreso de subida/lectura"""
+        def callback(current, total=None):
+            metrics = {sent_key: current}
+            if total:
+                metrics[total_key] = total
+            self.update(stage, **metrics)
+        return callback
+
+    def complete(self, **metrics):
+        self.state.update(metrics)
+        self.state['status'] = 'completed'
+        self.state['stage'] = 'completed'
+        self.state['percent'] = 100.0
+        self._publish(force=True)
+
+    def fail(self, error: str):
+        self.state['status'] = 'failed'
+        self.state['error'] = error
+        self._publish(force=True)
+
+    def cancel(self, reason: str = 'Cancelado'):
+        self.state['status'] = 'cancelled'
+        self.state['error'] = reason
+        self._publish(force=True)
+
+    def _publish(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_publish < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_publish = now
+
+        self.state['updated_at'] = timezone.now().isoformat()
+        total = self.state.get('total_bytes')
+        if total and 'bytes_parsed' in self.state and self.state['status'] == 'running':
+            self.state['percent'] = min(100.0, round(self.state['bytes_parsed'] * 100.0 / total, 1))
+
+        try:
+            cache.set(self.key, dict(self.state), PROGRESS_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Error publicando progreso {self.key}: {e}")
@@ -10,14 +10,20 @@ from typing import Optional, Tuple, Dict, Any, List
 import json
 import logging
 import re
+from django.utils.html import escape
 
 logger = logging.getLogger(__name__)
 
 class RealDataHTMLGenerator:
     """Generador HTML que conecta con los datos reales del análisis existente"""
     
+    # Identificación en ReportCacheManager; subir la versión al cambiar el HTML generado
+    CACHE_NAME = 'real_data'
+    CACHE_VERSION = 1
+    
     def __init__(self, client_name=None):
         self.client_name = client_name or "Azure Client"
+        self.used_fallback = False
         
     def generate_complete_html(self, report) -> str:
         """Genera HTML completo usando datos reales del análisis"""
@@ -34,7 +40,7 @@ class RealDataHTMLGenerator:
             client_name = self._extract_client_name(report)
             
             # 3. Generar HTML completo con datos reales
-            html_content = self._generate_complete_report_html(real_data, client_name)
+            html_content = self._generate_complete_report_html(real_data, client_name, self._get_delta(report))
             
             logger.info(f"✅ HTML completo generado exitosamente para {client_name}")
             return html_content
@@ -94,6 +100,16 @@ class RealDataHTMLGenerator:
             logger.error(f"Error obteniendo datos reales: {e}")
             return None
     
+    def _get_delta(self, report) -> Optional[Dict[str, Any]]:
+        """Delta respecto al export anterior guardado en csv_file.analysis_data, si existe"""
+        try:
+            from apps.reports.analyzers.advisor_delta import get_stored_delta
+            if report.csv_file:
+                return get_stored_delta(report.csv_file.analysis_data)
+        except Exception as e:
+            logger.error(f"Error obteniendo delta: {e}")
+        return None
+    
     def _extract_client_name(self, report) -> str:
         """Extraer nombre del cliente del reporte"""
         try:
@@ -140,7 +156,8 @@ class RealDataHTMLGenerator:
         except Exception:
             return "Azure Client"
     
-    def _generate_complete_report_html(self, real_data: Dict[str, Any], client_name: str) -> str:
+    def _generate_complete_report_html(self, real_data: Dict[str, Any], client_name: str,
+                                       delta: Optional[Dict[str, Any]] = None) -> str:
         """Generar HTML completo usando datos reales"""
         try:
             # Extraer datos principales
@@ -177,6 +194,7 @@ class RealDataHTMLGenerator:
         {self._generate_header_section(client_name)}
         {self._generate_summary_section(advisor_score, total_actions, monthly_savings)}
         {self._generate_categories_overview_section(cost_actions, security_actions, reliability_actions, opex_actions)}
+        {self._generate_changes_section(delta)}
         {self._generate_detailed_analysis_section(real_data)}
         {self._generate_conclusions_section(real_data)}
         {self._generate_footer_section()}
@@ -336,6 +354,72 @@ class RealDataHTMLGenerator:
         </div>
         '''
     
+    def _generate_changes_section(self, delta: Optional[Dict[str, Any]]) -> str:
+        """Generar sección "qué cambió" respecto al export anterior"""
+        if not delta:
+            return ''
+        try:
+            counts = delta.get('counts', {})
+            savings = delta.get('annual_savings', {})
+            currency = savings.get('currency') or 'USD'
+            net_change = savings.get('net_change', 0)
+            
+            # Nombres de archivo, categorías y recomendaciones vienen del CSV subido
+            previous_date = escape(str(delta.get('previous_upload_date') or '')[:10])
+            previous_name = escape(delta.get('previous_filename') or '')
+            currency = escape(currency)
+            
+            category_rows = ''.join(
+                f'<tr><td>{escape(category)}</td><td>+{int(values.get("added", 0))}</td>'
+                f'<td>-{int(values.get("resolved", 0))}</td></tr>'
+                for category, values in delta.get('by_category', {}).items()
+            )
+            
+            new_items = ''.join(
+                f'<li><strong>{escape(item.get("impact", ""))}</strong> · {escape(item.get("recommendation", ""))} '
+                f'({escape(item.get("resource_name", ""))})</li>'
+                for item in delta.get('top_added', [])[:10]
+            )
+            
+            return f'''
+            <div class="detailed-analysis">
+                <h2>What Changed Since The Last Analysis</h2>
+                <div class="analysis-section">
+                    <div class="section-header">
+                        <div class="section-icon">🔄</div>
+                        <h3>Compared with {previous_name} ({previous_date})</h3>
+                    </div>
+                    <div class="changes-summary">
+                        <div class="changes-metric">
+                            <div class="metric-value">+{counts.get('added', 0):,}</div>
+                            <div class="metric-label">New Recommendations</div>
+                        </div>
+                        <div class="changes-metric">
+                            <div class="metric-value">-{counts.get('resolved', 0):,}</div>
+                            <div class="metric-label">Resolved</div>
+                        </div>
+                        <div class="changes-metric">
+                            <div class="metric-value">{counts.get('unchanged', 0):,}</div>
+                            <div class="metric-label">Still Open</div>
+                        </div>
+                        <div class="changes-metric">
+                            <div class="metric-value">{net_change:+,.0f} {currency}</div>
+                            <div class="metric-label">Annual Savings Change</div>
+                        </div>
+                    </div>
+                    <table class="changes-table">
+                        <thead><tr><th>Category</th><th>New</th><th>Resolved</th></tr></thead>
+                        <tbody>{category_rows}</tbody>
+                    </table>
+                    {f'<h4>New high-impact items</h4><ul class="changes-list">{new_items}</ul>' if new_items else ''}
+                </div>
+            </div>
+            '''
+            
+        except Exception as e:
+            logger.error(f"Error generando sección de cambios: {e}")
+            return ''
+    
     def _generate_detailed_analysis_section(self, real_data: Dict[str, Any]) -> str:
         """Generar sección de análisis detallado con datos reales"""
         try:
@@ -521,6 +605,7 @@ class RealDataHTMLGenerator:
     
     def _generate_fallback_html(self, report) -> str:
         """Generar HTML de fallback cuando no hay datos reales"""
+        self.used_fallback = True
         client_name = self._extract_client_name(report) if report else "Azure Client"
         
         return f'''
@@ -755,16 +840,33 @@ class RealDataHTMLGenerator:
             font-weight: 600;
         }
         
-        .cost-summary, .security-summary {
+        .cost-summary, .security-summary, .changes-summary {
             display: flex;
             gap: 30px;
         }
         
-        .cost-metric, .security-metric {
+        .cost-metric, .security-metric, .changes-metric {
             text-align: center;
             flex: 1;
         }
         
+        .changes-table {
+            width: 100%;
+            margin-top: 25px;
+            border-collapse: collapse;
+        }
+        
+        .changes-table th, .changes-table td {
+            padding: 8px 12px;
+            border-bottom: 1px solid #e1e8ff;
+            text-align: left;
+        }
+        
+        .changes-list {
+            margin: 10px 0 0 20px;
+            line-height: 1.6;
+        }
+        
         .metric-value {
             font-size: 32px;
             font-weight: bold;
@@ -823,7 +925,7 @@ class RealDataHTMLGenerator:
         }
         
         @media (max-width: 768px) {
-            .summary-section, .cost-summary, .security-summary {
+            .summary-section, .cost-summary, .security-summary, .changes-summary {
                 flex-direction: column;
                 gap: 20px;
             }
@@ -0,0 +1,355 @@
+# backend/apps/reports/utils/tiered_cache.py
+"""
+Caché en dos niveles para HTML renderizado y payloads de análisis.
+
+1. LRU en memoria del proceso, acotado por bytes: los aciertos no pagan red ni
+   unpickling.
+2. Caché de Django (Redis) con los valores comprimidos (zlib).
+
+get_or_set agrupa los fallos concurrentes de una misma clave (single-flight):
+un lock por clave dentro del proceso y un lock con cache.add entre procesos,
+de modo que un reporte frío se renderiza una sola vez aunque lleguen varias
+peticiones a la vez. Un fallo de Redis nunca interrumpe la petición: se trata
+como un fallo de caché.
+
+La invalidación no borra claves: CacheGenerations guarda un contador por
+ámbito (global, usuario, reporte) que forma parte de las claves, e invalidar es
+incrementar un contador. Nada recorre el keyspace de Redis (compartido con el
+broker de Celery); las entradas antiguas expiran por su timeout y los contadores
+por el suyo (GENERATION_TIMEOUT, mayor que el de las entradas).
+"""
+import time
+import uuid
+import zlib
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tamaño máximo del nivel en memoria (por proceso)
+LOCAL_CACHE_MAX_BYTES = getattr(settings, 'REPORT_LOCAL_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+
+# Vida máxima en memoria: acota cuánto sobrevive una entrada invalidada desde otro proceso
+LOCAL_CACHE_TTL = getattr(settings, 'REPORT_LOCAL_CACHE_TTL', 300)
+
+# Los valores menores se guardan sin comprimir en Redis
+COMPRESS_MIN_BYTES = getattr(settings, 'REPORT_CACHE_COMPRESS_MIN_BYTES', 1024)
+
+# Duración del lock entre procesos (tiempo máximo de un render) y espera de los demás
+LOCK_TIMEOUT = getattr(settings, 'REPORT_CACHE_LOCK_TIMEOUT', 120)
+LOCK_WAIT = getattr(settings, 'REPORT_CACHE_LOCK_WAIT', 30)
+LOCK_POLL_INTERVAL = 0.1
+
+# Segundos que un proceso reutiliza los contadores de generación leídos de Redis
+# (retraso máximo con el que ve una invalidación hecha en otro proceso)
+GENERATION_LOCAL_TTL = getattr(settings, 'REPORT_CACHE_GENERATION_TTL', 5)
+
+# Vida de los contadores en Redis. Siempre mayor que la de las entradas que los
+# usan: un contador caducado vuelve con un valor nuevo (ver _initial) y solo
+# invalida de más, pero no debe ocurrir mientras sus entradas siguen vivas
+GENERATION_TIMEOUT = max(
+    getattr(settings, 'REPORT_CACHE_GENERATION_TIMEOUT', 24 * 3600),
+    2 * getattr(settings, 'REPORT_CACHE_TIMEOUT', 3600),
+)
+
+# Cabecera de un byte del valor serializado
+_RAW = b'r'
+_ZLIB = b'z'
+
+
+def serialize(value: Any) -> bytes:
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(payload) < COMPRESS_MIN_BYTES:
+        return _RAW + payload
+    return _ZLIB + zlib.compress(payload, 6)
+
+
+def deserialize(data: bytes) -> Any:
+    header, payload = data[:1], data[1:]
+    if header == _ZLIB:
+        payload = zlib.decompress(payload)
+    return pickle.loads(payload)
+
+
+class LocalLRUCache:
+    """LRU en memoria acotado por el tamaño (bytes serializados) de sus valores"""
+
+    def __init__(self, max_bytes: int = LOCAL_CACHE_MAX_BYTES, ttl: int = LOCAL_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self._entries: 'OrderedDict[str, Tuple[Any, int, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, size: int, timeout: Optional[int] = None):
+        if size > self.max_bytes:
+            return
+        ttl = min(timeout, self.ttl) if timeout else self.ttl
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'bytes': self.current_bytes, 'max_bytes': self.max_bytes}
+
+
+class TieredCache:
+    """LRU local delante de la caché de Django, con single-flight en get_or_set"""
+
+    def __init__(self, alias: str = 'default', local: Optional[LocalLRUCache] = None):
+        self.alias = alias
+        self.local = local or LocalLRUCache()
+        self._key_locks: Dict[str, list] = {}
+        self._key_locks_guard = threading.Lock()
+
+    @property
+    def remote(self):
+        return caches[self.alias]
+
+    # -----------------------------------------
+    # Operaciones básicas
+    # -----------------------------------------
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        try:
+            data = self.remote.get(key)
+        except Exception as e:
+            logger.warning(f"Error leyendo {key} de la caché remota: {e}")
+            return None
+        if data is None:
+            return None
+
+        try:
+            value = deserialize(data)
+        except Exception as e:
+            logger.warning(f"Entrada de caché ilegible {key}: {e}")
+            return None
+        self.local.set(key, value, len(data))
+        return value
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None):
+        data = serialize(value)
+        self.local.set(key, value, len(data), timeout)
+        try:
+            self.remote.set(key, data, timeout)
+        except Exception as e:
+            logger.warning(f"Error guardando {key} en la caché remota: {e}")
+
+    def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        for key in keys:
+            self.local.delete(key)
+        try:
+            self.remote.delete_many(keys)
+        except Exception as e:
+            logger.warning(f"Error eliminando claves de la caché remota: {e}")
+
+    # -----------------------------------------
+    # Single-flight
+    # -----------------------------------------
+
+    @contextmanager
+    def _local_key_lock(self, key: str):
+        """Lock por clave dentro del proceso (se elimina al quedar sin usuarios)"""
+        with self._key_locks_guard:
+            holder = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            holder[1] += 1
+        try:
+            with holder[0]:
+                yield
+        finally:
+            with self._key_locks_guard:
+                holder[1] -= 1
+                if holder[1] == 0:
+                    self._key_locks.pop(key, None)
+
+    def _acquire_remote_lock(self, lock_key: str, token: str) -> bool:
+        try:
+            return bool(self.remote.add(lock_key, token, LOCK_TIMEOUT))
+        except Exception as e:
+            logger.warning(f"Lock de caché no disponible ({lock_key}): {e}")
+            return True
+
+    def _release_remote_lock(self, lock_key: str, token: str):
+        try:
+            if self.remote.get(lock_key) == token:
+                self.remote.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Error liberando el lock {lock_key}: {e}")
+
+    def get_or_set(self, key: str, producer: Callable[[], Any], timeout: Optional[int] = None,
+                   validate: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Valor de la caché o, si no está (o validate lo rechaza), el de producer.
+        Con varias peticiones concurrentes solo una ejecuta producer; el resto
+        espera su resultado. Si producer devuelve None no se guarda nada.
+        """
+        def lookup():
+            value = self.get(key)
+            if value is not None and (validate is None or validate(value)):
+                return value
+            return None
+
+        value = lookup()
+        if value is not None:
+            return value
+
+        with self._local_key_lock(key):
+            # Otro hilo del proceso pudo rellenarlo mientras se esperaba el lock
+            value = lookup()
+            if value is not None:
+                return value
+
+            lock_key = f"{key}:lock"
+            token = uuid.uuid4().hex
+            owner = self._acquire_remote_lock(lock_key, token)
+            if not owner:
+                # Otro proceso está produciendo el valor: esperar a que lo publique
+                deadline = time.monotonic() + LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_INTERVAL)
+                    value = lookup()
+                    if value is not None:
+                        return value
+                    if self._acquire_remote_lock(lock_key, token):
+                        owner = True
+                        break
+                else:
+                    logger.warning(f"Tiempo de espera agotado para {key}; se genera sin lock")
+
+            try:
+                value = producer()
+                if value is not None:
+                    self.set(key, value, timeout)
+                return value
+            finally:
+                if owner:
+                    self._release_remote_lock(lock_key, token)
+
+
+class CacheGenerations:
+    """
+    Contadores de generación por ámbito ('global', 'user:<id>', 'report:<id>').
+    Las claves que dependen de un ámbito incluyen su generación; invalidar es
+    un INCR, O(1) e independiente del número de entradas.
+    """
+
+    def __init__(self, prefix: str, alias: str = 'default', local_ttl: float = GENERATION_LOCAL_TTL,
+                 timeout: int = GENERATION_TIMEOUT):
+        self.prefix = prefix
+        self.alias = alias
+        self.local_ttl = local_ttl
+        self.timeout = timeout
+        self._local: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def remote(self):
+        return caches[self.alias]
+
+    def _key(self, scope: str) -> str:
+        return f"{self.prefix}:gen:{scope}"
+
+    @staticmethod
+    def _initial() -> int:
+        # Un contador perdido (evicción de Redis) no puede volver a un valor ya usado
+        return int(time.time() * 1000)
+
+    def get_many(self, scopes: Iterable[str]) -> Optional[Dict[str, int]]:
+        """
+        Generación actual de cada ámbito (una sola consulta para los que no están
+        en memoria). None si Redis no responde: sin generaciones no se puede saber
+        si una entrada (tampoco las del LRU local) sigue vigente, y quien llama
+        debe prescindir de la caché
+        """
+        scopes = list(scopes)
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for scope in scopes:
+                entry = self._local.get(scope)
+                if entry is not None and entry[1] > now:
+                    result[scope] = entry[0]
+
+        missing = [scope for scope in scopes if scope not in result]
+        if not missing:
+            return result
+
+        try:
+            stored = self.remote.get_many([self._key(scope) for scope in missing])
+            for scope in missing:
+                value = stored.get(self._key(scope))
+                if value is None:
+                    value = self._initial()
+                    if not self.remote.add(self._key(scope), value, self.timeout):
+                        value = self.remote.get(self._key(scope), value)
+                result[scope] = int(value)
+        except Exception as e:
+            logger.warning(f"Error leyendo generaciones de caché, se omite la caché: {e}")
+            return None
+
+        with self._lock:
+            for scope in missing:
+                self._local[scope] = (result[scope], now + self.local_ttl)
+        return result
+
+    def bump(self, scope: str):
+        """Invalidar todas las entradas del ámbito"""
+        key = self._key(scope)
+        with self._lock:
+            self._local.pop(scope, None)
+        try:
+            try:
+                self.remote.incr(key)
+                # INCR conserva el TTL anterior: se renueva para el contador vigente
+                self.remote.touch(key, self.timeout)
+            except ValueError:
+                # Contador inexistente: cualquier valor nuevo invalida las claves anteriores
+                self.remote.set(key, self._initial(), self.timeout)
+        except Exception as e:
+            logger.warning(f"Error invalidando el ámbito de caché {scope}: {e}")
+
+
+# Instancias globales usadas por ReportCacheManager
+report_cache = TieredCache()
+report_generations = CacheGenerations('azure_report')
@@ -6,19 +6,25 @@ from rest_framework.response import Response
 from rest_framework import status, viewsets, permissions
 from rest_framework.permissions import IsAuthenticated
 from django.http import HttpResponse
+from django.conf import settings
+from django.urls import reverse
 from django.utils import timezone
 from django.db.models import Q
 from django.template.loader import render_to_string
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from apps.core.pagination import KeysetPagination
 from .models import CSVFile, Report
 import logging
 import json
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from .models import Report, CSVFile
 from .serializers import ReportSerializer
 from apps.reports.utils.enhanced_analyzer import EnhancedHTMLReportGenerator
 from .utils.cache_manager import ReportCacheManager
+from .utils.progress import get_progress_for_user, mark_cancelled, ProgressReporter
 
 logger = logging.getLogger(__name__)
 
@@ -30,17 +36,23 @@ class ReportSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'user']
 
 
+class ReportKeysetPagination(KeysetPagination):
+    ordering_fields = ('created_at',)
+    default_ordering = '-created_at'
+
+
 class ReportViewSet(viewsets.ModelViewSet):
     """ViewSet para reportes - PRODUCCIÓN REAL"""
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ReportKeysetPagination
     
     def get_queryset(self):
         """Retorna reportes del usuario actual"""
         return Report.objects.filter(user=self.request.user)
     
     def list(self, request, *args, **kwargs):
-        """Listar reportes con filtros y paginación"""
+        """Listar reportes con filtros y paginación por cursor"""
         try:
             queryset = self.get_queryset()
             
@@ -60,36 +72,20 @@ class ReportViewSet(viewsets.ModelViewSet):
             if report_type_filter:
                 queryset = queryset.filter(report_type=report_type_filter)
             
-            # Aplicar ordenamiento
-            ordering = request.query_params.get('ordering', '-created_at')
-            queryset = queryset.order_by(ordering)
-            
-            # Aplicar límite
-            limit = request.query_params.get('limit')
-            if limit:
-                try:
-                    limit = int(limit)
-                    queryset = queryset[:limit]
-                except ValueError:
-                    pass
-            
-            # Serializar
-            serializer = self.get_serializer(queryset, many=True)
+            # Página por cursor sobre (created_at, id): ?ordering=, ?limit= y ?cursor=
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
             
             logger.info(f"Reportes listados para usuario: {request.user.email}, {len(serializer.data)} items")
             
-            return Response({
-                'results': serializer.data,
-                'count': len(serializer.data),
-                'next': None,
-                'previous': None
-            })
+            return self.get_paginated_response(serializer.data)
             
+        except NotFound:
+            raise
         except Exception as e:
             logger.error(f"Error listando reportes: {e}")
             return Response({
                 'results': [],
-                'count': 0,
                 'next': None,
                 'previous': None
             })
@@ -418,9 +414,9 @@ class ReportViewSet(viewsets.ModelViewSet):
             
             logger.info(f"Generando HTML para reporte {report.id}")
             
-            # ✅ USAR LA CLASE CORREGIDA
+            # ✅ USAR LA CLASE CORREGIDA (renderizado una vez por versión de los datos)
             generator = EnhancedHTMLReportGenerator()
-            html_content = generator.generate_complete_html(report)
+            html_content = ReportCacheManager.render_html(report, generator)
             
             return HttpResponse(html_content, content_type='text/html')
             
@@ -1486,6 +1482,11 @@ class ReportViewSet(viewsets.ModelViewSet):
                     'error': str(e)
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
+            # Modo asíncrono: devolver un handle del job en lugar de esperar el PDF
+            if self._wants_async(request):
+                from apps.reports.tasks import generate_report
+                return self._enqueue_pdf_job(request, report, generate_report, [str(report.id)])
+            
             # 2. Generar reporte completo (igual que en test)
             logger.info("2. Iniciando generación completa...")
             
@@ -1575,6 +1576,10 @@ class ReportViewSet(viewsets.ModelViewSet):
                     for error in result['errors']:
                         logger.error(f"   - {error}")
                     
+                    if result.get('cancelled'):
+                        error_response['message'] = 'Generación de PDF cancelada'
+                        return Response(error_response, status=status.HTTP_409_CONFLICT)
+                    
                     return Response(error_response, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
             except Exception as generation_error:
@@ -1698,116 +1703,56 @@ class ReportViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'], url_path='download')
     def download_pdf(self, request, pk=None):
-        """Descargar PDF del reporte - VERSIÓN MEJORADA CON REGENERACIÓN AUTOMÁTICA"""
+        """
+        Descargar PDF del reporte por streaming desde Azure (sin redirigir a un SAS URL)
+        
+        Soporta Range (descargas parciales/reanudables) y ETag/If-None-Match
+        (304 en descargas repetidas). No escribe en la base de datos. Si no se
+        puede servir por streaming se redirige a un SAS URL del blob y, en
+        última instancia (reportes antiguos sin blob registrado), a la URL guardada.
+        """
         try:
             report = self.get_object()
+            pdf_info = (report.analysis_data or {}).get('pdf_info') or {}
+            # El blob_name de analysis_data está completo (el campo del modelo se trunca)
+            blob_name = pdf_info.get('blob_name') or getattr(report, 'pdf_azure_blob_name', None)
             
-            logger.info(f"Intentando descargar PDF para reporte {report.id}")
-            logger.info(f"PDF URL en BD: {report.pdf_file_url}")
-            
-            # Verificar si existe PDF válido
-            pdf_url = report.pdf_file_url
-            
-            # Fallback 1: Verificar en analysis_data
-            if not pdf_url and report.analysis_data and 'pdf_info' in report.analysis_data:
-                pdf_info = report.analysis_data['pdf_info']
-                pdf_url = pdf_info.get('blob_url')
-                logger.info(f"PDF URL desde analysis_data: {pdf_url}")
+            from django.http import HttpResponseRedirect
             
-            # Fallback 2: Intentar regenerar URL si tenemos blob_name pero URL expirado
-            if not pdf_url or not pdf_url.startswith('https://'):
-                logger.warning(f"URL inválida o faltante. Intentando regenerar...")
+            if blob_name:
+                from apps.storage.services.enhanced_azure_storage import enhanced_azure_storage
+                from apps.storage.services.blob_streaming import stream_blob_response
                 
-                # Buscar información del blob en analysis_data
-                if report.analysis_data and 'pdf_info' in report.analysis_data:
-                    pdf_info = report.analysis_data['pdf_info']
-                    blob_name = pdf_info.get('blob_name')
-                    
-                    if blob_name:
-                        logger.info(f"Encontrado blob_name: {blob_name}. Regenerando URL...")
-                        
-                        try:
-                            # Importar servicio Azure
-                            from apps.storage.services.enhanced_azure_storage import enhanced_azure_storage
-                            
-                            # Regenerar URL con nuevo SAS token
-                            new_pdf_url = enhanced_azure_storage._generate_sas_url(
-                                enhanced_azure_storage.containers['pdfs'], 
-                                blob_name, 
-                                hours=24
-                            )
-                            
-                            if new_pdf_url:
-                                # Actualizar la URL en la base de datos
-                                report.pdf_file_url = new_pdf_url
-                                report.analysis_data['pdf_info']['blob_url'] = new_pdf_url
-                                report.save(update_fields=['pdf_file_url', 'analysis_data'])
-                                
-                                pdf_url = new_pdf_url
-                                logger.info(f"✅ URL regenerada exitosamente: {pdf_url[:80]}...")
-                            else:
-                                logger.error("❌ Error regenerando SAS URL")
-                                
-                        except Exception as regen_error:
-                            logger.error(f"❌ Error regenerando URL: {regen_error}")
-            
-            # Fallback 3: Si todavía no hay PDF, intentar regeneración completa
-            if not pdf_url:
-                logger.warning("No se pudo obtener URL. Verificando si necesita regeneración completa...")
+                container = pdf_info.get('container') or enhanced_azure_storage.containers['pdfs']
+                if enhanced_azure_storage.is_available():
+                    response = stream_blob_response(request, enhanced_azure_storage, container, blob_name,
+                                                    content_type='application/pdf')
+                    if response is not None:
+                        return response
+                    logger.warning(f"❌ PDF {blob_name} no disponible por streaming para reporte {report.id}")
                 
-                # Verificar si el PDF existe físicamente en Azure
-                if report.analysis_data and 'pdf_info' in report.analysis_data:
-                    blob_name = report.analysis_data['pdf_info'].get('blob_name')
-                    
-                    if blob_name:
-                        try:
-                            from apps.storage.services.enhanced_azure_storage import enhanced_azure_storage
-                            
-                            # Verificar si el blob existe
-                            container_client = enhanced_azure_storage.blob_service_client.get_container_client(
-                                enhanced_azure_storage.containers['pdfs']
-                            )
-                            blob_client = container_client.get_blob_client(blob_name)
-                            
-                            if blob_client.exists():
-                                # El blob existe, regenerar URL
-                                pdf_url = enhanced_azure_storage._generate_sas_url(
-                                    enhanced_azure_storage.containers['pdfs'], 
-                                    blob_name, 
-                                    hours=24
-                                )
-                                
-                                if pdf_url:
-                                    # Actualizar en BD
-                                    report.pdf_file_url = pdf_url
-                                    report.save(update_fields=['pdf_file_url'])
-                                    logger.info(f"✅ PDF encontrado en Azure y URL regenerada")
-                            else:
-                                logger.warning("❌ PDF no existe físicamente en Azure")
-                        
-                        except Exception as check_error:
-                            logger.error(f"❌ Error verificando blob: {check_error}")
-            
-            # Si aún no hay URL válida, dar respuesta apropiada
-            if not pdf_url or not pdf_url.startswith('https://'):
-                logger.error(f"No se pudo obtener URL válida para reporte {report.id}")
-                return Response({
-                    'message': 'PDF no disponible. El archivo necesita ser regenerado.',
-                    'actions': ['generate-pdf', 'regenerate-pdf'],
-                    'report_id': str(report.id),
-                    'status': report.status,
-                    'debug_info': {
-                        'has_analysis_data': bool(report.analysis_data),
-                        'has_pdf_info': bool(report.analysis_data and 'pdf_info' in report.analysis_data) if report.analysis_data else False,
-                        'original_url': report.pdf_file_url if report.pdf_file_url else None
-                    }
-                }, status=status.HTTP_404_NOT_FOUND)
+                # Sin streaming: SAS URL (de sas_url_cache, no se guarda en la BD)
+                sas_url = enhanced_azure_storage._generate_sas_url(container, blob_name, hours=24)
+                if sas_url:
+                    return HttpResponseRedirect(sas_url)
             
-            logger.info(f"✅ Redirigiendo a URL válida: {pdf_url[:80]}...")
+            # Reportes sin blob registrado (o sin clave para firmar): URL guardada (solo lectura)
+            pdf_url = report.pdf_file_url or pdf_info.get('blob_url')
+            if pdf_url and pdf_url.startswith('https://'):
+                return HttpResponseRedirect(pdf_url)
             
-            # Redirigir a la URL de Azure (con SAS token)
-            from django.http import HttpResponseRedirect
-            return HttpResponseRedirect(pdf_url)
+            logger.error(f"No se pudo obtener el PDF del reporte {report.id}")
+            return Response({
+                'message': 'PDF no disponible. El archivo necesita ser regenerado.',
+                'actions': ['generate-pdf', 'regenerate-pdf'],
+                'report_id': str(report.id),
+                'status': report.status,
+                'debug_info': {
+                    'has_analysis_data': bool(report.analysis_data),
+                    'has_pdf_info': bool(pdf_info),
+                    'original_url': report.pdf_file_url if report.pdf_file_url else None
+                }
+            }, status=status.HTTP_404_NOT_FOUND)
             
         except Exception as e:
             logger.error(f"❌ Error descargando PDF para reporte {pk}: {e}")
@@ -1928,10 +1873,84 @@ class ReportViewSet(viewsets.ModelViewSet):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _wants_async(self, request):
+        """Modo asíncrono si se pide con ?async=true (o campo 'async'), o por defecto según PDF_ASYNC_GENERATION"""
+        value = request.query_params.get('async', request.data.get('async'))
+        if value is None:
+            return getattr(settings, 'PDF_ASYNC_GENERATION', False)
+        return str(value).lower() in ('1', 'true', 'yes')
+
+    def _enqueue_pdf_job(self, request, report, task, args):
+        """Encolar una generación de PDF y responder 202 con el handle del job"""
+        job_id = uuid.uuid4().hex
+        
+        # Estado inicial para que el primer sondeo ya tenga respuesta
+        ProgressReporter('report', report.id, user_id=request.user.id).update('queued', job_id=job_id)
+        
+        try:
+            task.apply_async(args=args, kwargs={'job_id': job_id}, task_id=job_id)
+            logger.info(f"PDF del reporte {report.id} encolado (job {job_id})")
+        except Exception as e:
+            # Sin broker disponible: generar en la propia petición
+            logger.warning(f"⚠️ No se pudo encolar la generación del PDF, procesando en línea: {str(e)}")
+            task.apply(args=args, kwargs={'job_id': job_id}, task_id=job_id)
+        
+        progress_url = request.build_absolute_uri(reverse('reports-progress', args=[report.id]))
+        return Response({
+            'report_id': str(report.id),
+            'job_id': job_id,
+            'status': 'queued',
+            'progress_url': progress_url,
+            'cancel_url': request.build_absolute_uri(reverse('reports-cancel-pdf', args=[report.id])),
+            'message': 'Generación de PDF en segundo plano. Consultar progress_url para el resultado.'
+        }, status=status.HTTP_202_ACCEPTED, headers={'Location': progress_url})
+
+    @action(detail=True, methods=['post'], url_path='cancel-pdf')
+    def cancel_pdf(self, request, pk=None):
+        """Cancelar la generación de PDF en curso del reporte (en cola o maquetando)"""
+        report = self.get_object()
+        
+        # Renders en curso en cualquier proceso (web o worker): se matan sus procesos
+        from apps.storage.services.pdf_render_pool import request_cancel
+        request_cancel(f'report:{report.id}')
+        
+        # Tarea aún en cola: no llega a ejecutarse
+        state = get_progress_for_user('report', report.id, request.user)
+        job_id = state.get('job_id') if state else None
+        if job_id:
+            try:
+                from config.celery import app as celery_app
+                celery_app.control.revoke(job_id)
+            except Exception as e:
+                logger.warning(f"No se pudo revocar el job {job_id}: {e}")
+        
+        state = mark_cancelled('report', report.id)
+        return Response({
+            'report_id': str(report.id),
+            'job_id': job_id,
+            'status': state.get('status') if state else 'unknown'
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path='progress')
+    def progress(self, request, pk=None):
+        """Progreso de la generación del reporte (se lee de caché, sin consultar la base de datos)"""
+        state = get_progress_for_user('report', pk, request.user)
+        if state is None:
+            return Response({
+                'id': pk,
+                'status': 'unknown',
+                'message': 'No hay progreso registrado para este reporte'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(state)
+
     # Función auxiliar para procesar reportes en lote
     @action(detail=False, methods=['post'], url_path='batch-generate-pdfs')
     def batch_generate_pdfs(self, request):
-        """Generar PDFs para múltiples reportes"""
+        """
+        Generar PDFs para múltiples reportes en paralelo (Celery, concurrencia
+        acotada). Responde 202 con el batch_id; el progreso por reporte se
+        consulta en batches/<batch_id>/.
+        """
         try:
             report_ids = request.data.get('report_ids', [])
             
@@ -1940,49 +1959,38 @@ class ReportViewSet(viewsets.ModelViewSet):
                     'message': 'Se requiere lista de report_ids'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Filtrar reportes del usuario
-            reports = self.get_queryset().filter(id__in=report_ids)
+            from apps.storage.services.batch_pdf_service import start_pdf_batch, PDF_BATCH_MAX_REPORTS
             
-            results = []
-            success_count = 0
-            error_count = 0
+            if len(report_ids) > PDF_BATCH_MAX_REPORTS:
+                return Response({
+                    'message': f'Máximo {PDF_BATCH_MAX_REPORTS} reportes por lote'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            from apps.storage.services.complete_report_service import complete_report_service
+            # Filtrar reportes del usuario
+            found_ids = [
+                str(report_id) for report_id in
+                self.get_queryset().filter(id__in=report_ids).values_list('id', flat=True)
+            ]
+            not_found = [str(report_id) for report_id in report_ids if str(report_id) not in found_ids]
             
-            for report in reports:
-                try:
-                    result = complete_report_service.generate_complete_report(report)
-                    
-                    report_result = {
-                        'report_id': str(report.id),
-                        'success': result['success'],
-                        'client_name': result.get('client_name'),
-                        'pdf_url': result['urls'].get('pdf') if result['success'] else None
-                    }
-                    
-                    if result['success']:
-                        success_count += 1
-                    else:
-                        error_count += 1
-                        report_result['errors'] = result['errors']
-                    
-                    results.append(report_result)
-                    
-                except Exception as e:
-                    error_count += 1
-                    results.append({
-                        'report_id': str(report.id),
-                        'success': False,
-                        'error': str(e)
-                    })
+            if not found_ids:
+                return Response({
+                    'message': 'Ninguno de los reportes existe o pertenece al usuario',
+                    'not_found': not_found
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            concurrency = request.data.get('concurrency')
+            batch = start_pdf_batch(found_ids, request.user.id, int(concurrency) if concurrency else None)
             
+            status_url = request.build_absolute_uri(reverse('reports-batch-status', args=[batch['batch_id']]))
             return Response({
-                'message': f'Procesamiento completado: {success_count} exitosos, {error_count} errores',
-                'total_processed': len(results),
-                'success_count': success_count,
-                'error_count': error_count,
-                'results': results
-            }, status=status.HTTP_200_OK)
+                'message': f'Lote encolado: {batch["total"]} reportes, {batch["concurrency"]} en paralelo',
+                'batch_id': batch['batch_id'],
+                'total': batch['total'],
+                'concurrency': batch['concurrency'],
+                'not_found': not_found,
+                'status_url': status_url
+            }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
             
         except Exception as e:
             logger.error(f"Error en batch_generate_pdfs: {e}")
@@ -1991,6 +1999,19 @@ class ReportViewSet(viewsets.ModelViewSet):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get'], url_path=r'batches/(?P<batch_id>[0-9a-f]{32})')
+    def batch_status(self, request, batch_id=None):
+        """Estado de un lote de PDFs con el progreso de cada reporte (desde caché)"""
+        from apps.storage.services.batch_pdf_service import get_batch_status
+        state = get_batch_status(batch_id, request.user)
+        if state is None:
+            return Response({
+                'batch_id': batch_id,
+                'status': 'unknown',
+                'message': 'No hay un lote registrado con ese id'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(state)
+
 
     @action(detail=True, methods=['post'], url_path='fix-pdf')
     def fix_pdf(self, request, pk=None):
@@ -2108,7 +2129,7 @@ class ReportViewSet(viewsets.ModelViewSet):
             # Usar el nuevo generador con datos reales
             from apps.reports.utils.real_data_html_generator import RealDataHTMLGenerator
             generator = RealDataHTMLGenerator()
-            html_content = generator.generate_complete_html(report)
+            html_content = ReportCacheManager.render_html(report, generator)
             
             return HttpResponse(html_content, content_type='text/html')
             
@@ -2144,7 +2165,7 @@ class ReportViewSet(viewsets.ModelViewSet):
             # Usar el nuevo generador con datos reales
             from apps.reports.utils.real_data_html_generator import RealDataHTMLGenerator
             generator = RealDataHTMLGenerator()
-            html_content = generator.generate_category_html(report, category)
+            html_content = ReportCacheManager.render_html(report, generator, category)
             
             return HttpResponse(html_content, content_type='text/html')
             
@@ -2176,45 +2197,45 @@ class ReportViewSet(viewsets.ModelViewSet):
             
             logger.info(f"Generando PDF de categoría {category} para reporte {report.id}")
             
-            # Generar HTML de la categoría
-            from apps.reports.utils.real_data_html_generator import RealDataHTMLGenerator
-            generator = RealDataHTMLGenerator()
-            html_content = generator.generate_category_html(report, category)
-            
-            # Generar PDF desde HTML
-            from apps.storage.services.pdf_generator_service import PDFGeneratorService
-            pdf_service = PDFGeneratorService()
+            # Modo asíncrono: devolver un handle del job en lugar de esperar el PDF
+            if self._wants_async(request):
+                from apps.reports.tasks import generate_category_report
+                return self._enqueue_pdf_job(request, report, generate_category_report, [str(report.id), category])
             
-            # Crear nombre de archivo específico para categoría
-            client_name = generator._extract_client_name(report)
-            pdf_filename = f"azure_advisor_{category}_{client_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            
-            pdf_bytes = pdf_service.generate_pdf_from_html(html_content, pdf_filename)
+            from apps.storage.services.complete_report_service import complete_report_service
+            from apps.storage.services.pdf_render_pool import PDFRenderCancelled, PDFRenderTimeout
+            try:
+                progress = ProgressReporter('report', report.id, user_id=request.user.id)
+                result = complete_report_service.generate_category_pdf(report, category, progress=progress)
+            except PDFRenderCancelled as e:
+                progress.cancel(str(e))
+                return Response({
+                    'message': f'Generación del PDF de {category} cancelada',
+                    'category': category
+                }, status=status.HTTP_409_CONFLICT)
+            except PDFRenderTimeout as e:
+                progress.fail(str(e))
+                return Response({
+                    'message': f'Tiempo agotado generando el PDF de {category}',
+                    'category': category,
+                    'error': str(e)
+                }, status=status.HTTP_504_GATEWAY_TIMEOUT)
             
-            if not pdf_bytes:
+            if not result['success']:
                 return Response({
                     'message': 'Error generando PDF de categoría',
                     'category': category
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            # Subir a Azure Storage si está disponible
-            pdf_url = None
-            if hasattr(self, '_upload_category_pdf_to_azure'):
-                try:
-                    from apps.storage.services.enhanced_azure_storage import enhanced_azure_storage
-                    if enhanced_azure_storage.is_available():
-                        pdf_url = self._upload_category_pdf_to_azure(pdf_bytes, report, category, client_name)
-                except Exception as upload_error:
-                    logger.warning(f"Error subiendo PDF de categoría a Azure: {upload_error}")
-            
             response_data = {
                 'message': f'PDF de {category.title()} generado exitosamente',
                 'category': category,
                 'report_id': str(report.id),
-                'client_name': client_name,
-                'pdf_filename': pdf_filename,
-                'pdf_size': len(pdf_bytes),
-                'pdf_url': pdf_url
+                'client_name': result['client_name'],
+                'pdf_filename': result['pdf_filename'],
+                'pdf_size': result['pdf_size'],
+                'pdf_url': result['pdf_url'],
+                'pdf_reused': result['pdf_reused']
             }
             
             return Response(response_data, status=status.HTTP_201_CREATED)
@@ -2332,25 +2353,3 @@ class ReportViewSet(viewsets.ModelViewSet):
                 'message': f'Error obteniendo resumen de categoría {category}',
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def _upload_category_pdf_to_azure(self, pdf_bytes: bytes, report, category: str, client_name: str) -> Optional[str]:
-        """Subir PDF de categoría específica a Azure Storage"""
-        try:
-            from apps.storage.services.enhanced_azure_storage import enhanced_azure_storage
-            
-            # Crear nombre de blob específico para categoría
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            blob_name = f"reports/{client_name}/{category}/{report.id}_{timestamp}.pdf"
-            
-            # Subir usando el servicio existente
-            result = enhanced_azure_storage.upload_pdf(pdf_bytes, str(report.id), client_name)
-            
-            if result:
-                logger.info(f"✅ PDF de categoría {category} subido a Azure: {result['blob_name']}")
-                return result['blob_url']
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error subiendo PDF de categoría {category} a Azure: {e}")
-            return None
\ No newline at end of file
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.24 on 2026-10-16 21:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0007_analysis_fingerprint"),
+        ("storage", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DataFrameArtifact",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "format",
+                    models.CharField(
+                        choices=[
+                            ("csv_compressed", "CSV comprimido"),
+                            ("json_compressed", "JSON comprimido"),
+                            ("sample", "Muestra JSON"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("container_name", models.CharField(max_length=100)),
+                ("blob_name", models.CharField(max_length=255)),
+                ("size_bytes", models.BigIntegerField(default=0)),
+                ("uploaded_at", models.DateTimeField()),
+                (
+                    "csv_file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dataframe_artifacts",
+                        to="reports.csvfile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Artefacto DataFrame",
+                "verbose_name_plural": "Artefactos DataFrame",
+                "db_table": "storage_dataframe_artifact",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dataframeartifact",
+            constraint=models.UniqueConstraint(
+                fields=("csv_file", "format"), name="unique_dataframe_artifact_format"
+            ),
+        ),
+    ]
@@ -55,3 +55,33 @@ class StorageFile(models.Model):
 
     def __str__(self):
         return f"{self.original_filename} ({self.file_type})"
+
+
+class DataFrameArtifact(models.Model):
+    """
+    Manifiesto de los DataFrames exportados a Azure: el blob más reciente de
+    cada formato por CSV (download_dataframe lo consulta en vez de listar blobs)
+    """
+    FORMATS = [
+        ('csv_compressed', 'CSV comprimido'),
+        ('json_compressed', 'JSON comprimido'),
+        ('sample', 'Muestra JSON'),
+    ]
+
+    csv_file = models.ForeignKey('reports.CSVFile', on_delete=models.CASCADE, related_name='dataframe_artifacts')
+    format = models.CharField(max_length=20, choices=FORMATS)
+    container_name = models.CharField(max_length=100)
+    blob_name = models.CharField(max_length=255)
+    size_bytes = models.BigIntegerField(default=0)
+    uploaded_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'storage_dataframe_artifact'
+        verbose_name = 'Artefacto DataFrame'
+        verbose_name_plural = 'Artefactos DataFrame'
+        constraints = [
+            models.UniqueConstraint(fields=['csv_file', 'format'], name='unique_dataframe_artifact_format'),
+        ]
+
+    def __str__(self):
+        return f"{self.csv_file_id} [{self.format}] {self.blob_name}"
@@ -0,0 +1,239 @@
+# backend/apps/storage/services/async_blob_storage.py
+"""
+E/S de blobs con asyncio.
+
+AsyncAzureBlobStorage usa el cliente asíncrono del SDK (azure.storage.blob.aio,
+sobre aiohttp): muchas subidas, descargas y listados concurrentes comparten un
+event loop y un pool de conexiones en vez de ocupar un hilo cada uno. Las
+vistas async (ASGI, config/asgi.py) lo usan directamente con await.
+
+El código síncrono (Celery, vistas WSGI) lo usa a través de run_blob_io(), que
+ejecuta la corrutina en un event loop compartido en segundo plano (uno por
+proceso): las operaciones de todas las peticiones y tareas del proceso se
+multiplexan en él.
+
+Sin Azure configurado, AsyncLocalBlobStorage ofrece la misma API sobre
+LocalBlobStore (LOCAL_BLOB_STORE_DIR/<contenedor>/<blob>), para desarrollo y tests.
+"""
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Awaitable, Dict, Iterable, List, Optional
+from django.conf import settings
+from .blob_client_registry import (
+    AZURE_STORAGE_BLOCK_SIZE, AZURE_STORAGE_CONNECTION_TIMEOUT, AZURE_STORAGE_MAX_CONCURRENCY,
+    AZURE_STORAGE_POOL_SIZE, AZURE_STORAGE_READ_TIMEOUT, AZURE_STORAGE_RETRY_BACKOFF,
+    AZURE_STORAGE_RETRY_TOTAL, build_connection_string
+)
+from .local_blob_store import LocalBlobStore
+
+logger = logging.getLogger(__name__)
+
+# Operaciones de blob simultáneas en gather_bounded
+ASYNC_BLOB_CONCURRENCY = getattr(settings, 'ASYNC_BLOB_CONCURRENCY', 16)
+
+# Espera máxima de run_blob_io
+ASYNC_BLOB_TIMEOUT = 300
+
+
+class AsyncAzureBlobStorage:
+    """Operaciones de blob con el cliente asíncrono de Azure (un cliente por event loop)"""
+
+    def __init__(self, account_name: str, account_key: str):
+        self.account_name = account_name
+        self.account_key = account_key
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        # El cliente aio (y su sesión aiohttp) pertenece al loop en el que se crea
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import aiohttp
+            from azure.core.pipeline.transport import AioHttpTransport
+            from azure.storage.blob.aio import BlobServiceClient
+
+            transport = AioHttpTransport(
+                session=aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=AZURE_STORAGE_POOL_SIZE)),
+                session_owner=True,
+                connection_timeout=AZURE_STORAGE_CONNECTION_TIMEOUT,
+                read_timeout=AZURE_STORAGE_READ_TIMEOUT
+            )
+            client = BlobServiceClient.from_connection_string(
+                build_connection_string(self.account_name, self.account_key),
+                transport=transport,
+                retry_total=AZURE_STORAGE_RETRY_TOTAL,
+                initial_backoff=AZURE_STORAGE_RETRY_BACKOFF,
+                increment_base=AZURE_STORAGE_RETRY_BACKOFF,
+                max_single_put_size=AZURE_STORAGE_BLOCK_SIZE,
+                max_block_size=AZURE_STORAGE_BLOCK_SIZE,
+                max_single_get_size=AZURE_STORAGE_BLOCK_SIZE,
+                max_chunk_get_size=AZURE_STORAGE_BLOCK_SIZE,
+            )
+            self._clients[loop] = client
+        return client
+
+    def _blob(self, container: str, blob_name: str):
+        return self._client().get_blob_client(container, blob_name)
+
+    async def upload(self, container: str, blob_name: str, data: bytes, content_type: str = None,
+                     metadata: Dict[str, str] = None) -> str:
+        from azure.storage.blob import ContentSettings
+
+        blob_client = self._blob(container, blob_name)
+        await blob_client.upload_blob(
+            data,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type) if content_type else None,
+            metadata=metadata,
+            max_concurrency=AZURE_STORAGE_MAX_CONCURRENCY
+        )
+        return blob_client.url
+
+    async def download(self, container: str, blob_name: str) -> bytes:
+        stream = await self._blob(container, blob_name).download_blob(max_concurrency=AZURE_STORAGE_MAX_CONCURRENCY)
+        return await stream.readall()
+
+    async def exists(self, container: str, blob_name: str) -> bool:
+        return await self._blob(container, blob_name).exists()
+
+    async def list_blobs(self, container: str, prefix: str = '') -> List[Dict[str, Any]]:
+        container_client = self._client().get_container_client(container)
+        return [
+            {'name': blob.name, 'size': blob.size}
+            async for blob in container_client.list_blobs(name_starts_with=prefix or None)
+        ]
+
+    async def delete(self, container: str, blob_name: str) -> bool:
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            await self._blob(container, blob_name).delete_blob()
+            return True
+        except ResourceNotFoundError:
+            return False
+
+    async def aclose(self):
+        """Cerrar el cliente del loop actual"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+
+class AsyncLocalBlobStorage:
+    """Misma API sobre LocalBlobStore: cada contenedor es un subdirectorio de LOCAL_BLOB_STORE_DIR"""
+
+    def __init__(self, root: str = None):
+        self.root = LocalBlobStore(root).root
+
+    def _store(self, container: str) -> LocalBlobStore:
+        return LocalBlobStore(os.path.join(self.root, container))
+
+    def _upload(self, container: str, blob_name: str, data: bytes, content_type: str,
+                metadata: Dict[str, str]) -> str:
+        store = self._store(container)
+        store.stage_block(blob_name, '0', data)
+        url = store.commit_block_list(blob_name, ['0'], content_type, metadata)
+        if url is None:
+            raise OSError(f"No se pudo escribir el blob local {container}/{blob_name}")
+        return url
+
+    def _download(self, container: str, blob_name: str) -> bytes:
+        with open(self._store(container)._blob_path(blob_name), 'rb') as blob:
+            return blob.read()
+
+    def _list(self, container: str, prefix: str) -> List[Dict[str, Any]]:
+        base = self._store(container).root
+        blobs = []
+        for dirpath, dirnames, filenames in os.walk(base):
+            # Los bloques sin confirmar no son blobs
+            dirnames[:] = [d for d in dirnames if not d.endswith('.blocks')]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, base).replace(os.sep, '/')
+                if name.startswith(prefix):
+                    blobs.append({'name': name, 'size': os.path.getsize(path)})
+        return blobs
+
+    def _delete(self, container: str, blob_name: str) -> bool:
+        store = self._store(container)
+        existed = os.path.isfile(store._blob_path(blob_name))
+        return store.delete_file(blob_name) and existed
+
+    async def upload(self, container: str, blob_name: str, data: bytes, content_type: str = None,
+                     metadata: Dict[str, str] = None) -> str:
+        return await asyncio.to_thread(self._upload, container, blob_name, bytes(data), content_type, metadata)
+
+    async def download(self, container: str, blob_name: str) -> bytes:
+        return await asyncio.to_thread(self._download, container, blob_name)
+
+    async def exists(self, container: str, blob_name: str) -> bool:
+        return await asyncio.to_thread(os.path.isfile, self._store(container)._blob_path(blob_name))
+
+    async def list_blobs(self, container: str, prefix: str = '') -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._list, container, prefix)
+
+    async def delete(self, container: str, blob_name: str) -> bool:
+        return await asyncio.to_thread(self._delete, container, blob_name)
+
+    async def aclose(self):
+        pass
+
+
+async def gather_bounded(aws: Iterable[Awaitable], limit: int = ASYNC_BLOB_CONCURRENCY,
+                         return_exceptions: bool = False) -> List[Any]:
+    """asyncio.gather con como mucho limit operaciones en curso"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(bounded(aw) for aw in aws), return_exceptions=return_exceptions)
+
+
+class BackgroundEventLoop:
+    """Event loop en un hilo propio (uno por proceso) para usar la API async desde código síncrono"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                # Primer uso en este proceso o tras un fork (el hilo del padre no existe)
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='blob-io', daemon=True).start()
+                self._loop, self._pid = loop, os.getpid()
+            return self._loop
+
+    def run(self, coro, timeout: float = ASYNC_BLOB_TIMEOUT):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+
+# Instancias globales
+blob_event_loop = BackgroundEventLoop()
+_azure_storages = {}
+_azure_storages_lock = threading.Lock()
+
+
+def get_async_blob_storage(account_name: Optional[str] = None, account_key: Optional[str] = None):
+    """Azure si la cuenta (por defecto la de settings) está configurada; si no, LocalBlobStore"""
+    account_name = account_name or getattr(settings, 'AZURE_STORAGE_ACCOUNT_NAME', None)
+    account_key = account_key or getattr(settings, 'AZURE_STORAGE_ACCOUNT_KEY', None)
+    if not (account_name and account_key):
+        return AsyncLocalBlobStorage()
+
+    with _azure_storages_lock:
+        storage = _azure_storages.get((account_name, account_key))
+        if storage is None:
+            storage = _azure_storages[(account_name, account_key)] = AsyncAzureBlobStorage(account_name, account_key)
+        return storage
+
+
+def run_blob_io(coro, timeout: float = ASYNC_BLOB_TIMEOUT):
+    """Ejecutar una corrutina de blob desde código síncrono (Celery, vistas WSGI)"""
+    return blob_event_loop.run(coro, timeout)
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 from django.conf import settings
 from django.core.files.base import ContentFile
+from .blob_client_registry import AZURE_STORAGE_MAX_CONCURRENCY, get_blob_service_client
 
 try:
     from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
@@ -29,24 +30,29 @@ class AzureStorageService:
         logger.info(f"   Container: {self.container_name}")
         logger.info(f"   Key: {'Configurado' if self.account_key else 'No configurado'}")
         
+        self._client_ready = False
+        
         if not AZURE_AVAILABLE:
             logger.warning("Azure SDK no disponible. Instalar con: pip install azure-storage-blob azure-identity")
-            self.blob_service_client = None
             return
             
-        # Inicializar cliente
+        # Inicializar cliente (compartido por proceso: ver blob_client_registry)
         if self.account_name and self.account_key:
             try:
-                connection_string = f"DefaultEndpointsProtocol=https;AccountName={self.account_name};AccountKey={self.account_key};EndpointSuffix=core.windows.net"
-                self.blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+                get_blob_service_client(self.account_name, self.account_key)
+                self._client_ready = True
                 logger.info("Cliente de Azure Storage inicializado exitosamente")
             except Exception as e:
                 logger.error(f"Error inicializando cliente de Azure Storage: {str(e)}")
-                self.blob_service_client = None
         else:
             logger.warning("Credenciales de Azure Storage no configuradas")
-            self.blob_service_client = None
 
+    @property
+    def blob_service_client(self):
+        """Cliente compartido del proceso (None si Azure no está configurado)"""
+        if not self._client_ready:
+            return None
+        return get_blob_service_client(self.account_name, self.account_key)
 
     def is_configured(self) -> bool:
         """Verificar si Azure Storage está configurado"""
@@ -90,7 +96,8 @@ class AzureStorageService:
                 overwrite=True,
                 content_settings={
                     'content_type': content_type or 'application/octet-stream'
-                }
+                },
+                max_concurrency=AZURE_STORAGE_MAX_CONCURRENCY
             )
             
             # Retornar URL del archivo
@@ -125,7 +132,7 @@ class AzureStorageService:
                 blob=file_name
             )
             
-            download_stream = blob_client.download_blob()
+            download_stream = blob_client.download_blob(max_concurrency=AZURE_STORAGE_MAX_CONCURRENCY)
             return download_stream.readall()
             
         except AzureError as e:
@@ -135,6 +142,66 @@ class AzureStorageService:
             logger.error(f"Error inesperado descargando archivo: {str(e)}")
             return None
 
+    def stage_block(self, file_name: str, block_id: str, data: bytes):
+        """
+        Subir un bloque sin confirmar de un block blob (upload por partes)
+        
+        Args:
+            file_name: Nombre del blob
+            block_id: Identificador del bloque (misma longitud para todos los bloques)
+            data: Contenido del bloque
+        """
+        if not self.is_configured():
+            raise RuntimeError("Azure Storage no configurado")
+        
+        # Crear contenedor si no existe (una vez por instancia)
+        if not getattr(self, '_container_ready', False):
+            try:
+                self.blob_service_client.get_container_client(self.container_name).create_container()
+            except Exception:
+                pass  # El contenedor ya existe
+            self._container_ready = True
+        
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=file_name
+        )
+        blob_client.stage_block(block_id=block_id, data=data)
+
+    def commit_block_list(self, file_name: str, block_ids: List[str], content_type: str = None,
+                          metadata: Dict[str, str] = None) -> Optional[str]:
+        """
+        Confirmar los bloques subidos con stage_block, en orden
+        
+        Returns:
+            URL del blob o None si hay error
+        """
+        if not self.is_configured():
+            logger.warning("Azure Storage no configurado")
+            return None
+            
+        try:
+            from azure.storage.blob import BlobBlock, ContentSettings
+            
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=file_name
+            )
+            blob_client.commit_block_list(
+                [BlobBlock(block_id=block_id) for block_id in block_ids],
+                content_settings=ContentSettings(content_type=content_type or 'application/octet-stream'),
+                metadata=metadata
+            )
+            logger.info(f"Block blob confirmado: {file_name} ({len(block_ids)} bloques)")
+            return blob_client.url
+            
+        except AzureError as e:
+            logger.error(f"Error confirmando bloques de {file_name}: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Error inesperado confirmando bloques de {file_name}: {str(e)}")
+            return None
+
     def delete_file(self, file_name: str) -> bool:
         """
         Eliminar archivo de Azure Blob Storage
@@ -221,21 +288,10 @@ class AzureStorageService:
             return None
             
         try:
-            from azure.storage.blob import generate_blob_sas, BlobSasPermissions
-            
-            # Generar SAS token
-            sas_token = generate_blob_sas(
-                account_name=self.account_name,
-                container_name=self.container_name,
-                blob_name=file_name,
-                account_key=self.account_key,
-                permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(hours=expiry_hours)
-            )
-            
-            # Construir URL completa
-            blob_url = f"https://{self.account_name}.blob.core.windows.net/{self.container_name}/{file_name}?{sas_token}"
-            return blob_url
+            # Mismo token mientras le quede vida suficiente (ver sas_cache)
+            from .sas_cache import sas_url_cache
+            return sas_url_cache.get_url(self.account_name, self.account_key, self.container_name,
+                                         file_name, hours=expiry_hours)
             
         except Exception as e:
             logger.error(f"Error generando URL con SAS token: {str(e)}")
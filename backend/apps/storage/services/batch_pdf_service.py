@@ -0,0 +1,116 @@
+# backend/apps/storage/services/batch_pdf_service.py
+"""
+Generación de PDFs en lote.
+
+Los reportes se reparten en carriles (como mucho PDF_BATCH_CONCURRENCY): cada
+carril es una cadena de tareas Celery que genera sus reportes uno tras otro, y
+los carriles corren en paralelo como el grupo de un chord cuyo callback cierra
+el lote. Nunca hay más de N reportes del lote generándose a la vez y, mientras
+un worker maqueta un PDF, otros renderizan HTML o suben blobs de otros
+reportes: el lote tarda lo que su carril más lento, no la suma de todos.
+
+El estado del lote se publica en caché (progreso 'batch'); el de cada reporte
+es su progreso habitual ('report'), así que consultar un lote no toca la base
+de datos.
+"""
+import uuid
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from typing import Any, Dict, List, Optional
+from apps.reports.utils.progress import ProgressReporter, get_progress_for_user, get_progress_key
+
+logger = logging.getLogger(__name__)
+
+# Reportes de un mismo lote generándose a la vez
+PDF_BATCH_CONCURRENCY = getattr(settings, 'PDF_BATCH_CONCURRENCY', 4)
+
+# Tamaño máximo de un lote
+PDF_BATCH_MAX_REPORTS = getattr(settings, 'PDF_BATCH_MAX_REPORTS', 100)
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+def split_lanes(report_ids: List[str], lanes: int) -> List[List[str]]:
+    """Repartir los reportes en carriles (round-robin)"""
+    return [report_ids[i::lanes] for i in range(lanes) if report_ids[i::lanes]]
+
+
+def start_pdf_batch(report_ids: List[str], user_id, concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Encolar la generación completa (HTML -> PDF -> Azure) de los reportes.
+
+    Returns:
+        Dict con batch_id, total y concurrency
+    """
+    from celery import chain, chord, group
+    from apps.reports.tasks import generate_batch_report, finalize_pdf_batch
+
+    batch_id = uuid.uuid4().hex
+    concurrency = max(1, min(concurrency or PDF_BATCH_CONCURRENCY, PDF_BATCH_CONCURRENCY, len(report_ids)))
+
+    ProgressReporter('batch', batch_id, user_id=user_id).update(
+        'queued', report_ids=report_ids, total=len(report_ids), concurrency=concurrency
+    )
+    # Estado inicial de cada reporte para que el primer sondeo ya lo vea
+    for report_id in report_ids:
+        ProgressReporter('report', report_id, user_id=user_id).update('queued', batch_id=batch_id)
+
+    lanes = split_lanes(report_ids, concurrency)
+    header = group(
+        chain(*[generate_batch_report.si(report_id, batch_id) for report_id in lane])
+        for lane in lanes
+    )
+
+    try:
+        chord(header)(finalize_pdf_batch.si(batch_id))
+        logger.info(f"Lote {batch_id} encolado: {len(report_ids)} reportes en {len(lanes)} carriles")
+    except Exception as e:
+        # Sin broker disponible: generar en la propia petición
+        logger.warning(f"⚠️ No se pudo encolar el lote {batch_id}, procesando en línea: {e}")
+        for report_id in report_ids:
+            generate_batch_report.apply(args=[report_id, batch_id])
+        finalize_pdf_batch.apply(args=[batch_id])
+
+    return {'batch_id': batch_id, 'total': len(report_ids), 'concurrency': concurrency}
+
+
+def summarize_batch(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Estado del lote con el progreso de cada reporte (una sola lectura de caché)"""
+    keys = {get_progress_key('report', report_id): report_id for report_id in state.get('report_ids', [])}
+    try:
+        stored = cache.get_many(list(keys))
+    except Exception as e:
+        logger.warning(f"Error leyendo progreso del lote {state.get('id')}: {e}")
+        stored = {}
+
+    reports = []
+    counts = {'queued': 0, 'running': 0, 'completed': 0, 'failed': 0, 'cancelled': 0}
+    for key, report_id in keys.items():
+        report_state = stored.get(key) or {}
+        report_status = report_state.get('status', 'queued')
+        if report_status == 'running' and report_state.get('stage') == 'queued':
+            report_status = 'queued'
+        counts[report_status] = counts.get(report_status, 0) + 1
+        reports.append({
+            'report_id': report_id,
+            'status': report_status,
+            'stage': report_state.get('stage'),
+            'pdf_url': report_state.get('pdf_url'),
+            'error': report_state.get('error'),
+        })
+
+    summary = dict(state)
+    summary['counts'] = counts
+    summary['reports'] = reports
+    finished = sum(counts.get(s, 0) for s in TERMINAL_STATUSES)
+    summary['percent'] = round(finished * 100.0 / len(keys), 1) if keys else 100.0
+    return summary
+
+
+def get_batch_status(batch_id: str, user) -> Optional[Dict[str, Any]]:
+    """Estado del lote si pertenece al usuario"""
+    state = get_progress_for_user('batch', batch_id, user)
+    if state is None:
+        return None
+    return summarize_batch(state)
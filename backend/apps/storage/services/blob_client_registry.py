@@ -0,0 +1,109 @@
+# backend/apps/storage/services/blob_client_registry.py
+"""
+Registro de BlobServiceClient compartidos por proceso.
+
+Cada servicio de storage (AzureStorageService, EnhancedAzureStorageService y
+las tareas que los instancian) obtiene aquí su cliente en vez de construir uno
+propio desde la connection string. Todos comparten así un único pool de
+conexiones HTTP con keep-alive: las ráfagas de subidas no repiten el handshake
+TLS ni la inicialización del cliente.
+
+El cliente se crea al primer uso en cada proceso (también tras el fork de
+Gunicorn/Celery: los sockets del padre no se comparten) con el transporte, los
+reintentos con backoff exponencial y los tamaños de bloque configurados.
+"""
+import os
+import logging
+import threading
+from typing import Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Conexiones HTTP abiertas por proceso hacia la cuenta de storage
+AZURE_STORAGE_POOL_SIZE = getattr(settings, 'AZURE_STORAGE_POOL_SIZE', 20)
+
+# Bloques en paralelo en subidas y descargas por partes (max_concurrency del SDK)
+AZURE_STORAGE_MAX_CONCURRENCY = getattr(settings, 'AZURE_STORAGE_MAX_CONCURRENCY', 4)
+
+# Reintentos (backoff exponencial: initial_backoff + increment_base ** intento)
+AZURE_STORAGE_RETRY_TOTAL = getattr(settings, 'AZURE_STORAGE_RETRY_TOTAL', 5)
+AZURE_STORAGE_RETRY_BACKOFF = 2
+
+AZURE_STORAGE_CONNECTION_TIMEOUT = 10
+AZURE_STORAGE_READ_TIMEOUT = 120
+
+# Por encima de este tamaño las subidas/descargas se hacen por bloques (en paralelo)
+AZURE_STORAGE_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def build_connection_string(account_name: str, account_key: str) -> str:
+    return (f"DefaultEndpointsProtocol=https;AccountName={account_name};"
+            f"AccountKey={account_key};EndpointSuffix=core.windows.net")
+
+
+def _build_transport():
+    """Transporte requests con un pool de conexiones del tamaño configurado"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from azure.core.pipeline.transport import RequestsTransport
+
+    session = requests.Session()
+    # Los reintentos los hace la política del SDK, no urllib3
+    adapter = HTTPAdapter(pool_connections=AZURE_STORAGE_POOL_SIZE, pool_maxsize=AZURE_STORAGE_POOL_SIZE,
+                          max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return RequestsTransport(session=session, session_owner=False,
+                             connection_timeout=AZURE_STORAGE_CONNECTION_TIMEOUT,
+                             read_timeout=AZURE_STORAGE_READ_TIMEOUT)
+
+
+class BlobClientRegistry:
+    """Un BlobServiceClient por cuenta y proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._pid = None
+
+    def get(self, account_name: str, account_key: str):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Primer uso en este proceso o tras un fork
+                self._clients = {}
+                self._pid = os.getpid()
+
+            key = (account_name, account_key)
+            client = self._clients.get(key)
+            if client is None:
+                from azure.storage.blob import BlobServiceClient
+                client = BlobServiceClient.from_connection_string(
+                    build_connection_string(account_name, account_key),
+                    transport=_build_transport(),
+                    retry_total=AZURE_STORAGE_RETRY_TOTAL,
+                    initial_backoff=AZURE_STORAGE_RETRY_BACKOFF,
+                    increment_base=AZURE_STORAGE_RETRY_BACKOFF,
+                    max_single_put_size=AZURE_STORAGE_BLOCK_SIZE,
+                    max_block_size=AZURE_STORAGE_BLOCK_SIZE,
+                    max_single_get_size=AZURE_STORAGE_BLOCK_SIZE,
+                    max_chunk_get_size=AZURE_STORAGE_BLOCK_SIZE,
+                )
+                self._clients[key] = client
+                logger.info(f"Cliente de Azure Storage creado para {account_name} (pid {os.getpid()})")
+            return client
+
+    def clear(self):
+        with self._lock:
+            self._clients = {}
+
+
+# Instancia global
+blob_client_registry = BlobClientRegistry()
+
+
+def get_blob_service_client(account_name: Optional[str] = None, account_key: Optional[str] = None):
+    """BlobServiceClient compartido de la cuenta (por defecto la de settings)"""
+    account_name = account_name or getattr(settings, 'AZURE_STORAGE_ACCOUNT_NAME', None)
+    account_key = account_key or getattr(settings, 'AZURE_STORAGE_ACCOUNT_KEY', None)
+    return blob_client_registry.get(account_name, account_key)
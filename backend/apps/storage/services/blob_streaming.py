@@ -0,0 +1,186 @@
+# backend/apps/storage/services/blob_streaming.py
+"""
+Descarga de blobs a través del backend, por streaming.
+
+stream_blob_response() sirve un blob con un StreamingHttpResponse que va
+leyendo del SDK bloque a bloque (AZURE_STORAGE_BLOCK_SIZE del cliente
+compartido): un PDF grande nunca se carga entero en el proceso. Soporta:
+
+- Range (un solo rango): descargas parciales y reanudables (206 / 416).
+- ETag + If-None-Match: una descarga repetida del mismo blob responde 304 sin
+  tocar el contenido; If-Range invalida el rango si el blob cambió.
+
+Las propiedades del blob (tamaño, ETag, tipo) se guardan en report_cache, así
+que un 304 no hace ninguna petición a Azure. La ruta de lectura no escribe en
+la base de datos.
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date
+from apps.reports.utils.tiered_cache import report_cache
+
+logger = logging.getLogger(__name__)
+
+# Vida de las propiedades cacheadas (los PDF direccionados por contenido no cambian)
+BLOB_PROPERTIES_TIMEOUT = getattr(settings, 'BLOB_PROPERTIES_TIMEOUT', 600)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def _properties_key(container: str, blob_name: str) -> str:
+    return f"blob_props:{container}:{blob_name}"
+
+
+def get_blob_properties(storage, container: str, blob_name: str) -> Optional[Dict[str, Any]]:
+    """Tamaño, ETag, fecha y cabeceras de contenido del blob (None si no existe)"""
+    def produce():
+        try:
+            blob_client = storage.blob_service_client.get_blob_client(container, blob_name)
+            props = blob_client.get_blob_properties()
+        except Exception as e:
+            logger.info(f"Blob {container}/{blob_name} no disponible: {e}")
+            return None
+        content_settings = props.content_settings
+        return {
+            'size': props.size,
+            'etag': props.etag if props.etag.startswith('"') else f'"{props.etag}"',
+            'last_modified': props.last_modified.timestamp() if props.last_modified else None,
+            'content_type': content_settings.content_type if content_settings else None,
+            'content_disposition': content_settings.content_disposition if content_settings else None,
+        }
+
+    return report_cache.get_or_set(_properties_key(container, blob_name), produce, BLOB_PROPERTIES_TIMEOUT)
+
+
+def invalidate_blob_properties(container: str, blob_name: str):
+    report_cache.delete_many([_properties_key(container, blob_name)])
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (lista de ETags o '*')"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    target = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def parse_range_header(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (inicio, fin) inclusivos del rango pedido, o None para servir el blob
+    completo (sin Range, unidades desconocidas o varios rangos).
+    Lanza RangeNotSatisfiable si el rango queda fuera del blob.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[len('bytes='):].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+
+    first, last = (part.strip() for part in spec.split('-', 1))
+    try:
+        if not first:
+            # Sufijo: los últimos N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+def _if_not_modified():
+    from azure.core import MatchConditions
+    return MatchConditions.IfNotModified
+
+
+def _chunks(downloader):
+    try:
+        for chunk in downloader.chunks():
+            yield chunk
+    except Exception as e:
+        # La respuesta ya empezó: solo se puede cortar la conexión
+        logger.error(f"Error enviando blob: {e}")
+        raise
+
+
+def stream_blob_response(request, storage, container: str, blob_name: str,
+                         content_type: str = 'application/octet-stream',
+                         retried: bool = False) -> Optional[HttpResponse]:
+    """
+    Respuesta (200, 206, 304 o 416) que sirve el blob por streaming, o None si
+    el blob no existe
+    """
+    props = get_blob_properties(storage, container, blob_name)
+    if props is None:
+        return None
+
+    etag, size = props['etag'], props['size']
+
+    def with_headers(response):
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+        # El navegador puede guardarlo, pero debe revalidar (304) antes de reutilizarlo
+        response['Cache-Control'] = 'private, no-cache'
+        if props['last_modified']:
+            response['Last-Modified'] = http_date(props['last_modified'])
+        return response
+
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return with_headers(HttpResponse(status=304))
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range_header(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            response = with_headers(HttpResponse(status=416))
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+
+    blob_client = storage.blob_service_client.get_blob_client(container, blob_name)
+    try:
+        # La primera petición se hace aquí: un blob borrado se detecta antes de responder
+        if byte_range:
+            start, end = byte_range
+            downloader = blob_client.download_blob(offset=start, length=end - start + 1, etag=etag,
+                                                   match_condition=_if_not_modified())
+        else:
+            downloader = blob_client.download_blob(etag=etag, match_condition=_if_not_modified())
+    except Exception as e:
+        # Borrado o reemplazado desde que se cachearon sus propiedades
+        logger.warning(f"Blob {container}/{blob_name} cambió o no existe: {e}")
+        invalidate_blob_properties(container, blob_name)
+        if retried:
+            return None
+        return stream_blob_response(request, storage, container, blob_name, content_type, retried=True)
+
+    response = StreamingHttpResponse(_chunks(downloader), content_type=props['content_type'] or content_type)
+    if byte_range:
+        start, end = byte_range
+        response.status_code = 206
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response['Content-Length'] = str(size)
+    if props['content_disposition']:
+        response['Content-Disposition'] = props['content_disposition']
+    return with_headers(response)
@@ -0,0 +1,107 @@
+# backend/apps/storage/services/block_blob_writer.py
+"""
+Escritura de block blobs por bloques.
+
+BlockBlobWriter es un fichero de solo escritura: acumula datos hasta completar
+un bloque, lo envía con stage_block y confirma la lista de bloques al final
+(commit_block_list). Lo usan el upload pass-through y la exportación de
+DataFrames; ninguno necesita el blob completo en memoria.
+
+El destino es cualquier almacén con la interfaz de bloques de
+AzureStorageService: stage_block(blob, id, datos), commit_block_list(blob,
+ids, content_type, metadata) y delete_file(blob). LocalBlobStore la implementa
+sobre disco y AzureContainerBlockStore sobre un contenedor arbitrario.
+"""
+import io
+import uuid
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque por defecto (Azure admite hasta 4000 MiB; 4 MiB es el valor habitual del SDK)
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class AzureContainerBlockStore:
+    """Interfaz de bloques de AzureStorageService sobre un contenedor cualquiera"""
+
+    def __init__(self, blob_service_client, container: str):
+        self.blob_service_client = blob_service_client
+        self.container = container
+
+    def _blob_client(self, blob_name: str):
+        return self.blob_service_client.get_blob_client(self.container, blob_name)
+
+    def stage_block(self, blob_name: str, block_id: str, data: bytes):
+        self._blob_client(blob_name).stage_block(block_id=block_id, data=data, length=len(data))
+
+    def commit_block_list(self, blob_name: str, block_ids: List[str], content_type: str = None,
+                          metadata: Dict[str, str] = None) -> str:
+        from azure.storage.blob import BlobBlock, ContentSettings
+
+        blob_client = self._blob_client(blob_name)
+        blob_client.commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=ContentSettings(content_type=content_type) if content_type else None,
+            metadata=metadata
+        )
+        return blob_client.url
+
+    def delete_file(self, blob_name: str) -> bool:
+        try:
+            self._blob_client(blob_name).delete_blob()
+            return True
+        except Exception as e:
+            # Sin commit el blob no existe; sus bloques sin confirmar caducan solos
+            logger.debug(f"No se eliminó {blob_name}: {e}")
+            return False
+
+
+class BlockBlobWriter(io.RawIOBase):
+    """
+    Fichero de solo escritura sobre un block blob. Admite write() directo o
+    envolverlo (GzipFile, TextIOWrapper); close() no confirma el blob, hay que
+    llamar a commit() o abort().
+    """
+
+    def __init__(self, store, blob_name: str, block_size: int = DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        self.store = store
+        self.blob_name = blob_name
+        self.block_size = block_size
+        self.size_bytes = 0
+        self.block_ids: List[str] = []
+        self._buffer = bytearray()
+        # Prefijo por escritura: los bloques sin confirmar de un intento anterior
+        # sobre el mismo blob no se mezclan con estos
+        self._prefix = uuid.uuid4().hex
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self.size_bytes += len(data)
+        while len(self._buffer) >= self.block_size:
+            self._stage(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def _stage(self, data: bytes):
+        # Todos los ids deben tener la misma longitud dentro de un blob
+        block_id = f"{self._prefix}-{len(self.block_ids):08d}"
+        self.store.stage_block(self.blob_name, block_id, data)
+        self.block_ids.append(block_id)
+
+    def commit(self, content_type: str = None, metadata: Dict[str, str] = None) -> Optional[str]:
+        """Enviar el último bloque y confirmar el blob; devuelve su URL (None si falla)"""
+        if self._buffer:
+            self._stage(bytes(self._buffer))
+            self._buffer.clear()
+        return self.store.commit_block_list(self.blob_name, self.block_ids, content_type, metadata)
+
+    def abort(self):
+        """Descartar los datos pendientes y el blob"""
+        self._buffer.clear()
+        self.store.delete_file(self.blob_name)
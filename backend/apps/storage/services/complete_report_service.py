@@ -5,11 +5,18 @@ import pandas as pd
 from datetime import datetime
 from typing import Optional, Tuple, Dict, Any
 import logging
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
+from apps.reports.utils.progress import ProgressReporter
+from apps.reports.utils.stage_graph import StageGraph
+from .pdf_render_pool import PDFRenderCancelled, PDFRenderInterrupted
 
 logger = logging.getLogger(__name__)
 
+# Hilos del grafo de etapas de un reporte (ramas PDF y DataFrame en paralelo)
+REPORT_PIPELINE_WORKERS = getattr(settings, 'REPORT_PIPELINE_WORKERS', 2)
+
 class CompleteReportService:
     """Servicio completo para generar reportes con manejo robusto de transacciones"""
     
@@ -37,8 +44,20 @@ class CompleteReportService:
         except Exception as e:
             logger.error(f"❌ Error inicializando Azure service: {e}")
     
-    def generate_complete_report(self, report) -> Dict[str, Any]:
-        """Generar reporte completo con manejo seguro de transacciones"""
+    def generate_complete_report(self, report, progress=None) -> Dict[str, Any]:
+        """
+        Generar reporte completo con manejo seguro de transacciones
+        
+        Las etapas forman un grafo (StageGraph): HTML -> PDF -> actualizar Report
+        por un lado y DataFrame -> actualizar CSVFile por otro, en paralelo. Cada
+        etapa usa su propia transacción corta; su duración queda en
+        result['timings'] (ms).
+        
+        El progreso por etapas (HTML, páginas PDF, bytes subidos) se publica en
+        caché para que el frontend lo consulte mientras se genera.
+        """
+        if progress is None:
+            progress = ProgressReporter('report', report.id, user_id=report.user_id)
         
         result = {
             'success': False,
@@ -49,82 +68,101 @@ class CompleteReportService:
             'urls': {},
             'metadata': {},
             'errors': [],
+            'timings': {},
             'client_name': 'Azure Client'
         }
         
         try:
             logger.info(f"🚀 Iniciando generación completa para reporte {report.id}")
+            azure_available = bool(self.azure_service and self.azure_service.is_available())
+            # Resolver el CSVFile en este hilo: las etapas lo comparten
+            csv_file = report.csv_file
             
-            # 1. Generar HTML (fuera de transacción)
-            html_content, client_name = self._generate_html(report)
-            if html_content:
-                result['html_generated'] = True
-                result['client_name'] = client_name
-                logger.info(f"✅ HTML generado para {client_name}")
-            else:
-                result['errors'].append("Error generando HTML")
-                return result
-            
-            # 2. Generar PDF (fuera de transacción)
+            graph = StageGraph(f"report-{report.id}")
+            graph.add('html', lambda deps: self._stage_html(report, progress))
             if self.pdf_service:
-                pdf_bytes, pdf_filename = self._generate_pdf(report, html_content)
-                if pdf_bytes:
-                    result['pdf_generated'] = True
-                    result['pdf_filename'] = pdf_filename
-                    result['pdf_size'] = len(pdf_bytes)
-                    logger.info(f"✅ PDF generado: {pdf_filename} ({len(pdf_bytes)} bytes)")
-                    
-                    # 3. Subir PDF a Azure (fuera de transacción)
-                    if self.azure_service and self.azure_service.is_available():
-                        pdf_info = self._upload_pdf_to_azure(pdf_bytes, report, client_name)
-                        if pdf_info:
-                            result['pdf_uploaded'] = True
-                            result['urls']['pdf'] = pdf_info['blob_url']
-                            result['metadata']['pdf'] = pdf_info
-                            logger.info(f"✅ PDF subido a Azure: {pdf_info['blob_name']}")
-                            
-                            # 4. Actualizar Report en transacción separada y segura
-                            update_success = self._safe_update_report_with_pdf_info(report, pdf_info)
-                            if not update_success:
-                                logger.warning("⚠️ Error actualizando Report, pero PDF subido exitosamente")
-                        else:
-                            result['errors'].append("Error subiendo PDF a Azure")
-                    else:
-                        result['errors'].append("Azure Storage no disponible")
-                else:
-                    result['errors'].append("Error generando PDF")
+                graph.add('pdf', lambda deps: self._stage_pdf(report, *deps['html'], azure_available, progress),
+                          after=['html'])
+                if azure_available:
+                    graph.add('report_update',
+                              lambda deps: self._safe_update_report_with_pdf_info(report, deps['pdf'][0]),
+                              after=['pdf'])
             else:
                 result['errors'].append("PDF service no disponible")
             
-            # 5. Subir DataFrame a Azure (operación separada)
-            if self.azure_service and self.azure_service.is_available():
-                dataframe_info = self._upload_dataframe_to_azure(report)
-                if dataframe_info:
-                    result['dataframe_uploaded'] = True
-                    result['urls']['dataframe'] = dataframe_info.get('primary_url')
-                    result['metadata']['dataframe'] = dataframe_info
-                    logger.info(f"✅ DataFrame subido a Azure")
-                    
-                    # 6. Actualizar CSVFile en transacción separada y segura
-                    csv_update_success = self._safe_update_csvfile_with_dataframe_info(report.csv_file, dataframe_info)
-                    if not csv_update_success:
-                        logger.warning("⚠️ Error actualizando CSVFile, pero DataFrame subido exitosamente")
+            # El DataFrame no depende del HTML ni del PDF: se sube mientras se maqueta
+            if azure_available:
+                graph.add('dataframe', lambda deps: self._stage_dataframe(report, progress))
+                graph.add('csv_update',
+                          lambda deps: self._safe_update_csvfile_with_dataframe_info(csv_file, deps['dataframe']),
+                          after=['dataframe'])
+            
+            outcome = graph.run(max_workers=REPORT_PIPELINE_WORKERS)
+            result['timings'] = outcome.timings
+            logger.info(f"⏱️ Etapas del reporte {report.id} (ms): {outcome.timings}")
             
-            # 7. Actualizar estado final en transacción separada
+            # Un render cancelado o fuera de tiempo interrumpe el reporte completo
+            for error in outcome.errors.values():
+                if isinstance(error, PDFRenderInterrupted):
+                    raise error
+            
+            # DataFrame (independiente del resultado del HTML/PDF)
+            dataframe_info = outcome.results.get('dataframe')
+            if dataframe_info:
+                result['dataframe_uploaded'] = True
+                result['urls']['dataframe'] = dataframe_info.get('primary_url')
+                result['metadata']['dataframe'] = dataframe_info
+                if outcome.results.get('csv_update') is False:
+                    logger.warning("⚠️ Error actualizando CSVFile, pero DataFrame subido exitosamente")
+            
+            if 'html' in outcome.errors:
+                result['errors'].append(str(outcome.errors['html']))
+                progress.fail(str(outcome.errors['html']))
+                return result
+            
+            html_content, client_name = outcome.results['html']
+            result['html_generated'] = True
+            result['client_name'] = client_name
+            
+            if 'pdf' in outcome.errors:
+                result['errors'].append(str(outcome.errors['pdf']))
+            elif 'pdf' in outcome.results:
+                pdf_info, pdf_filename, pdf_size = outcome.results['pdf']
+                result['pdf_generated'] = True
+                result['pdf_filename'] = pdf_filename
+                result['pdf_size'] = pdf_size
+                if pdf_info:
+                    result['pdf_uploaded'] = True
+                    result['pdf_reused'] = pdf_info.get('reused', False)
+                    result['urls']['pdf'] = pdf_info['blob_url']
+                    result['metadata']['pdf'] = pdf_info
+                    if outcome.results.get('report_update') is False:
+                        logger.warning("⚠️ Error actualizando Report, pero PDF subido exitosamente")
+                else:
+                    result['errors'].append("Azure Storage no disponible")
+            
+            # Actualizar estado final en transacción separada
             final_update_success = self._safe_update_report_status(report, 'completed')
             
             # Determinar éxito general
             # Considerar exitoso si al menos PDF fue generado y subido
             if result['pdf_generated'] and result['pdf_uploaded']:
                 result['success'] = True
+                progress.complete(pdf_url=result['urls'].get('pdf'), timings=result['timings'])
                 logger.info(f"🎉 Reporte completo generado exitosamente para {client_name}")
             else:
                 result['success'] = False
+                progress.fail('; '.join(result['errors']))
                 logger.error(f"❌ Falló generación completa para {client_name}")
                 
         except Exception as e:
             logger.error(f"❌ Error crítico en generate_complete_report: {e}")
             result['errors'].append(str(e))
+            result['cancelled'] = isinstance(e, PDFRenderCancelled)
+            if result['cancelled']:
+                progress.cancel(str(e))
+            else:
+                progress.fail(str(e))
             
             # Intentar actualizar estado de error en transacción separada
             try:
@@ -134,6 +172,45 @@ class CompleteReportService:
         
         return result
     
+    def _stage_html(self, report, progress) -> Tuple[str, str]:
+        """Etapa HTML: (html, cliente); lanza si no se pudo generar"""
+        progress.update('rendering_html')
+        html_content, client_name = self._generate_html(report)
+        if not html_content:
+            raise RuntimeError("Error generando HTML")
+        progress.update(html_chars=len(html_content))
+        logger.info(f"✅ HTML generado para {client_name}")
+        return html_content, client_name
+    
+    def _stage_pdf(self, report, html_content: str, client_name: str, azure_available: bool,
+                   progress) -> Tuple[Optional[Dict[str, Any]], str, int]:
+        """
+        Etapa PDF: (pdf_info, nombre, bytes). Con Azure se sube (o se reutiliza
+        el blob del mismo HTML); sin Azure solo se genera y pdf_info es None.
+        """
+        if azure_available:
+            pdf_info, pdf_filename = self._generate_and_upload_pdf(report, html_content, client_name, progress)
+            if not pdf_info:
+                raise RuntimeError("Error generando o subiendo PDF a Azure")
+            logger.info(f"✅ PDF en Azure: {pdf_info['blob_name']} ({pdf_info['size_bytes']} bytes)")
+            return pdf_info, pdf_filename, pdf_info['size_bytes']
+        
+        progress.update('rendering_pdf')
+        pdf_bytes, pdf_filename = self._generate_pdf(report, html_content, progress)
+        if not pdf_bytes:
+            raise RuntimeError("Error generando PDF")
+        logger.info(f"✅ PDF generado: {pdf_filename} ({len(pdf_bytes)} bytes)")
+        return None, pdf_filename, len(pdf_bytes)
+    
+    def _stage_dataframe(self, report, progress) -> Optional[Dict[str, Any]]:
+        """Etapa DataFrame (en paralelo con el PDF: se informa como métrica, no como etapa)"""
+        progress.update(dataframe_status='uploading')
+        dataframe_info = self._upload_dataframe_to_azure(report)
+        progress.update(dataframe_status='uploaded' if dataframe_info else 'skipped')
+        if dataframe_info:
+            logger.info(f"✅ DataFrame subido a Azure")
+        return dataframe_info
+    
     def _safe_update_report_with_pdf_info(self, report, pdf_info: Dict[str, Any]) -> bool:
         """Actualizar Report con información del PDF de forma segura"""
         try:
@@ -162,7 +239,8 @@ class CompleteReportService:
                     'blob_url': pdf_info['blob_url'],  # Mantener URL completa aquí
                     'size_bytes': pdf_info['size_bytes'],
                     'uploaded_at': pdf_info['uploaded_at'],
-                    'container': pdf_info['container']
+                    'container': pdf_info['container'],
+                    'content_key': pdf_info.get('content_key')
                 }
                 
                 # Guardar con campos específicos
@@ -237,9 +315,10 @@ class CompleteReportService:
         """Generar HTML del reporte"""
         try:
             from apps.reports.utils.enhanced_analyzer import EnhancedHTMLReportGenerator
+            from apps.reports.utils.cache_manager import ReportCacheManager
             
             generator = EnhancedHTMLReportGenerator()
-            html_content = generator.generate_complete_html(report)
+            html_content = ReportCacheManager.render_html(report, generator)
             
             # Extraer nombre del cliente
             client_name = "Azure Client"
@@ -252,19 +331,45 @@ class CompleteReportService:
             logger.error(f"Error generando HTML: {e}")
             return None, "Azure Client"
     
-    def _generate_pdf(self, report, html_content: str) -> Tuple[Optional[bytes], Optional[str]]:
+    def _generate_pdf(self, report, html_content: str, progress=None) -> Tuple[Optional[bytes], Optional[str]]:
         """Generar PDF desde HTML"""
         try:
             from .pdf_generator_service import generate_report_pdf
-            return generate_report_pdf(report, html_content)
+            return generate_report_pdf(report, html_content, progress=progress)
         except Exception as e:
             logger.error(f"Error generando PDF: {e}")
             return None, None
     
-    def _upload_pdf_to_azure(self, pdf_bytes: bytes, report, client_name: str) -> Optional[Dict[str, Any]]:
+    def _generate_and_upload_pdf(self, report, html_content: str, client_name: str,
+                                 progress=None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        PDF del reporte en Azure, direccionado por el contenido del HTML: si ya
+        existe uno idéntico solo se emite un SAS URL nuevo (pdf_info['reused'])
+        """
+        try:
+            from .pdf_generator_service import PDFGeneratorService, build_pdf_filename
+            from .pdf_artifact_cache import pdf_artifact_cache
+            pdf_filename = build_pdf_filename(report)
+            # Instancia propia: used_fallback es estado por generación
+            pdf_service = PDFGeneratorService(self.pdf_service.preferred_engine)
+            pdf_info = pdf_artifact_cache.get_or_create(
+                html_content, pdf_service, report, client_name,
+                filename=pdf_filename, progress=progress
+            )
+            return pdf_info, pdf_filename
+        except PDFRenderInterrupted:
+            raise
+        except Exception as e:
+            logger.error(f"Error generando/subiendo PDF: {e}")
+            return None, None
+    
+    def _upload_pdf_to_azure(self, pdf_bytes: bytes, report, client_name: str, progress=None) -> Optional[Dict[str, Any]]:
         """Subir PDF a Azure Storage"""
         try:
-            return self.azure_service.upload_pdf(pdf_bytes, str(report.id), client_name)
+            progress_hook = None
+            if progress:
+                progress_hook = progress.bytes_callback('uploading_pdf', 'upload_bytes_sent', 'upload_total_bytes')
+            return self.azure_service.upload_pdf(pdf_bytes, str(report.id), client_name, progress_hook=progress_hook)
         except Exception as e:
             logger.error(f"Error subiendo PDF: {e}")
             return None
@@ -276,9 +381,17 @@ class CompleteReportService:
                 logger.info("No CSV file disponible para subir DataFrame")
                 return None
             
-            from apps.reports.utils.enhanced_analyzer import EnhancedHTMLReportGenerator
-            generator = EnhancedHTMLReportGenerator()
-            df, _ = generator._get_csv_data_safe(report)
+            # Los blobs ya subidos (por este CSV o por otro de idéntico contenido) se reutilizan
+            existing = (report.csv_file.analysis_data or {}).get('azure_dataframe')
+            if existing and existing.get('base_path'):
+                logger.info(f"DataFrame ya disponible en Azure: {existing['base_path']}")
+                return existing
+            
+            from apps.reports.analyzers.advisor_snapshot import load_advisor_snapshot
+            df = load_advisor_snapshot(report.csv_file.id)
+            if df is None:
+                logger.info("Snapshot de datos no disponible para subir DataFrame")
+                return None
             
             if len(df) > 0:
                 metadata = {
@@ -301,6 +414,64 @@ class CompleteReportService:
             logger.error(f"Error subiendo DataFrame: {e}")
             return None
     
+    def generate_category_pdf(self, report, category: str, progress=None) -> Dict[str, Any]:
+        """
+        PDF de una categoría del reporte. Con Azure disponible se direcciona por
+        contenido (se reutiliza el blob si el HTML no cambió); si no, solo se genera.
+        Los renders cancelados o fuera de tiempo propagan PDFRenderInterrupted.
+        """
+        from apps.reports.utils.real_data_html_generator import RealDataHTMLGenerator
+        from apps.reports.utils.cache_manager import ReportCacheManager
+        from .pdf_generator_service import PDFGeneratorService
+        from .pdf_artifact_cache import pdf_artifact_cache
+        
+        # Generar HTML de la categoría
+        if progress:
+            progress.update('rendering_html')
+        generator = RealDataHTMLGenerator()
+        html_content = ReportCacheManager.render_html(report, generator, category)
+        
+        # Crear nombre de archivo específico para categoría
+        client_name = generator._extract_client_name(report)
+        pdf_filename = f"azure_advisor_{category}_{client_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        
+        result = {
+            'success': False,
+            'category': category,
+            'client_name': client_name,
+            'pdf_filename': pdf_filename,
+            'pdf_size': None,
+            'pdf_url': None,
+            'pdf_reused': False
+        }
+        
+        pdf_service = PDFGeneratorService()
+        if pdf_artifact_cache.is_available():
+            pdf_info = pdf_artifact_cache.get_or_create(
+                html_content, pdf_service, report, client_name, filename=pdf_filename, progress=progress
+            )
+            if pdf_info:
+                result['pdf_url'] = pdf_info['blob_url']
+                result['pdf_size'] = pdf_info['size_bytes']
+                result['pdf_reused'] = pdf_info['reused']
+                logger.info(f"✅ PDF de categoría {category} en Azure: {pdf_info['blob_name']}")
+        
+        if result['pdf_size'] is None:
+            if progress:
+                progress.update('rendering_pdf')
+            pdf_bytes = pdf_service.generate_pdf_from_html(html_content, pdf_filename, progress=progress)
+            if not pdf_bytes:
+                result['error'] = 'Error generando PDF de categoría'
+                if progress:
+                    progress.fail(result['error'])
+                return result
+            result['pdf_size'] = len(pdf_bytes)
+        
+        result['success'] = True
+        if progress:
+            progress.complete(category=category, pdf_url=result['pdf_url'], pdf_size=result['pdf_size'])
+        return result
+    
     def _extract_client_name(self, filename: str) -> str:
         """Extraer nombre del cliente del filename"""
         try:
@@ -328,14 +499,12 @@ class CompleteReportService:
             if not html_content:
                 return {'success': False, 'error': 'Error generando HTML'}
             
-            # Generar PDF
-            pdf_bytes, pdf_filename = self._generate_pdf(report, html_content)
-            if not pdf_bytes:
-                return {'success': False, 'error': 'Error generando PDF'}
+            if not self.pdf_service:
+                return {'success': False, 'error': 'PDF service no disponible'}
             
-            # Subir a Azure
+            # Generar y subir PDF (se reutiliza el blob si el HTML no cambió)
             if self.azure_service and self.azure_service.is_available():
-                pdf_info = self._upload_pdf_to_azure(pdf_bytes, report, client_name)
+                pdf_info, pdf_filename = self._generate_and_upload_pdf(report, html_content, client_name)
                 if pdf_info:
                     # Actualizar con método seguro
                     update_success = self._safe_update_report_with_pdf_info(report, pdf_info)
@@ -344,7 +513,8 @@ class CompleteReportService:
                         'success': True,
                         'pdf_url': pdf_info['blob_url'],
                         'pdf_filename': pdf_filename,
-                        'size_bytes': len(pdf_bytes),
+                        'size_bytes': pdf_info['size_bytes'],
+                        'reused': pdf_info.get('reused', False),
                         'db_updated': update_success
                     }
             
@@ -0,0 +1,106 @@
+# backend/apps/storage/services/content_index.py
+"""
+Índice por contenido de los CSV subidos.
+
+El SHA-256 se calcula mientras llegan los chunks del multipart
+(ContentHashUploadHandler, registrado en FILE_UPLOAD_HANDLERS). Si ya existe
+un CSVFile procesado con el mismo contenido del mismo usuario, el nuevo reutiliza
+su análisis, su snapshot Parquet (hard link) y sus blobs de Azure en lugar de
+repetirlo todo. Nunca se reutiliza entre usuarios: el análisis guarda ids de
+origen y URLs SAS de los blobs del otro usuario.
+"""
+import hashlib
+import logging
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils import timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Calcula el hash de cada archivo durante la subida y deja el chunk intacto
+    para el siguiente handler (memoria o archivo temporal)
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self._hasher = None
+        if request is not None and not hasattr(request, 'upload_content_hashes'):
+            request.upload_content_hashes = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.request is not None:
+            self.request.upload_content_hashes[self.field_name] = self._hasher.hexdigest()
+        return None
+
+
+def get_upload_content_hash(request, uploaded_file, field_name: str = 'file') -> str:
+    """Hash calculado durante la subida; si no está disponible se calcula sobre los chunks"""
+    content_hash = getattr(request, 'upload_content_hashes', {}).get(field_name)
+    if content_hash:
+        return content_hash
+
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+def find_processed_duplicate(content_hash: str, user):
+    """CSVFile del usuario ya procesado con el mismo contenido, si existe"""
+    if not content_hash or user is None:
+        return None
+
+    from apps.reports.models import CSVFile
+    candidate = CSVFile.objects.filter(
+        user=user,
+        content_hash=content_hash,
+        processing_status='completed'
+    ).order_by('-processed_date').first()
+
+    # Solo se reutilizan análisis completos (no los fallbacks con error)
+    if candidate is None or not candidate.analysis_data or 'error' in candidate.analysis_data:
+        return None
+    return candidate
+
+
+def reuse_processed_csv(csv_file, source) -> bool:
+    """
+    Completar csv_file con el análisis, snapshot y blobs de source (mismo contenido)
+
+    Returns:
+        True si el snapshot también se pudo enlazar
+    """
+    from apps.reports.analyzers.advisor_snapshot import link_advisor_snapshot
+
+    if source.user_id != csv_file.user_id:
+        raise ValueError("No se reutilizan análisis de otro usuario")
+
+    analysis_data = dict(source.analysis_data)
+    analysis_data['content_source'] = str(source.id)
+    # El delta de source es contra su export anterior, no contra el de csv_file
+    analysis_data.pop('delta', None)
+
+    csv_file.rows_count = source.rows_count
+    csv_file.columns_count = source.columns_count
+    csv_file.analysis_data = analysis_data
+    csv_file.azure_blob_url = source.azure_blob_url
+    csv_file.azure_blob_name = source.azure_blob_name
+    csv_file.processing_status = 'completed'
+    csv_file.processed_date = timezone.now()
+    csv_file.save()
+
+    snapshot_linked = link_advisor_snapshot(source.id, csv_file.id)
+    logger.info(f"✅ CSV {csv_file.id} reutiliza el análisis de {source.id} (mismo contenido)")
+    return snapshot_linked
@@ -0,0 +1,160 @@
+# backend/apps/storage/services/dataframe_export.py
+"""
+Exportación de un DataFrame a Azure en varios formatos en una sola pasada.
+
+Cada formato (CSV gzip, JSON gzip y la muestra) se serializa por bloques de
+filas directamente sobre un BlockBlobWriter: los bytes comprimidos se envían
+como bloques (stage_block) a medida que se producen y el blob se confirma al
+final (commit_block_list). Nunca se construye el CSV ni el JSON completos en
+memoria: cada formato retiene un bloque de filas serializado y un bloque de
+subida.
+
+Los formatos se exportan a la vez en un pool de hilos; zlib y las peticiones
+HTTP liberan el GIL, así que la compresión de un formato solapa con la
+serialización y la subida de los demás.
+"""
+import io
+import gzip
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from django.conf import settings
+import pandas as pd
+from .block_blob_writer import AzureContainerBlockStore, BlockBlobWriter
+
+logger = logging.getLogger(__name__)
+
+# Filas serializadas de cada vez
+DATAFRAME_EXPORT_CHUNK_ROWS = getattr(settings, 'DATAFRAME_EXPORT_CHUNK_ROWS', 20000)
+
+# Tamaño de los bloques subidos con stage_block
+DATAFRAME_EXPORT_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Nivel gzip: 6 comprime casi igual que 9 en bastante menos tiempo
+GZIP_LEVEL = 6
+
+SAMPLE_ROWS = 100
+
+
+class DataFrameExporter:
+    """Exporta un DataFrame en CSV gzip, JSON gzip y muestra JSON, en paralelo"""
+
+    def __init__(self, storage, chunk_rows: int = DATAFRAME_EXPORT_CHUNK_ROWS, block_store=None):
+        self.storage = storage
+        self.chunk_rows = max(1, chunk_rows)
+        # Destino de los bloques; por defecto el contenedor de datos de storage
+        self.block_store = block_store
+
+    def _chunks(self, df: pd.DataFrame):
+        for start in range(0, len(df), self.chunk_rows):
+            yield df.iloc[start:start + self.chunk_rows]
+
+    def _write_csv(self, df: pd.DataFrame, stream):
+        # to_csv con chunksize escribe en el stream bloque a bloque
+        df.to_csv(stream, index=False, chunksize=self.chunk_rows)
+
+    def _write_json(self, df: pd.DataFrame, json_metadata: Dict[str, Any], stream):
+        # Mismo documento que json.dumps({'metadata': ..., 'data': [...]}) sin materializarlo
+        stream.write('{"metadata": ')
+        stream.write(json.dumps(json_metadata, default=str))
+        stream.write(', "data": [')
+        first = True
+        for chunk in self._chunks(df):
+            records = json.dumps(chunk.to_dict('records'), default=str)[1:-1]
+            if not records:
+                continue
+            if not first:
+                stream.write(', ')
+            stream.write(records)
+            first = False
+        stream.write(']}')
+
+    def _export(self, container: str, blob_name: str, write: Callable, compress: bool,
+                content_type: str, metadata: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        block_store = self.block_store or AzureContainerBlockStore(self.storage.blob_service_client, container)
+        writer = BlockBlobWriter(block_store, blob_name, DATAFRAME_EXPORT_BLOCK_SIZE)
+        try:
+            binary = gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=GZIP_LEVEL) if compress else writer
+            stream = io.TextIOWrapper(binary, encoding='utf-8', write_through=True)
+            try:
+                write(stream)
+                stream.flush()
+            finally:
+                # Cerrar el texto cierra el GzipFile (escribe su cola) pero no el writer
+                stream.detach()
+                if compress:
+                    binary.close()
+            if not writer.commit(content_type=content_type, metadata=metadata):
+                raise RuntimeError('commit_block_list falló')
+            return {
+                'blob_name': blob_name,
+                'url': self.storage._generate_sas_url(container, blob_name),
+                'size_bytes': writer.size_bytes,
+            }
+        except Exception as e:
+            logger.error(f"Error exportando blob {blob_name}: {e}")
+            writer.abort()
+            return None
+
+    def export(self, df: pd.DataFrame, csv_file_id: str, base_path: str,
+               metadata: Dict[str, Any] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Subir los tres formatos bajo base_path.
+
+        Returns:
+            Dict formato -> {'blob_name', 'url', 'format', 'size_bytes'} de los
+            formatos subidos correctamente
+        """
+        container = self.storage.containers['data']
+        rows, columns = str(len(df)), str(len(df.columns))
+        sample_df = df.head(SAMPLE_ROWS)
+        json_metadata = {
+            'csv_file_id': str(csv_file_id),
+            'rows_count': len(df),
+            'columns_count': len(df.columns),
+            'columns': list(df.columns),
+            'generated_at': datetime.now().isoformat(),
+            'data_types': df.dtypes.astype(str).to_dict(),
+            **(metadata or {})
+        }
+
+        artifacts = {
+            'csv_compressed': dict(
+                blob_name=f"{base_path}/data.csv.gz", format='csv.gz', compress=True,
+                content_type='application/gzip',
+                write=lambda stream: self._write_csv(df, stream),
+                metadata={'csv_file_id': str(csv_file_id), 'format': 'csv_compressed', 'rows': rows,
+                          'columns': columns, 'generated_at': datetime.now().isoformat()}
+            ),
+            'json_compressed': dict(
+                blob_name=f"{base_path}/data.json.gz", format='json.gz', compress=True,
+                content_type='application/json',
+                write=lambda stream: self._write_json(df, json_metadata, stream),
+                metadata={'csv_file_id': str(csv_file_id), 'format': 'json_compressed', 'rows': rows,
+                          'columns': columns}
+            ),
+            'sample': dict(
+                blob_name=f"{base_path}/sample.json", format='json', compress=False,
+                content_type='application/json',
+                write=lambda stream: stream.write(json.dumps(sample_df.to_dict('records'), default=str)),
+                metadata={'csv_file_id': str(csv_file_id), 'format': 'sample_json', 'is_sample': 'true',
+                          'sample_size': str(len(sample_df))}
+            ),
+        }
+
+        with ThreadPoolExecutor(max_workers=len(artifacts), thread_name_prefix='df-export') as executor:
+            futures = {
+                name: executor.submit(self._export, container, spec['blob_name'], spec['write'],
+                                      spec['compress'], spec['content_type'], spec['metadata'])
+                for name, spec in artifacts.items()
+            }
+
+        uploaded_files = {}
+        for name, future in futures.items():
+            info = future.result()
+            if info and info['url']:
+                info['format'] = artifacts[name]['format']
+                uploaded_files[name] = info
+        return uploaded_files
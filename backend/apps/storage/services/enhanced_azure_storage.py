@@ -10,6 +10,9 @@ from django.utils import timezone
 import io
 import gzip
 import base64
+from apps.reports.analyzers.advisor_schema import read_advisor_csv, apply_advisor_schema
+from apps.reports.analyzers.advisor_snapshot import load_advisor_snapshot
+from .blob_client_registry import AZURE_STORAGE_MAX_CONCURRENCY, get_blob_service_client
 
 try:
     from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient, generate_blob_sas, BlobSasPermissions
@@ -38,12 +41,13 @@ class EnhancedAzureStorageService:
             'cache': f"{self.container_name}-cache"
         }
         
-        self.blob_service_client = None
+        self._client_ready = False
         
         if AZURE_AVAILABLE and self.account_name and self.account_key:
             try:
-                connection_string = f"DefaultEndpointsProtocol=https;AccountName={self.account_name};AccountKey={self.account_key};EndpointSuffix=core.windows.net"
-                self.blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+                # Cliente compartido por proceso con AzureStorageService (ver blob_client_registry)
+                get_blob_service_client(self.account_name, self.account_key)
+                self._client_ready = True
                 
                 # Crear contenedores si no existen
                 self._ensure_containers_exist()
@@ -51,10 +55,17 @@ class EnhancedAzureStorageService:
                 
             except Exception as e:
                 logger.error(f"❌ Error inicializando Azure Storage: {e}")
-                self.blob_service_client = None
+                self._client_ready = False
         else:
             logger.warning("⚠️ Azure Storage no configurado completamente")
 
+    @property
+    def blob_service_client(self):
+        """Cliente compartido del proceso (None si Azure no está configurado)"""
+        if not self._client_ready:
+            return None
+        return get_blob_service_client(self.account_name, self.account_key)
+
     def _ensure_containers_exist(self):
         """Crear contenedores necesarios si no existen"""
         if not self.is_available():
@@ -77,9 +88,13 @@ class EnhancedAzureStorageService:
     # MÉTODOS PARA PDFs
     # =============================================
     
-    def upload_pdf(self, pdf_bytes: bytes, report_id: str, client_name: str = "client") -> Optional[Dict[str, str]]:
+    def upload_pdf(self, pdf_bytes: bytes, report_id: str, client_name: str = "client",
+                   progress_hook=None, blob_name: str = None) -> Optional[Dict[str, str]]:
         """
         Subir PDF de reporte a Azure Storage - VERSIÓN CORREGIDA
+        
+        progress_hook: callback (bytes_enviados, total) del SDK durante la subida
+        blob_name: nombre del blob (por defecto reports/<cliente>/<reporte>_<timestamp>.pdf)
         """
         if not self.is_available():
             logger.warning("Azure Storage no disponible para subir PDF")
@@ -89,7 +104,7 @@ class EnhancedAzureStorageService:
             # Crear nombre único para el PDF
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             safe_client_name = self._sanitize_filename(client_name)
-            blob_name = f"reports/{safe_client_name}/{report_id}_{timestamp}.pdf"
+            blob_name = blob_name or f"reports/{safe_client_name}/{report_id}_{timestamp}.pdf"
             
             # Subir PDF - CORRECCIÓN: usar ContentSettings correctamente
             from azure.storage.blob import ContentSettings
@@ -112,7 +127,9 @@ class EnhancedAzureStorageService:
                     'client_name': client_name,
                     'generated_at': datetime.now().isoformat(),
                     'file_type': 'azure_advisor_pdf'
-                }
+                },
+                progress_hook=progress_hook,
+                max_concurrency=AZURE_STORAGE_MAX_CONCURRENCY
             )
             
             # Generar URL con SAS token para acceso
@@ -133,13 +150,43 @@ class EnhancedAzureStorageService:
         except Exception as e:
             logger.error(f"❌ Error subiendo PDF: {e}")
             return None
+
+    def get_pdf_info(self, blob_name: str) -> Optional[Dict[str, str]]:
+        """
+        Información de un PDF ya subido, con un SAS URL nuevo (mismo formato
+        que upload_pdf). None si el blob no existe.
+        """
+        if not self.is_available():
+            return None
+            
+        try:
+            container_client = self.blob_service_client.get_container_client(self.containers['pdfs'])
+            blob_client = container_client.get_blob_client(blob_name)
+            properties = blob_client.get_blob_properties()
+        except Exception as e:
+            logger.info(f"PDF {blob_name} no disponible: {e}")
+            return None
+        
+        pdf_url = self._generate_sas_url(self.containers['pdfs'], blob_name, hours=24*30)  # 30 días
+        if not pdf_url:
+            return None
+        
+        return {
+            'blob_name': blob_name,
+            'blob_url': pdf_url,
+            'public_url': blob_client.url,
+            'container': self.containers['pdfs'],
+            'size_bytes': properties.size,
+            'uploaded_at': properties.last_modified.isoformat() if properties.last_modified else timezone.now().isoformat()
+        }
     # =============================================
     # MÉTODOS PARA DATAFRAMES
     # =============================================
     
     def upload_dataframe(self, df: pd.DataFrame, csv_file_id: str, metadata: Dict[str, Any] = None) -> Optional[Dict[str, str]]:
         """
-        Subir DataFrame como datos raw en múltiples formatos - VERSIÓN CORREGIDA
+        Subir DataFrame como datos raw en múltiples formatos (CSV gzip, JSON gzip
+        y muestra de 100 filas), en una sola pasada sin construirlos en memoria
         """
         if not self.is_available():
             logger.warning("Azure Storage no disponible para subir DataFrame")
@@ -149,104 +196,11 @@ class EnhancedAzureStorageService:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             base_path = f"dataframes/{csv_file_id}/{timestamp}"
             
-            uploaded_files = {}
-            
-            # CORRECCIÓN: Importar ContentSettings
-            from azure.storage.blob import ContentSettings
-            
-            # 1. Guardar como CSV comprimido (para lectura rápida)
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False)
-            csv_compressed = gzip.compress(csv_buffer.getvalue().encode('utf-8'))
-            
-            csv_blob_name = f"{base_path}/data.csv.gz"
-            csv_url = self._upload_blob_fixed(
-                self.containers['data'], 
-                csv_blob_name, 
-                csv_compressed,
-                content_type='application/gzip',
-                metadata_dict={
-                    'csv_file_id': str(csv_file_id),
-                    'format': 'csv_compressed',
-                    'rows': str(len(df)),
-                    'columns': str(len(df.columns)),
-                    'generated_at': datetime.now().isoformat()
-                }
-            )
-            
-            if csv_url:
-                uploaded_files['csv_compressed'] = {
-                    'blob_name': csv_blob_name,
-                    'url': csv_url,
-                    'format': 'csv.gz',
-                    'size_bytes': len(csv_compressed)
-                }
-            
-            # 2. Guardar como JSON (para compatibilidad con frontend)
-            json_data = {
-                'metadata': {
-                    'csv_file_id': str(csv_file_id),
-                    'rows_count': len(df),
-                    'columns_count': len(df.columns),
-                    'columns': list(df.columns),
-                    'generated_at': datetime.now().isoformat(),
-                    'data_types': df.dtypes.astype(str).to_dict(),
-                    **(metadata or {})
-                },
-                'data': df.to_dict('records')
-            }
-            
-            # CORRECCIÓN: Remover ensure_ascii que no existe en pandas más nuevos
-            json_compressed = gzip.compress(json.dumps(json_data, default=str).encode('utf-8'))
-            json_blob_name = f"{base_path}/data.json.gz"
-            
-            json_url = self._upload_blob_fixed(
-                self.containers['data'],
-                json_blob_name,
-                json_compressed,
-                content_type='application/json',
-                metadata_dict={
-                    'csv_file_id': str(csv_file_id),
-                    'format': 'json_compressed',
-                    'rows': str(len(df)),
-                    'columns': str(len(df.columns))
-                }
-            )
-            
-            if json_url:
-                uploaded_files['json_compressed'] = {
-                    'blob_name': json_blob_name,
-                    'url': json_url,
-                    'format': 'json.gz',
-                    'size_bytes': len(json_compressed)
-                }
-            
-            # 3. Guardar muestra pequeña sin comprimir (para vista rápida)
-            sample_df = df.head(100)  # Primeras 100 filas
-            # CORRECCIÓN: Usar json.dumps en lugar de to_json con parámetros no válidos
-            sample_json = json.dumps(sample_df.to_dict('records'), default=str)
-            sample_blob_name = f"{base_path}/sample.json"
-            
-            sample_url = self._upload_blob_fixed(
-                self.containers['data'],
-                sample_blob_name,
-                sample_json.encode('utf-8'),
-                content_type='application/json',
-                metadata_dict={
-                    'csv_file_id': str(csv_file_id),
-                    'format': 'sample_json',
-                    'is_sample': 'true',
-                    'sample_size': str(len(sample_df))
-                }
-            )
-            
-            if sample_url:
-                uploaded_files['sample'] = {
-                    'blob_name': sample_blob_name,
-                    'url': sample_url,
-                    'format': 'json',
-                    'size_bytes': len(sample_json.encode('utf-8'))
-                }
+            # CSV gzip, JSON gzip y muestra: serializados por bloques directamente
+            # sobre block blobs y subidos en paralelo
+            from .dataframe_export import DataFrameExporter
+            uploaded_files = DataFrameExporter(self).export(df, csv_file_id, base_path, metadata)
+            self._record_dataframe_manifest(csv_file_id, uploaded_files)
             
             logger.info(f"✅ DataFrame subido en {len(uploaded_files)} formatos para CSV {csv_file_id}")
             return {
@@ -273,6 +227,9 @@ class EnhancedAzureStorageService:
         """
         Descargar DataFrame desde Azure Storage
         
+        Para los formatos completos se usa primero el snapshot Parquet local
+        (sin red ni descompresión); los blobs quedan como respaldo.
+        
         Args:
             csv_file_id: ID del archivo CSV
             format_type: Tipo de formato ('csv_compressed', 'json_compressed', 'sample')
@@ -280,38 +237,26 @@ class EnhancedAzureStorageService:
         Returns:
             DataFrame o None si hay error
         """
+        if format_type in ('csv_compressed', 'json_compressed'):
+            df = load_advisor_snapshot(csv_file_id)
+            if df is not None:
+                logger.info(f"✅ DataFrame cargado desde snapshot: {len(df)} filas, {len(df.columns)} columnas")
+                return df
+        
         if not self.is_available():
             logger.warning("Azure Storage no disponible para descargar DataFrame")
             return None
             
         try:
-            # Buscar el archivo más reciente para este CSV
             container_client = self.blob_service_client.get_container_client(self.containers['data'])
             
-            # Listar blobs con el prefijo correcto
-            prefix = f"dataframes/{csv_file_id}/"
-            blobs = container_client.list_blobs(name_starts_with=prefix)
-            
-            # Encontrar el blob más reciente del formato solicitado
-            target_blob = None
-            latest_time = None
-            
-            for blob in blobs:
-                if format_type == 'csv_compressed' and blob.name.endswith('data.csv.gz'):
-                    blob_time = blob.last_modified
-                    if latest_time is None or blob_time > latest_time:
-                        latest_time = blob_time
-                        target_blob = blob.name
-                elif format_type == 'json_compressed' and blob.name.endswith('data.json.gz'):
-                    blob_time = blob.last_modified
-                    if latest_time is None or blob_time > latest_time:
-                        latest_time = blob_time
-                        target_blob = blob.name
-                elif format_type == 'sample' and blob.name.endswith('sample.json'):
-                    blob_time = blob.last_modified
-                    if latest_time is None or blob_time > latest_time:
-                        latest_time = blob_time
-                        target_blob = blob.name
+            # Blob más reciente del formato: una consulta indexada al manifiesto
+            target_blob = self._get_dataframe_manifest_blob(csv_file_id, format_type)
+            if not target_blob:
+                # DataFrames exportados antes del manifiesto: listar y registrar
+                target_blob = self._find_latest_dataframe_blob(container_client, csv_file_id, format_type)
+                if target_blob:
+                    self._record_dataframe_manifest(csv_file_id, {format_type: {'blob_name': target_blob}})
             
             if not target_blob:
                 logger.warning(f"No se encontró DataFrame para CSV {csv_file_id} formato {format_type}")
@@ -319,21 +264,21 @@ class EnhancedAzureStorageService:
             
             # Descargar el blob
             blob_client = container_client.get_blob_client(target_blob)
-            blob_data = blob_client.download_blob().readall()
+            blob_data = blob_client.download_blob(max_concurrency=AZURE_STORAGE_MAX_CONCURRENCY).readall()
             
             # Procesar según el formato
             if format_type == 'csv_compressed':
                 decompressed_data = gzip.decompress(blob_data).decode('utf-8')
-                df = pd.read_csv(io.StringIO(decompressed_data))
+                df = read_advisor_csv(io.StringIO(decompressed_data), columns=None)
                 
             elif format_type == 'json_compressed':
                 decompressed_data = gzip.decompress(blob_data).decode('utf-8')
                 json_data = json.loads(decompressed_data)
-                df = pd.DataFrame(json_data['data'])
+                df = apply_advisor_schema(pd.DataFrame(json_data['data']))
                 
             elif format_type == 'sample':
                 json_data = json.loads(blob_data.decode('utf-8'))
-                df = pd.DataFrame(json_data)
+                df = apply_advisor_schema(pd.DataFrame(json_data))
                 
             else:
                 raise ValueError(f"Formato no soportado: {format_type}")
@@ -349,6 +294,66 @@ class EnhancedAzureStorageService:
     # MÉTODOS AUXILIARES
     # =============================================
     
+    def _get_dataframe_manifest_blob(self, csv_file_id: str, format_type: str) -> Optional[str]:
+        """Blob más reciente del formato según el manifiesto (None si no está registrado)"""
+        try:
+            from apps.storage.models import DataFrameArtifact
+            return (DataFrameArtifact.objects
+                    .filter(csv_file_id=csv_file_id, format=format_type)
+                    .values_list('blob_name', flat=True)
+                    .first())
+        except Exception as e:
+            logger.warning(f"Error leyendo manifiesto de DataFrame {csv_file_id}: {e}")
+            return None
+    
+    def _record_dataframe_manifest(self, csv_file_id: str, uploaded_files: Dict[str, Dict[str, Any]]):
+        """
+        Registrar en el manifiesto los blobs subidos (un upsert por lote: los
+        formatos de una exportación quedan visibles a la vez)
+        """
+        if not uploaded_files:
+            return
+        try:
+            from apps.storage.models import DataFrameArtifact
+            now = timezone.now()
+            DataFrameArtifact.objects.bulk_create(
+                [
+                    DataFrameArtifact(
+                        csv_file_id=csv_file_id,
+                        format=format_type,
+                        container_name=self.containers['data'],
+                        blob_name=info['blob_name'],
+                        size_bytes=info.get('size_bytes') or 0,
+                        uploaded_at=now
+                    )
+                    for format_type, info in uploaded_files.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['csv_file', 'format'],
+                update_fields=['container_name', 'blob_name', 'size_bytes', 'uploaded_at']
+            )
+        except Exception as e:
+            logger.warning(f"Error actualizando manifiesto de DataFrame {csv_file_id}: {e}")
+    
+    def _find_latest_dataframe_blob(self, container_client, csv_file_id: str, format_type: str) -> Optional[str]:
+        """Blob más reciente del formato listando dataframes/<csv_file_id>/ (sin manifiesto)"""
+        suffixes = {
+            'csv_compressed': 'data.csv.gz',
+            'json_compressed': 'data.json.gz',
+            'sample': 'sample.json',
+        }
+        suffix = suffixes.get(format_type)
+        if not suffix:
+            return None
+        
+        target_blob = None
+        latest_time = None
+        for blob in container_client.list_blobs(name_starts_with=f"dataframes/{csv_file_id}/"):
+            if blob.name.endswith(suffix) and (latest_time is None or blob.last_modified > latest_time):
+                latest_time = blob.last_modified
+                target_blob = blob.name
+        return target_blob
+    
     def _upload_blob(self, container_name: str, blob_name: str, data: bytes, content_type: str = None, metadata: Dict[str, str] = None) -> Optional[str]:
         """Método auxiliar para subir blob - VERSIÓN CORREGIDA"""
         return self._upload_blob_fixed(container_name, blob_name, data, content_type, metadata)
@@ -371,7 +376,8 @@ class EnhancedAzureStorageService:
                 data,
                 overwrite=True,
                 content_settings=content_settings,
-                metadata=metadata_dict
+                metadata=metadata_dict,
+                max_concurrency=AZURE_STORAGE_MAX_CONCURRENCY
             )
             
             # Retornar URL con SAS token
@@ -382,21 +388,13 @@ class EnhancedAzureStorageService:
             return None
 
     def _generate_sas_url(self, container_name: str, blob_name: str, hours: int = 24) -> Optional[str]:
-        """Generar URL con SAS token"""
+        """URL con SAS token de lectura (reutilizada hasta cerca de su caducidad, ver sas_cache)"""
         try:
             if not self.account_key:
                 return None
-                
-            sas_token = generate_blob_sas(
-                account_name=self.account_name,
-                account_key=self.account_key,
-                container_name=container_name,
-                blob_name=blob_name,
-                permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(hours=hours)
-            )
             
-            return f"https://{self.account_name}.blob.core.windows.net/{container_name}/{blob_name}?{sas_token}"
+            from .sas_cache import sas_url_cache
+            return sas_url_cache.get_url(self.account_name, self.account_key, container_name, blob_name, hours=hours)
             
         except Exception as e:
             logger.error(f"Error generando SAS URL: {e}")
@@ -426,18 +424,23 @@ class EnhancedAzureStorageService:
                 'timestamp': datetime.now().isoformat()
             }
             
-            # Obtener estadísticas de contenedores
+            # Obtener estadísticas de contenedores (se listan a la vez en el event loop compartido)
+            from .async_blob_storage import gather_bounded, get_async_blob_storage, run_blob_io
+            storage = get_async_blob_storage(self.account_name, self.account_key)
+            listings = run_blob_io(gather_bounded(
+                (storage.list_blobs(container_name) for container_name in self.containers.values()),
+                return_exceptions=True
+            ))
+            
             container_stats = {}
-            for container_type, container_name in self.containers.items():
-                try:
-                    container_client = self.blob_service_client.get_container_client(container_name)
-                    blobs = list(container_client.list_blobs())
+            for container_type, blobs in zip(self.containers, listings):
+                if isinstance(blobs, Exception):
+                    container_stats[container_type] = {'error': 'Unable to access'}
+                else:
                     container_stats[container_type] = {
                         'blob_count': len(blobs),
-                        'total_size': sum(blob.size for blob in blobs if blob.size)
+                        'total_size': sum(blob['size'] for blob in blobs if blob['size'])
                     }
-                except Exception:
-                    container_stats[container_type] = {'error': 'Unable to access'}
             
             info['container_stats'] = container_stats
             return info
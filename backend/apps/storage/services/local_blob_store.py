@@ -0,0 +1,70 @@
+# backend/apps/storage/services/local_blob_store.py
+"""
+Almacén de blobs sobre el sistema de archivos, con la misma interfaz de
+block blobs que AzureStorageService (stage_block / commit_block_list /
+delete_file). Se usa en desarrollo y tests cuando Azure no está configurado.
+"""
+import os
+import shutil
+import logging
+from django.conf import settings
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBlobStore:
+    """Block blobs en disco: cada bloque es un archivo hasta que se confirma la lista"""
+
+    def __init__(self, root: str = None):
+        self.root = str(root or getattr(settings, 'LOCAL_BLOB_STORE_DIR', os.path.join(settings.MEDIA_ROOT, 'blobs')))
+
+    def is_configured(self) -> bool:
+        return True
+
+    def _blob_path(self, file_name: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, file_name))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Nombre de blob no válido: {file_name}")
+        return path
+
+    def _blocks_dir(self, file_name: str) -> str:
+        return f"{self._blob_path(file_name)}.blocks"
+
+    def stage_block(self, file_name: str, block_id: str, data: bytes):
+        blocks_dir = self._blocks_dir(file_name)
+        os.makedirs(blocks_dir, exist_ok=True)
+        with open(os.path.join(blocks_dir, block_id), 'wb') as block:
+            block.write(data)
+
+    def commit_block_list(self, file_name: str, block_ids: List[str], content_type: str = None,
+                          metadata: Dict[str, str] = None) -> Optional[str]:
+        # content_type y metadata no se guardan en disco
+        try:
+            path = self._blob_path(file_name)
+            blocks_dir = self._blocks_dir(file_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            with open(path, 'wb') as blob:
+                for block_id in block_ids:
+                    with open(os.path.join(blocks_dir, block_id), 'rb') as block:
+                        shutil.copyfileobj(block, blob)
+
+            shutil.rmtree(blocks_dir, ignore_errors=True)
+            logger.info(f"Blob local confirmado: {path} ({len(block_ids)} bloques)")
+            return f"file://{path}"
+
+        except Exception as e:
+            logger.error(f"Error confirmando blob local {file_name}: {str(e)}")
+            return None
+
+    def delete_file(self, file_name: str) -> bool:
+        try:
+            shutil.rmtree(self._blocks_dir(file_name), ignore_errors=True)
+            path = self._blob_path(file_name)
+            if os.path.exists(path):
+                os.remove(path)
+            return True
+        except Exception as e:
+            logger.error(f"Error eliminando blob local {file_name}: {str(e)}")
+            return False
@@ -0,0 +1,199 @@
+# backend/apps/storage/services/passthrough_upload.py
+"""
+Upload pass-through: los chunks del multipart van a la vez a un block blob
+(staging por bloques) y al parser en streaming, sin que el archivo llegue a
+estar completo en memoria ni en disco local.
+
+PassThroughUploadHandler es el handler terminal de la cadena; el análisis se
+ejecuta en un hilo que consume los chunks a través de una tubería acotada, de
+modo que la memoria queda limitada por UPLOAD_BLOCK_SIZE + UPLOAD_PIPE_MAX_CHUNKS.
+
+La extensión y MAX_UPLOAD_FILE_SIZE se validan mientras llega el archivo: un
+upload rechazado corta con StopUpload (el resto del cuerpo se descarta sin
+subirlo ni parsearlo) y deja el motivo en request.upload_rejection.
+"""
+import io
+import os
+import uuid
+import queue
+import logging
+import threading
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+from typing import Any, Dict, Optional
+from .block_blob_writer import BlockBlobWriter
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque del block blob (Azure admite hasta 4000 MiB; 4 MiB es el valor habitual del SDK)
+UPLOAD_BLOCK_SIZE = getattr(settings, 'UPLOAD_BLOCK_SIZE', 4 * 1024 * 1024)
+
+# Chunks del multipart (64 KiB por defecto) que pueden esperar al parser
+UPLOAD_PIPE_MAX_CHUNKS = getattr(settings, 'UPLOAD_PIPE_MAX_CHUNKS', 64)
+
+
+def get_block_store():
+    """Azure si está configurado; si no, el almacén local sobre disco"""
+    from .azure_storage_service import azure_storage
+    if azure_storage.is_configured():
+        return azure_storage
+
+    from .local_blob_store import LocalBlobStore
+    return LocalBlobStore()
+
+
+class StreamPipe(io.RawIOBase):
+    """
+    Tubería acotada entre el handler (productor, hilo de la petición) y el
+    parser (consumidor, hilo de análisis). Si el consumidor termina antes, el
+    productor deja de esperar y descarta los datos restantes.
+    """
+
+    def __init__(self, max_chunks: int = UPLOAD_PIPE_MAX_CHUNKS):
+        super().__init__()
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._current = memoryview(b'')
+        self._eof = False
+        self.consumer_done = threading.Event()
+
+    def readable(self) -> bool:
+        return True
+
+    def put(self, data: Optional[bytes]):
+        """Añadir un chunk (None = fin de datos); bloquea si el parser va por detrás"""
+        while not self.consumer_done.is_set():
+            try:
+                self._queue.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def readinto(self, buffer) -> int:
+        if not self._current and not self._eof:
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+            else:
+                self._current = memoryview(item)
+        if not self._current:
+            return 0
+
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+
+class PassThroughUploadedFile(UploadedFile):
+    """
+    Resultado del upload pass-through: no contiene los datos, solo dónde
+    quedaron (blob) y el análisis calculado durante la subida
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra,
+                 csv_file_id, store, blob_name: str, blob_url: Optional[str],
+                 analysis_results: Dict[str, Any]):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.csv_file_id = csv_file_id
+        self.store = store
+        self.blob_name = blob_name
+        self.blob_url = blob_url
+        self.analysis_results = analysis_results
+
+    def discard(self):
+        """Eliminar el blob y el snapshot generados (upload rechazado o duplicado)"""
+        from apps.reports.analyzers.advisor_snapshot import delete_advisor_snapshot
+        self.store.delete_file(self.blob_name)
+        delete_advisor_snapshot(self.csv_file_id)
+
+
+class PassThroughUploadHandler(FileUploadHandler):
+    """
+    Handler terminal: envía cada chunk al block blob y al parser en streaming.
+    Se instala por petición desde la vista de upload (modo pass-through).
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        from apps.reports.analyzers.advisor_snapshot import get_snapshot_path
+
+        if not self.file_name.lower().endswith('.csv'):
+            self._reject('Solo se permiten archivos CSV')
+
+        self.max_size = getattr(settings, 'MAX_UPLOAD_FILE_SIZE', 500 * 1024 * 1024)
+        self.received = 0
+        self.csv_file_id = uuid.uuid4()
+        self.store = get_block_store()
+        self.blob_name = f"uploads/{self.csv_file_id}/{os.path.basename(self.file_name)}"
+        self.writer = BlockBlobWriter(self.store, self.blob_name, UPLOAD_BLOCK_SIZE)
+        self.pipe = StreamPipe()
+        self.analysis_results: Dict[str, Any] = {}
+
+        self._thread = threading.Thread(
+            target=self._analyze,
+            args=(get_snapshot_path(self.csv_file_id),),
+            name=f"passthrough-{self.csv_file_id}",
+            daemon=True
+        )
+        self._thread.start()
+        raise StopFutureHandlers()
+
+    def _analyze(self, snapshot_path: str):
+        from apps.reports.analyzers.csv_analyzer import analyze_csv_stream
+        try:
+            self.analysis_results = analyze_csv_stream(io.BufferedReader(self.pipe), snapshot_path=snapshot_path)
+        except Exception as e:
+            logger.error(f"Error en análisis pass-through: {e}")
+            self.analysis_results = {'error': str(e)}
+        finally:
+            self.pipe.consumer_done.set()
+
+    def _reject(self, error: str):
+        """Cortar el upload; la vista responde 400 con el motivo"""
+        if self.request is not None:
+            self.request.upload_rejection = error
+        logger.warning(f"Upload pass-through rechazado ({self.file_name}): {error}")
+        raise StopUpload(connection_reset=False)
+
+    def _abort(self):
+        """Parar el análisis y eliminar el blob y el snapshot parciales"""
+        from apps.reports.analyzers.advisor_snapshot import delete_advisor_snapshot
+        self.pipe.put(None)
+        self._thread.join()
+        self.writer.abort()
+        delete_advisor_snapshot(self.csv_file_id)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self._abort()
+            self._reject(f'El archivo debe ser menor a {self.max_size // (1024 * 1024)}MB')
+
+        self.writer.write(raw_data)
+        self.pipe.put(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.pipe.put(None)
+        self._thread.join()
+        blob_url = self.writer.commit(self.content_type)
+
+        logger.info(f"Upload pass-through completo: {self.file_name} ({file_size} bytes, "
+                    f"{len(self.writer.block_ids)} bloques)")
+        return PassThroughUploadedFile(
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+            csv_file_id=self.csv_file_id,
+            store=self.store,
+            blob_name=self.blob_name,
+            blob_url=blob_url,
+            analysis_results=self.analysis_results,
+        )
+
+    def upload_interrupted(self):
+        if getattr(self, 'writer', None) is not None:
+            self._abort()
@@ -0,0 +1,150 @@
+# backend/apps/storage/services/pdf_artifact_cache.py
+"""
+PDFs direccionados por contenido.
+
+La clave de un PDF es el SHA-256 del HTML de entrada junto con el motor que lo
+maqueta (y su versión) y la versión de la hoja de estilos de impresión. El blob
+se sube con esa clave como nombre, de modo que regenerar un reporte cuyo HTML
+no cambió reutiliza el blob existente: no se maqueta ni se sube nada, solo se
+emite un SAS URL nuevo.
+
+Un índice clave -> blob en report_cache evita consultar Azure en cada acierto;
+si la entrada expiró se comprueba el blob (una petición HEAD) antes de
+maquetar. La generación pasa por el single-flight de report_cache, así que dos
+regeneraciones simultáneas del mismo HTML maquetan una sola vez.
+"""
+import hashlib
+import logging
+from django.conf import settings
+from typing import Any, Dict, Optional
+from apps.reports.utils.tiered_cache import report_cache
+
+logger = logging.getLogger(__name__)
+
+# Carpeta (contenedor de PDFs) de los blobs direccionados por contenido
+PDF_ARTIFACT_PREFIX = 'reports/sha256'
+
+# Vida de las entradas del índice (acota cuánto se sigue sirviendo un blob borrado a mano)
+PDF_ARTIFACT_INDEX_TIMEOUT = getattr(settings, 'PDF_ARTIFACT_INDEX_TIMEOUT', 24 * 3600)
+
+# Validez de los SAS URL emitidos (igual que upload_pdf)
+PDF_SAS_HOURS = 24 * 30
+
+
+def compute_pdf_key(html_content: str, engine_signature: str) -> str:
+    """Clave de contenido de un PDF: HTML de entrada + motor y hoja de estilos"""
+    digest = hashlib.sha256()
+    digest.update(engine_signature.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(html_content.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PDFArtifactCache:
+    """Genera y sube un PDF solo si no existe ya uno con la misma clave de contenido"""
+
+    def __init__(self, storage=None):
+        self._storage = storage
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            from .enhanced_azure_storage import enhanced_azure_storage
+            self._storage = enhanced_azure_storage
+        return self._storage
+
+    def is_available(self) -> bool:
+        return self.storage.is_available()
+
+    @staticmethod
+    def blob_name(pdf_key: str) -> str:
+        return f"{PDF_ARTIFACT_PREFIX}/{pdf_key[:2]}/{pdf_key}.pdf"
+
+    @staticmethod
+    def _index_key(pdf_key: str) -> str:
+        return f"pdf_artifact:{pdf_key}"
+
+    @staticmethod
+    def _index_entry(pdf_info: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'blob_name': pdf_info['blob_name'],
+            'container': pdf_info['container'],
+            'size_bytes': pdf_info['size_bytes'],
+            'uploaded_at': pdf_info['uploaded_at'],
+        }
+
+    def _pdf_info_from_entry(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """pdf_info (formato de upload_pdf) de un blob existente, con SAS URL nuevo"""
+        blob_url = self.storage._generate_sas_url(entry['container'], entry['blob_name'], hours=PDF_SAS_HOURS)
+        if not blob_url:
+            return None
+        blob_client = self.storage.blob_service_client.get_blob_client(entry['container'], entry['blob_name'])
+        return {
+            **entry,
+            'blob_url': blob_url,
+            'public_url': blob_client.url,
+        }
+
+    def get_or_create(self, html_content: str, pdf_service, report, client_name: str,
+                      filename: str = None, progress=None) -> Optional[Dict[str, Any]]:
+        """
+        pdf_info del PDF de html_content: el blob existente si ya se generó uno
+        con la misma clave; si no, se maqueta con pdf_service y se sube.
+
+        Al pdf_info se añaden 'content_key' y 'reused' (True si no hubo
+        maquetación ni subida). El PDF básico de fallback se sube con nombre
+        propio y no se indexa. Devuelve None si falla la subida.
+        """
+        pdf_key = compute_pdf_key(html_content, pdf_service.engine_signature())
+        blob_name = self.blob_name(pdf_key)
+        created = {}
+
+        def produce():
+            # El blob puede existir aunque su entrada del índice haya expirado
+            existing = self.storage.get_pdf_info(blob_name)
+            if existing:
+                return self._index_entry(existing)
+
+            if progress:
+                progress.update('rendering_pdf')
+            pdf_bytes = pdf_service.generate_pdf_from_html(html_content, filename, progress=progress)
+
+            progress_hook = None
+            if progress:
+                progress.update('uploading_pdf', pdf_bytes=len(pdf_bytes), upload_bytes_sent=0,
+                                upload_total_bytes=len(pdf_bytes))
+                progress_hook = progress.bytes_callback('uploading_pdf', 'upload_bytes_sent', 'upload_total_bytes')
+
+            if pdf_service.used_fallback:
+                created['info'] = self.storage.upload_pdf(pdf_bytes, str(report.id), client_name,
+                                                          progress_hook=progress_hook)
+                return None
+
+            created['info'] = self.storage.upload_pdf(pdf_bytes, str(report.id), client_name,
+                                                      progress_hook=progress_hook, blob_name=blob_name)
+            if not created['info']:
+                return None
+            return self._index_entry(created['info'])
+
+        entry = report_cache.get_or_set(self._index_key(pdf_key), produce, PDF_ARTIFACT_INDEX_TIMEOUT)
+
+        if 'info' in created:
+            pdf_info = created['info']
+            if pdf_info:
+                pdf_info.update(content_key=pdf_key, reused=False)
+            return pdf_info
+
+        if entry is None:
+            return None
+
+        pdf_info = self._pdf_info_from_entry(entry)
+        if pdf_info:
+            pdf_info.update(content_key=pdf_key, reused=True)
+            if progress:
+                progress.update(pdf_reused=True, pdf_bytes=entry['size_bytes'])
+            logger.info(f"♻️ PDF reutilizado para reporte {report.id}: {entry['blob_name']}")
+        return pdf_info
+
+
+# Instancia global
+pdf_artifact_cache = PDFArtifactCache()
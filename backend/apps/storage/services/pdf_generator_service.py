@@ -1,10 +1,13 @@
 # backend/apps/storage/services/pdf_generator_service.py
 import io
+import hashlib
 import logging
 from typing import Optional, Tuple
 from datetime import datetime
 import tempfile
 import os
+from .pdf_renderer import WeasyPrintRenderQueue
+from .pdf_render_pool import PDFRenderPool, PDFRenderInterrupted, PDFRenderPoolUnavailable
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +36,71 @@ try:
 except ImportError:
     PDF_GENERATORS['reportlab'] = False
 
+# Hoja de estilos de impresión común a todos los PDFs.
+# Incrementar PDF_STYLESHEET_VERSION al cambiarla: forma parte de la clave de los PDFs cacheados
+PDF_STYLESHEET_VERSION = 1
+PDF_STYLESHEET = '''
+    @page {
+        size: A4;
+        margin: 1cm;
+    }
+
+    body {
+        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+        font-size: 10pt;
+        line-height: 1.4;
+    }
+
+    .container {
+        max-width: none;
+        background: white;
+        box-shadow: none;
+    }
+
+    .report-header {
+        background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
+        -webkit-print-color-adjust: exact;
+        color-adjust: exact;
+        print-color-adjust: exact;
+    }
+
+    .charts-section {
+        page-break-inside: avoid;
+    }
+
+    .recommendations-table {
+        font-size: 8pt;
+        page-break-inside: auto;
+    }
+
+    .recommendations-table tr {
+        page-break-inside: avoid;
+    }
+
+    .impact-bar {
+        -webkit-print-color-adjust: exact;
+        color-adjust: exact;
+        print-color-adjust: exact;
+    }
+
+    .metric-card {
+        page-break-inside: avoid;
+    }
+
+    @media print {
+        .container {
+            margin: 0;
+            padding: 0;
+        }
+    }
+'''
+
+# Renderer WeasyPrint del proceso (fuentes y PDF_STYLESHEET cargados una sola vez)
+weasyprint_renderer = WeasyPrintRenderQueue(PDF_STYLESHEET)
+
+# Procesos de render para no maquetar en el proceso web (ver pdf_render_pool.py)
+pdf_render_pool = PDFRenderPool(PDF_STYLESHEET)
+
 class PDFGeneratorService:
     """Servicio para generar PDFs desde HTML con datos reales"""
     
@@ -45,43 +113,74 @@ class PDFGeneratorService:
             raise ImportError("No PDF generators available")
         
         logger.info(f"Generadores PDF disponibles: {self.available_engines}")
+        
+        # True si el último PDF es el básico de _generate_fallback_pdf (no se cachea)
+        self.used_fallback = False
+    
+    def resolve_engine(self) -> str:
+        """Motor que usará generate_pdf_from_html"""
+        if self.preferred_engine in self.available_engines:
+            return self.preferred_engine
+        return self.available_engines[0]
+    
+    def engine_signature(self) -> str:
+        """
+        Motor, versión del motor y versión de la hoja de estilos: junto con el
+        HTML determinan el PDF resultante (clave de pdf_artifact_cache)
+        """
+        engine = self.resolve_engine()
+        try:
+            from importlib.metadata import version
+            engine_version = version(engine)
+        except Exception:
+            engine_version = 'unknown'
+        stylesheet_hash = hashlib.sha256(PDF_STYLESHEET.encode('utf-8')).hexdigest()[:12]
+        return f"{engine}:{engine_version}:css{PDF_STYLESHEET_VERSION}:{stylesheet_hash}"
     
-    def generate_pdf_from_html(self, html_content: str, filename: str = None) -> bytes:
+    def generate_pdf_from_html(self, html_content: str, filename: str = None, progress=None) -> bytes:
         """
         Generar PDF desde contenido HTML
         
         Args:
             html_content: Contenido HTML del reporte
             filename: Nombre del archivo (opcional)
+            progress: ProgressReporter opcional (páginas maquetadas)
             
         Returns:
             bytes: Contenido del PDF generado
         """
+        self.used_fallback = False
         try:
             # Intentar con el motor preferido primero
             if self.preferred_engine in self.available_engines:
-                return self._generate_with_engine(html_content, self.preferred_engine)
+                return self._generate_with_engine(html_content, self.preferred_engine, progress)
             
             # Intentar con cualquier motor disponible
             for engine in self.available_engines:
                 try:
-                    return self._generate_with_engine(html_content, engine)
+                    return self._generate_with_engine(html_content, engine, progress)
+                except PDFRenderInterrupted:
+                    raise
                 except Exception as e:
                     logger.warning(f"Error con {engine}: {e}")
                     continue
             
             raise Exception("No se pudo generar PDF con ningún motor disponible")
             
+        except PDFRenderInterrupted:
+            # Cancelado o fuera de tiempo: no sustituir por el PDF básico
+            raise
         except Exception as e:
             logger.error(f"Error generando PDF: {e}")
             # Generar PDF básico como fallback
+            self.used_fallback = True
             return self._generate_fallback_pdf(filename or "report.pdf")
     
-    def _generate_with_engine(self, html_content: str, engine: str) -> bytes:
+    def _generate_with_engine(self, html_content: str, engine: str, progress=None) -> bytes:
         """Generar PDF con un motor específico"""
         
         if engine == 'weasyprint':
-            return self._generate_with_weasyprint(html_content)
+            return self._generate_with_weasyprint(html_content, progress)
         elif engine == 'pdfkit':
             return self._generate_with_pdfkit(html_content)
         elif engine == 'reportlab':
@@ -89,74 +188,20 @@ class PDFGeneratorService:
         else:
             raise Exception(f"Motor no soportado: {engine}")
     
-    def _generate_with_weasyprint(self, html_content: str) -> bytes:
+    def _generate_with_weasyprint(self, html_content: str, progress=None) -> bytes:
         """Generar PDF usando WeasyPrint (recomendado)"""
         try:
-            import weasyprint
-            from weasyprint import HTML, CSS
-            
-            # CSS adicional para mejorar el PDF
-            pdf_css = CSS(string='''
-                @page {
-                    size: A4;
-                    margin: 1cm;
-                }
-                
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    font-size: 10pt;
-                    line-height: 1.4;
-                }
-                
-                .container {
-                    max-width: none;
-                    background: white;
-                    box-shadow: none;
-                }
-                
-                .report-header {
-                    background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
-                    -webkit-print-color-adjust: exact;
-                    color-adjust: exact;
-                    print-color-adjust: exact;
-                }
-                
-                .charts-section {
-                    page-break-inside: avoid;
-                }
-                
-                .recommendations-table {
-                    font-size: 8pt;
-                    page-break-inside: auto;
-                }
-                
-                .recommendations-table tr {
-                    page-break-inside: avoid;
-                }
-                
-                .impact-bar {
-                    -webkit-print-color-adjust: exact;
-                    color-adjust: exact;
-                    print-color-adjust: exact;
-                }
-                
-                .metric-card {
-                    page-break-inside: avoid;
-                }
-                
-                @media print {
-                    .container {
-                        margin: 0;
-                        padding: 0;
-                    }
-                }
-            ''')
-            
-            # Crear el HTML con configuraciones para PDF
-            html_doc = HTML(string=html_content)
+            pdf_bytes = None
+            if pdf_render_pool.enabled:
+                try:
+                    # Maquetación en un proceso del pool: este hilo espera sin retener el GIL
+                    pdf_bytes = pdf_render_pool.render(html_content, progress)
+                except PDFRenderPoolUnavailable as e:
+                    logger.warning(f"Pool de render PDF no disponible, se renderiza en el proceso: {e}")
             
-            # Generar PDF
-            pdf_bytes = html_doc.write_pdf(stylesheets=[pdf_css])
+            if pdf_bytes is None:
+                # Renderer del proceso con fuentes y hoja de estilos ya cargadas
+                pdf_bytes = weasyprint_renderer.render(html_content, progress)
             
             logger.info(f"PDF generado con WeasyPrint: {len(pdf_bytes)} bytes")
             return pdf_bytes
@@ -269,13 +314,26 @@ class PDFGeneratorService:
             # Último recurso: PDF vacío válido
             return b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj 2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj 3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj xref\n0 4\n0000000000 65535 f \n0000000009 00000 n \n0000000058 00000 n \n0000000115 00000 n \ntrailer<</Size 4/Root 1 0 R>>\nstartxref\n189\n%%EOF'
 
-def generate_report_pdf(report, html_content: str = None) -> Tuple[bytes, str]:
+def build_pdf_filename(report) -> str:
+    """Nombre de descarga del PDF de un reporte (cliente extraído del CSV)"""
+    client_name = "Azure_Client"
+    if report.csv_file and report.csv_file.original_filename:
+        # Extraer cliente del filename
+        filename_base = report.csv_file.original_filename.split('.')[0]
+        client_parts = filename_base.replace('_', ' ').replace('-', ' ').split()
+        if client_parts:
+            client_name = '_'.join([p for p in client_parts if p.lower() not in ['ejemplo', 'test', 'data', 'csv']])[:20]
+    
+    return f"azure_advisor_{client_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+
+def generate_report_pdf(report, html_content: str = None, progress=None) -> Tuple[bytes, str]:
     """
     Función principal para generar PDF de un reporte
     
     Args:
         report: Objeto Report de Django
         html_content: HTML del reporte (opcional, se genera si no se proporciona)
+        progress: ProgressReporter opcional
     
     Returns:
         Tuple[bytes, str]: (contenido_pdf, nombre_archivo)
@@ -284,23 +342,16 @@ def generate_report_pdf(report, html_content: str = None) -> Tuple[bytes, str]:
         # Generar HTML si no se proporcionó
         if not html_content:
             from apps.reports.utils.enhanced_analyzer import EnhancedHTMLReportGenerator
+            from apps.reports.utils.cache_manager import ReportCacheManager
             generator = EnhancedHTMLReportGenerator()
-            html_content = generator.generate_complete_html(report)
+            html_content = ReportCacheManager.render_html(report, generator)
         
         # Crear nombre de archivo único
-        client_name = "Azure_Client"
-        if report.csv_file and report.csv_file.original_filename:
-            # Extraer cliente del filename
-            filename_base = report.csv_file.original_filename.split('.')[0]
-            client_parts = filename_base.replace('_', ' ').replace('-', ' ').split()
-            if client_parts:
-                client_name = '_'.join([p for p in client_parts if p.lower() not in ['ejemplo', 'test', 'data', 'csv']])[:20]
-        
-        pdf_filename = f"azure_advisor_{client_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        pdf_filename = build_pdf_filename(report)
         
         # Generar PDF
         pdf_service = PDFGeneratorService()
-        pdf_bytes = pdf_service.generate_pdf_from_html(html_content, pdf_filename)
+        pdf_bytes = pdf_service.generate_pdf_from_html(html_content, pdf_filename, progress=progress)
         
         logger.info(f"PDF generado exitosamente: {pdf_filename}, {len(pdf_bytes)} bytes")
         return pdf_bytes, pdf_filename
@@ -312,4 +363,4 @@ def generate_report_pdf(report, html_content: str = None) -> Tuple[bytes, str]:
 # Función de conveniencia
 def create_pdf_from_report(report) -> Tuple[bytes, str]:
     """Crear PDF desde un objeto Report"""
-    return generate_report_pdf(report)
\ No newline at end of file
+    return generate_report_pdf(report)
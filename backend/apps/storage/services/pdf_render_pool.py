@@ -0,0 +1,277 @@
+# backend/apps/storage/services/pdf_render_pool.py
+"""
+Renderizado de PDFs en procesos aparte.
+
+La maquetación de WeasyPrint es CPU pura y retiene el GIL: hecha en el proceso
+web bloquea durante segundos a todos los hilos del worker de Gunicorn.
+PDFRenderPool la delega en un número acotado de procesos (PDF_RENDER_POOL_SIZE),
+cada uno con su renderer caliente (pdf_renderer.render_worker_main); el hilo de
+la petición solo espera en un pipe, sin retener el GIL.
+
+Cada documento es un PDFRenderJob que se puede esperar o cancelar. REPORT_TIMEOUT
+es el plazo total de un documento desde que se encola (espera de un proceso
+libre incluida): un render que lo supera o se cancela se interrumpe matando su
+proceso, que se reemplaza por otro, y uno que sigue en la cola no llega a
+ejecutarse. La cancelación puede llegar desde otro proceso (otra
+petición, un worker de Celery) con request_cancel(scope): se publica en caché y
+los jobs del ámbito la consultan mientras esperan. Si quien espera el resultado
+deja de esperar (se agota su espera o su hilo sale de result() con una
+excepción) el job se cancela. La desconexión del cliente no se detecta: con
+WSGI la vista no se entera mientras espera; para eso está cancel-pdf.
+
+Con PDF_RENDER_POOL_SIZE = 0, en los workers de Celery (ya son procesos aparte)
+o si no se pueden crear procesos, se renderiza en el propio proceso.
+"""
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
+from .pdf_renderer import render_worker_main
+
+logger = logging.getLogger(__name__)
+
+# Procesos de render por proceso web
+PDF_RENDER_POOL_SIZE = getattr(settings, 'PDF_RENDER_POOL_SIZE', 2)
+
+# Tiempo máximo de un documento (cola + maquetación)
+PDF_RENDER_TIMEOUT = getattr(settings, 'REPORT_TIMEOUT', 300)
+
+POLL_INTERVAL = 0.1
+
+# Cada cuánto consulta un job en espera las cancelaciones publicadas en caché
+CANCEL_CHECK_INTERVAL = 1.0
+
+CANCEL_PREFIX = 'pdf_render_cancel'
+
+
+class PDFRenderInterrupted(Exception):
+    """Render interrumpido: no debe sustituirse por el PDF de fallback"""
+
+
+class PDFRenderCancelled(PDFRenderInterrupted):
+    pass
+
+
+class PDFRenderTimeout(PDFRenderInterrupted):
+    pass
+
+
+class PDFRenderPoolUnavailable(Exception):
+    """No se pudo arrancar un proceso de render (se renderiza en el propio proceso)"""
+
+
+def request_cancel(scope: str):
+    """Cancelar, en cualquier proceso, los renders del ámbito ('report:<id>') iniciados hasta ahora"""
+    try:
+        cache.set(f"{CANCEL_PREFIX}:{scope}", time.time(), PDF_RENDER_TIMEOUT * 2)
+    except Exception as e:
+        logger.warning(f"Error publicando cancelación de {scope}: {e}")
+
+
+def cancel_requested(scope: str, since: float) -> bool:
+    """True si se pidió cancelar el ámbito después de since (epoch)"""
+    try:
+        requested_at = cache.get(f"{CANCEL_PREFIX}:{scope}")
+    except Exception:
+        return False
+    return requested_at is not None and requested_at >= since
+
+
+class PDFRenderJob:
+    """Handle de un documento enviado a PDFRenderPool"""
+
+    def __init__(self, scope: Optional[str] = None, since: Optional[float] = None,
+                 timeout: float = PDF_RENDER_TIMEOUT):
+        self.id = uuid.uuid4().hex
+        self.scope = scope
+        self.since = since or time.time()
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.status = 'queued'
+        self.pages = 0
+        self.error = None
+        self.future: Optional[Future] = None
+        self._cancel_event = threading.Event()
+        self._last_remote_check = 0.0
+
+    def cancel(self):
+        """Cancelar: si aún no empezó no llega a ejecutarse; si está maquetando se mata su proceso"""
+        self._cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+
+    def is_cancelled(self) -> bool:
+        if not self._cancel_event.is_set() and self.scope:
+            now = time.monotonic()
+            if now - self._last_remote_check >= CANCEL_CHECK_INTERVAL:
+                self._last_remote_check = now
+                if cancel_requested(self.scope, self.since):
+                    self._cancel_event.set()
+        return self._cancel_event.is_set()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def result(self, timeout: Optional[float] = None) -> bytes:
+        """
+        PDF generado (como mucho hasta el plazo del job). Si la espera termina
+        sin resultado (timeout o excepción en el hilo que espera) se cancela el job
+        """
+        wait = self.remaining() if timeout is None else min(timeout, self.remaining())
+        try:
+            return self.future.result(wait)
+        except CancelledError:
+            raise PDFRenderCancelled(f"Render PDF {self.id} cancelado")
+        except FutureTimeoutError:
+            self.cancel()
+            self.status = 'timeout'
+            raise PDFRenderTimeout(f"Render PDF {self.id} superó {self.timeout}s")
+        finally:
+            if not self.future.done():
+                self.cancel()
+
+    def to_dict(self):
+        return {'job_id': self.id, 'status': self.status, 'pages': self.pages, 'error': self.error}
+
+
+class _RenderProcess:
+    """Proceso de render con su pipe"""
+
+    def __init__(self, ctx, stylesheet: str):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=render_worker_main, args=(child_conn, stylesheet),
+                                   name='pdf-render', daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(5)
+        finally:
+            self.conn.close()
+
+
+class PDFRenderPool:
+    """Procesos de render acotados; los hilos supervisores (uno por proceso) atienden la cola de jobs"""
+
+    def __init__(self, stylesheet: str, size: int = PDF_RENDER_POOL_SIZE, timeout: float = PDF_RENDER_TIMEOUT):
+        self.stylesheet = stylesheet
+        self.size = size
+        self.timeout = timeout
+        self.enabled = size > 0
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._slots = None
+
+    def _ensure_started(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Primer uso en este proceso (o tras un fork): los procesos se arrancan al usarlos
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='pdf-render')
+                self._slots = queue.LifoQueue()
+                for _ in range(self.size):
+                    self._slots.put(None)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _spawn(self) -> _RenderProcess:
+        try:
+            return _RenderProcess(self._ctx, self.stylesheet)
+        except Exception as e:
+            self.enabled = False
+            raise PDFRenderPoolUnavailable(f"No se pudo arrancar un proceso de render: {e}")
+
+    @staticmethod
+    def _discard(proc: Optional[_RenderProcess]) -> None:
+        if proc is not None:
+            proc.kill()
+        return None
+
+    def _run(self, job: PDFRenderJob, html_content: str) -> bytes:
+        if job.is_cancelled():
+            job.status = 'cancelled'
+            raise PDFRenderCancelled(f"Render PDF {job.id} cancelado")
+
+        try:
+            proc = self._slots.get(timeout=job.remaining())
+        except queue.Empty:
+            job.status = 'timeout'
+            raise PDFRenderTimeout(f"Render PDF {job.id} sin proceso libre en {job.timeout}s")
+        try:
+            if proc is None or not proc.is_alive():
+                proc = self._discard(proc)
+                proc = self._spawn()
+
+            job.status = 'running'
+            proc.conn.send(html_content)
+            while not proc.conn.poll(POLL_INTERVAL):
+                if not job.remaining():
+                    proc = self._discard(proc)
+                    job.status = 'timeout'
+                    raise PDFRenderTimeout(f"Render PDF {job.id} superó {job.timeout}s")
+                if job.is_cancelled():
+                    proc = self._discard(proc)
+                    job.status = 'cancelled'
+                    raise PDFRenderCancelled(f"Render PDF {job.id} cancelado")
+                if not proc.is_alive():
+                    proc = self._discard(proc)
+                    raise RuntimeError("El proceso de render terminó inesperadamente")
+            outcome, payload, pages = proc.conn.recv()
+        except (EOFError, OSError) as e:
+            proc = self._discard(proc)
+            job.status = 'failed'
+            job.error = f"Error de comunicación con el proceso de render: {e}"
+            raise RuntimeError(job.error)
+        except Exception as e:
+            if job.status not in ('cancelled', 'timeout'):
+                job.status = 'failed'
+            job.error = str(e)
+            raise
+        finally:
+            self._slots.put(proc)
+
+        if outcome != 'ok':
+            job.status = 'failed'
+            job.error = payload
+            raise RuntimeError(payload)
+
+        job.status = 'completed'
+        job.pages = pages
+        return payload
+
+    def submit(self, html_content: str, progress=None, timeout: Optional[float] = None) -> PDFRenderJob:
+        """
+        Encolar un documento; progress (ProgressReporter) define el ámbito de
+        cancelación y timeout (por defecto el del pool) el plazo total del job
+        """
+        job = PDFRenderJob(
+            scope=progress.scope if progress else None,
+            since=progress.started if progress else None,
+            timeout=self.timeout if timeout is None else timeout
+        )
+        job.future = self._ensure_started().submit(self._run, job, html_content)
+        return job
+
+    def render(self, html_content: str, progress=None, timeout: Optional[float] = None) -> bytes:
+        """Encolar un documento y esperar su PDF (como mucho timeout segundos en total)"""
+        job = self.submit(html_content, progress, timeout)
+        pdf_bytes = job.result()
+        if progress:
+            progress.update('rendering_pdf', pdf_pages=job.pages)
+        return pdf_bytes
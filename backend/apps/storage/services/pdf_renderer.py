@@ -0,0 +1,181 @@
+# backend/apps/storage/services/pdf_renderer.py
+"""
+Renderer de WeasyPrint "caliente".
+
+WeasyPrint paga en cada PDF la inicialización de fontconfig/Pango
+(FontConfiguration) y el parseo de la hoja de estilos de impresión.
+WarmWeasyPrintRenderer lo hace una vez por proceso y lo reutiliza en todos los
+documentos.
+
+Los documentos entran por una cola atendida por un único hilo, dueño del
+renderer: FontConfiguration y el estado de Pango no son seguros entre hilos y
+la maquetación retiene el GIL, así que más hilos no renderizarían más rápido.
+El paralelismo se obtiene con varios procesos, cada uno con su renderer.
+
+Un hilo no se puede interrumpir: si un documento supera el tiempo máximo sigue
+maquetando en segundo plano, y la cola se recicla (hilo y renderer nuevos) para
+que los documentos siguientes no esperen detrás de él.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Tuple
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Espera máxima de un documento (cola + maquetación)
+PDF_RENDER_TIMEOUT = getattr(settings, 'REPORT_TIMEOUT', 300)
+
+# Documento mínimo que fuerza la carga de fuentes al calentar el renderer
+WARMUP_HTML = (
+    '<html><body><h1>Azure Advisor Report</h1>'
+    '<table class="recommendations-table"><tr><td>warm-up</td></tr></table>'
+    '</body></html>'
+)
+
+
+def _font_configuration():
+    try:
+        from weasyprint.text.fonts import FontConfiguration
+    except ImportError:
+        # WeasyPrint < 53
+        from weasyprint.fonts import FontConfiguration
+    return FontConfiguration()
+
+
+class WarmWeasyPrintRenderer:
+    """FontConfiguration y hoja de estilos creadas una vez y compartidas por todos los documentos"""
+
+    def __init__(self, stylesheet: str):
+        self.stylesheet = stylesheet
+        self.font_config = None
+        self.css = None
+        self.documents_rendered = 0
+
+    @property
+    def is_warm(self) -> bool:
+        return self.css is not None
+
+    def warm(self):
+        """Cargar fuentes y parsear la hoja de estilos (idempotente)"""
+        if self.is_warm:
+            return
+        from weasyprint import HTML, CSS
+
+        start = time.perf_counter()
+        font_config = _font_configuration()
+        css = CSS(string=self.stylesheet, font_config=font_config)
+        HTML(string=WARMUP_HTML).render(stylesheets=[css], font_config=font_config)
+        self.font_config, self.css = font_config, css
+        logger.info(f"🔥 Renderer WeasyPrint listo en {time.perf_counter() - start:.2f}s (pid {os.getpid()})")
+
+    def _layout(self, html_content: str):
+        self.warm()
+        from weasyprint import HTML
+        return HTML(string=html_content).render(stylesheets=[self.css], font_config=self.font_config)
+
+    def render(self, html_content: str, progress=None) -> bytes:
+        # Maquetar y generar PDF (en dos pasos para informar las páginas)
+        document = self._layout(html_content)
+        if progress:
+            progress.update('rendering_pdf', pdf_pages=len(document.pages))
+        pdf_bytes = document.write_pdf()
+        self.documents_rendered += 1
+        return pdf_bytes
+
+    def render_pages(self, html_content: str) -> Tuple[bytes, int]:
+        """PDF y número de páginas (para procesos sin acceso al ProgressReporter)"""
+        document = self._layout(html_content)
+        pdf_bytes = document.write_pdf()
+        self.documents_rendered += 1
+        return pdf_bytes, len(document.pages)
+
+
+class WeasyPrintRenderQueue:
+    """
+    Cola de documentos atendida por un hilo con un WarmWeasyPrintRenderer.
+    El hilo y el renderer se crean al primer uso en cada proceso (también
+    tras un fork de Celery/Gunicorn, donde el hilo del padre no existe).
+    """
+
+    def __init__(self, stylesheet: str):
+        self.stylesheet = stylesheet
+        self._lock = threading.Lock()
+        self._executor = None
+        self._renderer = None
+        self._pid = None
+
+    def _worker(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weasyprint')
+                self._renderer = WarmWeasyPrintRenderer(self.stylesheet)
+                self._pid = os.getpid()
+            return self._executor, self._renderer
+
+    def warm(self) -> Future:
+        """Calentar el renderer en segundo plano"""
+        executor, renderer = self._worker()
+        return executor.submit(renderer.warm)
+
+    def submit(self, html_content: str, progress=None) -> Future:
+        executor, renderer = self._worker()
+        return executor.submit(renderer.render, html_content, progress)
+
+    def _recycle(self, executor: ThreadPoolExecutor):
+        """Abandonar el hilo actual (sigue con su documento) y usar uno nuevo para los siguientes"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._renderer = None
+        executor.shutdown(wait=False)
+
+    def render(self, html_content: str, progress=None, timeout: float = PDF_RENDER_TIMEOUT) -> bytes:
+        """PDF de html_content (espera en la cola incluida, como mucho timeout segundos)"""
+        executor, renderer = self._worker()
+        future = executor.submit(renderer.render, html_content, progress)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            from .pdf_render_pool import PDFRenderTimeout
+            # Si aún esperaba en la cola no llega a ejecutarse; en cualquier caso el
+            # hilo lleva ocupado todo el timeout y los siguientes van a uno nuevo
+            future.cancel()
+            logger.warning(f"Render PDF en proceso superó {timeout}s; se recicla la cola de WeasyPrint")
+            self._recycle(executor)
+            raise PDFRenderTimeout(f"Render PDF superó {timeout}s")
+
+    def stats(self):
+        renderer = self._renderer if self._pid == os.getpid() else None
+        return {
+            'pid': os.getpid(),
+            'warm': bool(renderer and renderer.is_warm),
+            'documents_rendered': renderer.documents_rendered if renderer else 0,
+        }
+
+
+def render_worker_main(conn, stylesheet: str):
+    """
+    Bucle de un proceso de PDFRenderPool: recibe HTML por conn y responde
+    ('ok', pdf_bytes, páginas) o ('error', mensaje, 0). Termina al cerrarse
+    la conexión (el proceso padre terminó).
+    """
+    renderer = WarmWeasyPrintRenderer(stylesheet)
+    try:
+        renderer.warm()
+    except Exception as e:
+        logger.warning(f"No se pudo calentar el renderer PDF: {e}")
+
+    while True:
+        try:
+            html_content = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            pdf_bytes, pages = renderer.render_pages(html_content)
+            conn.send(('ok', pdf_bytes, pages))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}", 0))
@@ -0,0 +1,86 @@
+# backend/apps/storage/services/sas_cache.py
+"""
+Caché de SAS URLs.
+
+Firmar un SAS es barato, pero emitir uno nuevo en cada llamada produce una URL
+distinta cada vez: el navegador no puede reutilizar lo descargado y quien
+guarda la URL (Report.pdf_file_url) la reescribe en cada lectura.
+
+SASUrlCache reutiliza el token de (clave, contenedor, blob, permisos, validez) hasta
+SAS_EXPIRY_MARGIN antes de que caduque; entonces firma uno nuevo. Los tokens se
+guardan en report_cache (memoria local + Redis), así que todos los procesos
+entregan la misma URL, y la firma pasa por su single-flight.
+"""
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from django.conf import settings
+from apps.reports.utils.tiered_cache import report_cache
+
+logger = logging.getLogger(__name__)
+
+# Un token deja de reutilizarse cuando le queda menos que esto de vida
+SAS_EXPIRY_MARGIN = getattr(settings, 'SAS_EXPIRY_MARGIN', 3600)
+
+
+def _margin(lifetime: int) -> int:
+    # En tokens cortos el margen no puede comerse toda su vida
+    return min(SAS_EXPIRY_MARGIN, lifetime // 4)
+
+
+class SASUrlCache:
+    """SAS URLs firmadas con la clave de la cuenta, reutilizadas hasta cerca de su caducidad"""
+
+    def __init__(self, cache=report_cache):
+        self.cache = cache
+
+    @staticmethod
+    def _key(account_name: str, account_key: str, container: str, blob_name: str,
+             permission: str, hours: int) -> str:
+        # Huella de la clave: al rotarla no se reutilizan tokens firmados con la anterior
+        key_hash = hashlib.sha256(account_key.encode()).hexdigest()[:12]
+        return f"sas:{account_name}:{key_hash}:{container}:{permission}:{hours}:{blob_name}"
+
+    @staticmethod
+    def _mint(account_name: str, account_key: str, container: str, blob_name: str,
+              permission: str, lifetime: int) -> Dict[str, Any]:
+        from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+
+        sas_token = generate_blob_sas(
+            account_name=account_name,
+            account_key=account_key,
+            container_name=container,
+            blob_name=blob_name,
+            permission=BlobSasPermissions.from_string(permission),
+            expiry=datetime.utcnow() + timedelta(seconds=lifetime)
+        )
+        return {
+            'url': f"https://{account_name}.blob.core.windows.net/{container}/{blob_name}?{sas_token}",
+            'expires_at': time.time() + lifetime,
+        }
+
+    def get_url(self, account_name: str, account_key: str, container: str, blob_name: str,
+                hours: int = 24, permission: str = 'r') -> Optional[str]:
+        """SAS URL del blob válida al menos el margen de seguridad"""
+        if not account_name or not account_key:
+            return None
+
+        lifetime = int(hours * 3600)
+        margin = _margin(lifetime)
+
+        def fresh(entry) -> bool:
+            return entry['expires_at'] - time.time() > margin
+
+        entry = self.cache.get_or_set(
+            self._key(account_name, account_key, container, blob_name, permission, hours),
+            lambda: self._mint(account_name, account_key, container, blob_name, permission, lifetime),
+            lifetime - margin,
+            validate=fresh
+        )
+        return entry['url'] if entry else None
+
+
+# Instancia global
+sas_url_cache = SASUrlCache()
@@ -0,0 +1,50 @@
+# backend/apps/storage/services/upload_staging.py
+"""
+Área de staging para uploads procesados en segundo plano.
+
+La vista escribe el archivo subido por chunks (sin cargarlo en memoria) y el
+worker de Celery lo analiza desde aquí. MEDIA_ROOT debe ser compartido entre
+los servidores web y los workers.
+"""
+import os
+import logging
+from django.conf import settings
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+STAGING_DIR = getattr(settings, 'UPLOAD_STAGING_DIR', os.path.join(settings.MEDIA_ROOT, 'staging'))
+
+
+def get_staging_path(csv_file_id) -> str:
+    """Ruta del archivo en staging para un CSVFile"""
+    return os.path.join(str(STAGING_DIR), f"{csv_file_id}.csv")
+
+
+def stage_uploaded_file(uploaded_file, csv_file_id) -> str:
+    """
+    Copiar un UploadedFile al área de staging por chunks
+
+    Returns:
+        Ruta del archivo en staging
+    """
+    path = get_staging_path(csv_file_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'wb') as staged:
+        for chunk in uploaded_file.chunks():
+            staged.write(chunk)
+
+    logger.info(f"Archivo en staging: {path} ({uploaded_file.size} bytes)")
+    return path
+
+
+def discard_staged_file(path: Optional[str]):
+    """Eliminar un archivo de staging (ignora errores)"""
+    if not path:
+        return
+    try:
+        if os.path.exists(path):
+            os.unlink(path)
+    except Exception as e:
+        logger.warning(f"No se pudo eliminar el archivo en staging {path}: {e}")
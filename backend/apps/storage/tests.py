@@ -1,3 +1,784 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+from unittest import mock
+import pandas as pd
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.authentication.models import User
+from apps.reports.analyzers import advisor_snapshot
+from apps.reports.models import CSVFile
+from apps.reports.utils.tiered_cache import report_cache
+from .services import passthrough_upload, upload_staging
+from .services.async_blob_storage import (
+    AsyncAzureBlobStorage, AsyncLocalBlobStorage, gather_bounded, get_async_blob_storage, run_blob_io
+)
+from .services.blob_client_registry import AZURE_STORAGE_POOL_SIZE, BlobClientRegistry
+from .services.blob_streaming import RangeNotSatisfiable, etag_matches, parse_range_header, stream_blob_response
+from .services.block_blob_writer import BlockBlobWriter
+from .models import DataFrameArtifact
+from .services.dataframe_export import DataFrameExporter
+from .services.enhanced_azure_storage import EnhancedAzureStorageService
+from .services.local_blob_store import LocalBlobStore
+from .services.pdf_artifact_cache import PDFArtifactCache
+from .services.pdf_render_pool import PDFRenderCancelled, PDFRenderPool, PDFRenderTimeout, request_cancel
+from .services.pdf_renderer import WarmWeasyPrintRenderer, WeasyPrintRenderQueue
+from .services.sas_cache import SASUrlCache
 
-# Create your tests here.
+ADVISOR_CSV = (
+    b"Category,Business Impact,Recommendation,Subscription ID,Subscription Name,Resource Group,"
+    b"Resource Name,Type,Updated Date,Potential benefits,Potential Annual Cost Savings,"
+    b"Potential Cost Savings Currency,Retirement date,Retiring feature\n"
+    b"Cost,High,Resize VM,s1,Sub 1,rg1,vm1,vm,2024-01-01,,1200,USD,,\n"
+    b"Cost,Medium,Resize VM,s1,Sub 1,rg1,vm2,vm,2024-01-01,,600,USD,,\n"
+    b"Security,High,Enable MFA,s1,Sub 1,rg2,vm3,vm,2024-01-01,,,,,\n"
+)
+
+
+class UploadTestCase(TestCase):
+    """Uploads contra un usuario autenticado, con staging y snapshots en un directorio temporal"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_dir = directory.name
+        for target, attribute in ((upload_staging, 'STAGING_DIR'), (advisor_snapshot, 'SNAPSHOT_DIR')):
+            patcher = mock.patch.object(target, attribute, directory.name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.blob_dir = os.path.join(directory.name, 'blobs')
+        blob_settings = override_settings(LOCAL_BLOB_STORE_DIR=self.blob_dir)
+        blob_settings.enable()
+        self.addCleanup(blob_settings.disable)
+
+        self.user = User.objects.create(email='upload@example.com', username='upload')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content=ADVISOR_CSV, name='advisor.csv', query=''):
+        return self.client.post(f"{reverse('file-upload')}{query}",
+                                {'file': SimpleUploadedFile(name, content, content_type='text/csv')},
+                                format='multipart')
+
+
+class AsyncUploadTests(UploadTestCase):
+
+    def test_async_upload_returns_202_and_analyzes_in_the_task(self):
+        with mock.patch('apps.reports.tasks.process_csv_file.delay') as delay:
+            delay.return_value.id = 'task-id'
+            response = self.upload(query='?async=true')
+
+        self.assertEqual(response.status_code, 202)
+        csv_file = CSVFile.objects.get(id=response.data['id'])
+        self.assertEqual(csv_file.processing_status, 'pending')
+        self.assertTrue(response['Location'].endswith(reverse('file-status', args=[csv_file.id])))
+
+        # El worker analiza el archivo en staging y lo elimina al terminar
+        csv_file_id, staged_path = delay.call_args.args
+        from apps.reports.tasks import process_csv_file
+        process_csv_file.apply(args=[csv_file_id, staged_path])
+
+        status_response = self.client.get(reverse('file-status', args=[csv_file.id]))
+        self.assertEqual(status_response.data['status'], 'completed')
+        self.assertEqual(status_response.data['rows_count'], 3)
+
+    def test_upload_is_processed_inline_when_the_broker_is_down(self):
+        with mock.patch('apps.reports.tasks.process_csv_file.delay', side_effect=ConnectionError('no broker')):
+            response = self.upload(query='?async=true')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(CSVFile.objects.get(id=response.data['id']).processing_status, 'completed')
+
+
+class ContentDedupTests(UploadTestCase):
+
+    def test_identical_upload_reuses_the_analysis(self):
+        first = self.upload()
+        self.assertEqual(first.status_code, 201)
+
+        with mock.patch('apps.storage.views.analyze_csv_stream') as analyze:
+            second = self.upload(name='again.csv')
+        analyze.assert_not_called()
+        self.assertEqual(second.status_code, 201)
+        self.assertTrue(second.data['deduplicated'])
+        self.assertEqual(second.data['rows_count'], 3)
+
+        copy = CSVFile.objects.get(id=second.data['id'])
+        self.assertEqual(copy.content_hash, CSVFile.objects.get(id=first.data['id']).content_hash)
+        self.assertEqual(copy.analysis_data['content_source'], first.data['id'])
+        self.assertTrue(advisor_snapshot.snapshot_exists(copy.id))
+
+    def test_uploads_are_not_shared_between_users(self):
+        self.upload()
+        other = User.objects.create(email='other@example.com', username='other')
+        self.client.force_authenticate(other)
+
+        response = self.upload()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('deduplicated', response.data)
+
+
+def stored_files(root):
+    return [os.path.join(path, name) for path, _, names in os.walk(root) for name in names]
+
+
+class PassThroughUploadTests(UploadTestCase):
+
+    def test_file_is_stored_and_analyzed_while_it_arrives(self):
+        response = self.upload(query='?mode=passthrough')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['rows_count'], 3)
+
+        csv_file = CSVFile.objects.get(id=response.data['id'])
+        with open(csv_file.azure_blob_url[len('file://'):], 'rb') as blob:
+            self.assertEqual(blob.read(), ADVISOR_CSV)
+        self.assertTrue(advisor_snapshot.snapshot_exists(csv_file.id))
+
+    def test_wrong_extension_is_rejected_before_storing_anything(self):
+        with mock.patch.object(passthrough_upload, 'get_block_store') as get_block_store:
+            response = self.upload(name='advisor.xlsx', query='?mode=passthrough')
+        get_block_store.assert_not_called()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Solo se permiten archivos CSV')
+
+    @override_settings(MAX_UPLOAD_FILE_SIZE=100)
+    def test_oversized_file_is_aborted_while_streaming(self):
+        with mock.patch.object(passthrough_upload.BlockBlobWriter, 'write') as write:
+            response = self.upload(query='?mode=passthrough')
+        write.assert_not_called()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('menor a', response.data['error'])
+        self.assertFalse(CSVFile.objects.exists())
+        self.assertEqual(stored_files(self.media_dir), [])
+
+
+class FileDeltaTests(UploadTestCase):
+
+    def test_delta_against_the_previous_export(self):
+        previous = self.upload()
+        current = self.upload(ADVISOR_CSV.replace(b'vm3', b'vm4'), name='advisor-2.csv')
+
+        response = self.client.get(reverse('file-delta', args=[current.data['id']]))
+        self.assertEqual(response.status_code, 200)
+        delta = response.data['delta']
+        self.assertEqual(delta['previous_file_id'], previous.data['id'])
+        self.assertEqual((delta['counts']['added'], delta['counts']['resolved']), (1, 1))
+
+    def test_first_export_has_nothing_to_compare(self):
+        first = self.upload()
+        response = self.client.get(reverse('file-delta', args=[first.data['id']]))
+        self.assertEqual(response.status_code, 404)
+
+
+class FakePDFStorage:
+    """Contenedor de PDFs en memoria con la interfaz de EnhancedAzureStorageService"""
+    container = 'reports'
+
+    def __init__(self):
+        self.blobs = {}
+        self.uploads = 0
+        self.blob_service_client = mock.Mock()
+        self.blob_service_client.get_blob_client.side_effect = (
+            lambda container, blob_name: mock.Mock(url=f"https://blobs/{container}/{blob_name}")
+        )
+
+    def is_available(self):
+        return True
+
+    def get_pdf_info(self, blob_name):
+        return self.blobs.get(blob_name)
+
+    def upload_pdf(self, pdf_bytes, report_id, client_name, progress_hook=None, blob_name=None):
+        self.uploads += 1
+        blob_name = blob_name or f"reports/{report_id}-{self.uploads}.pdf"
+        info = {'blob_name': blob_name, 'container': self.container, 'size_bytes': len(pdf_bytes),
+                'uploaded_at': '2024-01-01T00:00:00', 'blob_url': f"https://blobs/{blob_name}?sas"}
+        self.blobs[blob_name] = info
+        return dict(info)
+
+    def _generate_sas_url(self, container, blob_name, hours=1):
+        return f"https://blobs/{container}/{blob_name}?sas"
+
+
+class FakePDFService:
+    def __init__(self, fallback=False):
+        self.used_fallback = fallback
+        self.renders = 0
+
+    def engine_signature(self):
+        return 'fake-1'
+
+    def generate_pdf_from_html(self, html_content, filename=None, progress=None):
+        self.renders += 1
+        return b'%PDF-' + html_content.encode('utf-8')
+
+
+class PDFArtifactCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        report_cache.local.clear()
+        self.storage = FakePDFStorage()
+        self.artifacts = PDFArtifactCache(self.storage)
+        self.report = mock.Mock(id='report-1')
+
+    def generate(self, html, service):
+        return self.artifacts.get_or_create(html, service, self.report, 'Client')
+
+    def test_same_html_reuses_the_blob(self):
+        service = FakePDFService()
+        first = self.generate('<h1>A</h1>', service)
+        second = self.generate('<h1>A</h1>', service)
+        self.assertFalse(first['reused'])
+        self.assertTrue(second['reused'])
+        self.assertEqual(second['blob_name'], first['blob_name'])
+        self.assertEqual((service.renders, self.storage.uploads), (1, 1))
+
+        self.generate('<h1>B</h1>', service)
+        self.assertEqual((service.renders, self.storage.uploads), (2, 2))
+
+    def test_existing_blob_is_found_after_the_index_expires(self):
+        service = FakePDFService()
+        self.generate('<h1>A</h1>', service)
+        cache.clear()
+        report_cache.local.clear()
+        self.assertTrue(self.generate('<h1>A</h1>', service)['reused'])
+        self.assertEqual(service.renders, 1)
+
+    def test_fallback_pdfs_are_not_indexed(self):
+        service = FakePDFService(fallback=True)
+        first = self.generate('<h1>A</h1>', service)
+        self.generate('<h1>A</h1>', service)
+        self.assertFalse(first['blob_name'].startswith('reports/sha256/'))
+        self.assertEqual(service.renders, 2)
+
+
+def fake_weasyprint():
+    """Módulos weasyprint mínimos (el entorno de tests no tiene Pango)"""
+    document = mock.Mock(pages=[1, 2])
+    document.write_pdf.return_value = b'%PDF-fake'
+    weasyprint = types.ModuleType('weasyprint')
+    weasyprint.HTML = mock.Mock(return_value=mock.Mock(**{'render.return_value': document}))
+    weasyprint.CSS = mock.Mock()
+    fonts = types.ModuleType('weasyprint.text.fonts')
+    fonts.FontConfiguration = mock.Mock()
+    return {'weasyprint': weasyprint, 'weasyprint.text': types.ModuleType('weasyprint.text'),
+            'weasyprint.text.fonts': fonts}
+
+
+class WarmRendererTests(SimpleTestCase):
+
+    def setUp(self):
+        modules = fake_weasyprint()
+        patcher = mock.patch.dict(sys.modules, modules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.weasyprint = modules['weasyprint']
+        self.fonts = modules['weasyprint.text.fonts']
+
+    def test_fonts_and_stylesheet_are_set_up_once(self):
+        renderer = WarmWeasyPrintRenderer('body { margin: 0 }')
+        self.assertEqual(renderer.render('<p>1</p>'), b'%PDF-fake')
+        self.assertEqual(renderer.render_pages('<p>2</p>'), (b'%PDF-fake', 2))
+
+        self.fonts.FontConfiguration.assert_called_once()
+        self.weasyprint.CSS.assert_called_once_with(string='body { margin: 0 }',
+                                                    font_config=self.fonts.FontConfiguration.return_value)
+        self.assertEqual(renderer.documents_rendered, 2)
+
+    def test_queue_reuses_its_renderer(self):
+        queue = WeasyPrintRenderQueue('')
+        queue.render('<p>1</p>')
+        queue.render('<p>2</p>')
+        self.assertEqual(queue.stats()['documents_rendered'], 2)
+        self.fonts.FontConfiguration.assert_called_once()
+
+    def test_timed_out_document_recycles_the_queue(self):
+        queue = WeasyPrintRenderQueue('')
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with mock.patch.object(WarmWeasyPrintRenderer, 'render', side_effect=lambda *args: release.wait(5)):
+            with self.assertRaises(PDFRenderTimeout):
+                queue.render('<p>slow</p>', timeout=0.1)
+
+        # Los documentos siguientes no esperan detrás del atascado
+        self.assertEqual(queue.render('<p>next</p>', timeout=5), b'%PDF-fake')
+        self.assertEqual(queue.stats()['documents_rendered'], 1)
+
+
+class FakeConnection:
+    """Pipe de un proceso de render que responde al cabo de delay segundos"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent_at = None
+
+    def send(self, html_content):
+        self.sent_at = time.monotonic()
+
+    def poll(self, timeout):
+        time.sleep(timeout)
+        return time.monotonic() - self.sent_at >= self.delay
+
+    def recv(self):
+        return 'ok', b'%PDF-fake', 1
+
+    def close(self):
+        pass
+
+
+class FakeRenderProcess:
+
+    def __init__(self, delay):
+        self.conn = FakeConnection(delay)
+        self.killed = False
+
+    def is_alive(self):
+        return not self.killed
+
+    def kill(self):
+        self.killed = True
+
+
+class PDFRenderPoolTests(SimpleTestCase):
+
+    def pool(self, delay, timeout=5, size=1):
+        pool = PDFRenderPool('', size=size, timeout=timeout)
+        pool.processes = []
+
+        def spawn():
+            process = FakeRenderProcess(delay)
+            pool.processes.append(process)
+            return process
+
+        pool._spawn = spawn
+        return pool
+
+    def wait_killed(self, process):
+        deadline = time.monotonic() + 2
+        while not process.killed and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return process.killed
+
+    def test_render(self):
+        pool = self.pool(delay=0.05)
+        self.assertEqual(pool.render('<p>ok</p>'), b'%PDF-fake')
+
+    def test_timeout_kills_the_process(self):
+        pool = self.pool(delay=10, timeout=0.3)
+        start = time.monotonic()
+        with self.assertRaises(PDFRenderTimeout):
+            pool.render('<p>slow</p>')
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertTrue(self.wait_killed(pool.processes[0]))
+
+    def test_timeout_includes_waiting_for_a_process(self):
+        pool = self.pool(delay=10, timeout=0.5)
+        running = pool.submit('<p>first</p>')
+        time.sleep(0.2)
+        queued = pool.submit('<p>second</p>')
+        start = time.monotonic()
+        with self.assertRaises(PDFRenderTimeout):
+            queued.result()
+        # Su plazo empezó al encolarse, no al conseguir un proceso
+        self.assertLess(time.monotonic() - start, 1)
+        with self.assertRaises(PDFRenderTimeout):
+            running.result()
+
+    def test_cancel(self):
+        pool = self.pool(delay=10)
+        job = pool.submit('<p>slow</p>')
+        time.sleep(0.2)
+        job.cancel()
+        with self.assertRaises(PDFRenderCancelled):
+            job.result()
+        self.assertEqual(job.status, 'cancelled')
+        self.assertTrue(self.wait_killed(pool.processes[0]))
+
+    def test_cancel_by_scope(self):
+        class Progress:
+            scope = 'report:test-cancel-scope'
+            started = time.time()
+
+        pool = self.pool(delay=10)
+        job = pool.submit('<p>slow</p>', Progress())
+        time.sleep(0.2)
+        request_cancel(Progress.scope)
+        with self.assertRaises(PDFRenderCancelled):
+            job.result()
+
+
+class BlockBlobWriterTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = LocalBlobStore(directory.name)
+
+    def test_data_is_staged_in_fixed_size_blocks(self):
+        writer = BlockBlobWriter(self.store, 'a/blob.bin', block_size=4)
+        writer.write(b'0123456')
+        writer.write(b'789')
+        url = writer.commit()
+        self.assertEqual(len(writer.block_ids), 3)
+        self.assertEqual(len({len(block_id) for block_id in writer.block_ids}), 1)
+        with open(url[len('file://'):], 'rb') as blob:
+            self.assertEqual(blob.read(), b'0123456789')
+
+    def test_abort_leaves_nothing_behind(self):
+        writer = BlockBlobWriter(self.store, 'a/blob.bin', block_size=4)
+        writer.write(b'0123456789')
+        writer.abort()
+        self.assertEqual(stored_files(self.store.root), [])
+
+
+class DataFrameExportTests(SimpleTestCase):
+
+    def test_formats_are_streamed_as_block_blobs(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = LocalBlobStore(directory.name)
+        storage = mock.Mock(containers={'data': 'data'})
+        storage._generate_sas_url.side_effect = lambda container, blob_name: f"https://blobs/{blob_name}?sas"
+
+        df = pd.DataFrame({'Category': ['Cost', 'Security'] * 150, 'Savings': range(300)})
+        exporter = DataFrameExporter(storage, chunk_rows=64, block_store=store)
+        with mock.patch('apps.storage.services.dataframe_export.DATAFRAME_EXPORT_BLOCK_SIZE', 512):
+            uploaded = exporter.export(df, 'csv-1', 'dataframes/csv-1/now')
+
+        self.assertEqual(set(uploaded), {'csv_compressed', 'json_compressed', 'sample'})
+        with gzip.open(os.path.join(store.root, 'dataframes/csv-1/now/data.csv.gz')) as blob:
+            self.assertTrue(pd.read_csv(blob).equals(df))
+        with gzip.open(os.path.join(store.root, 'dataframes/csv-1/now/data.json.gz')) as blob:
+            document = json.load(blob)
+        self.assertEqual(document['metadata']['rows_count'], 300)
+        self.assertEqual(len(document['data']), 300)
+        with open(os.path.join(store.root, 'dataframes/csv-1/now/sample.json')) as blob:
+            self.assertEqual(len(json.load(blob)), 100)
+
+
+class DataFrameManifestTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email='manifest@example.com', username='manifest')
+        self.csv_file = CSVFile.objects.create(user=self.user, original_filename='a.csv', file_size=1)
+        self.storage = EnhancedAzureStorageService()
+        self.client_mock = mock.Mock()
+        patcher = mock.patch.object(EnhancedAzureStorageService, 'blob_service_client',
+                                    new_callable=mock.PropertyMock, return_value=self.client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.container = self.client_mock.get_container_client.return_value
+        self.container.get_blob_client.return_value.download_blob.return_value.readall.return_value = (
+            b'[{"Category": "Cost"}]'
+        )
+
+    def test_each_export_replaces_the_previous_one(self):
+        self.storage._record_dataframe_manifest(self.csv_file.id, {
+            'csv_compressed': {'blob_name': 'dataframes/x/1/data.csv.gz', 'size_bytes': 10},
+            'sample': {'blob_name': 'dataframes/x/1/sample.json', 'size_bytes': 5},
+        })
+        self.storage._record_dataframe_manifest(self.csv_file.id, {
+            'csv_compressed': {'blob_name': 'dataframes/x/2/data.csv.gz', 'size_bytes': 12},
+        })
+        artifacts = dict(DataFrameArtifact.objects.filter(csv_file=self.csv_file).values_list('format', 'blob_name'))
+        self.assertEqual(artifacts, {'csv_compressed': 'dataframes/x/2/data.csv.gz',
+                                     'sample': 'dataframes/x/1/sample.json'})
+
+    def test_download_resolves_the_blob_without_listing(self):
+        self.storage._record_dataframe_manifest(self.csv_file.id, {
+            'sample': {'blob_name': 'dataframes/x/1/sample.json'},
+        })
+        df = self.storage.download_dataframe(str(self.csv_file.id), 'sample')
+        self.assertEqual(df['Category'].tolist(), ['Cost'])
+        self.container.list_blobs.assert_not_called()
+        self.container.get_blob_client.assert_called_once_with('dataframes/x/1/sample.json')
+
+    def test_exports_older_than_the_manifest_are_listed_once(self):
+        blobs = []
+        for export in (1, 2):
+            blob = mock.Mock(last_modified=export)
+            blob.name = f'dataframes/{self.csv_file.id}/{export}/sample.json'
+            blobs.append(blob)
+        self.container.list_blobs.return_value = blobs
+        self.storage.download_dataframe(str(self.csv_file.id), 'sample')
+        self.storage.download_dataframe(str(self.csv_file.id), 'sample')
+        self.container.list_blobs.assert_called_once()
+        self.assertEqual(DataFrameArtifact.objects.get(csv_file=self.csv_file).blob_name,
+                         f'dataframes/{self.csv_file.id}/2/sample.json')
+
+
+class BlobClientRegistryTests(SimpleTestCase):
+    key = 'a2V5'
+
+    def test_one_client_per_account_and_process(self):
+        registry = BlobClientRegistry()
+        client = registry.get('account1', self.key)
+        self.assertIs(registry.get('account1', self.key), client)
+        self.assertIsNot(registry.get('account2', self.key), client)
+
+        # Tras un fork el hijo crea sus propios clientes
+        with mock.patch('apps.storage.services.blob_client_registry.os.getpid', return_value=-1):
+            self.assertIsNot(registry.get('account1', self.key), client)
+
+    def test_clients_share_a_sized_connection_pool(self):
+        client = BlobClientRegistry().get('account1', self.key)
+        session = client._pipeline._transport.session
+        self.assertEqual(session.get_adapter('https://account1.blob.core.windows.net')._pool_maxsize,
+                         AZURE_STORAGE_POOL_SIZE)
+        # Los contenedores y blobs reutilizan el pipeline (y el pool) del cliente de servicio
+        blob_client = client.get_blob_client('reports', 'a.pdf')
+        self.assertIs(blob_client._pipeline._transport._transport.session, session)
+
+
+class AsyncBlobStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        settings_override = override_settings(LOCAL_BLOB_STORE_DIR=self.root, AZURE_STORAGE_ACCOUNT_NAME='',
+                                              AZURE_STORAGE_ACCOUNT_KEY='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_local_backend_without_azure(self):
+        storage = get_async_blob_storage()
+        self.assertIsInstance(storage, AsyncLocalBlobStorage)
+        self.assertEqual(storage.root, self.root)
+        self.assertIsInstance(get_async_blob_storage('account1', 'a2V5'), AsyncAzureBlobStorage)
+
+    def test_concurrent_round_trip_on_the_filesystem(self):
+        storage = get_async_blob_storage()
+        names = [f"reports/{i}.pdf" for i in range(20)]
+
+        async def scenario():
+            await gather_bounded(storage.upload('pdfs', name, name.encode()) for name in names)
+            downloads = await gather_bounded(storage.download('pdfs', name) for name in names)
+            listing = await storage.list_blobs('pdfs', prefix='reports/1')
+            deleted = await storage.delete('pdfs', names[0])
+            return downloads, listing, deleted, await storage.exists('pdfs', names[0])
+
+        downloads, listing, deleted, exists = run_blob_io(scenario())
+        self.assertEqual(downloads, [name.encode() for name in names])
+        self.assertEqual(sorted(blob['name'] for blob in listing),
+                         sorted(name for name in names if name.startswith('reports/1')))
+        self.assertTrue(deleted)
+        self.assertFalse(exists)
+        self.assertTrue(os.path.isfile(os.path.join(self.root, 'pdfs', 'reports', '1.pdf')))
+        self.assertFalse(run_blob_io(storage.delete('pdfs', names[0])))
+        with self.assertRaises(ValueError):
+            run_blob_io(storage.download('pdfs', '../outside'))
+
+    def test_gather_bounded_caps_operations_in_flight(self):
+        in_flight, peak = 0, 0
+
+        async def operation(i):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return i
+
+        self.assertEqual(run_blob_io(gather_bounded((operation(i) for i in range(10)), limit=3)), list(range(10)))
+        self.assertEqual(peak, 3)
+
+    def test_storage_info_lists_containers_through_the_async_layer(self):
+        storage = AsyncLocalBlobStorage(self.root)
+        run_blob_io(storage.upload('reports-pdfs', 'a.pdf', b'12345'))
+        run_blob_io(storage.upload('reports-pdfs', 'b.pdf', b'123'))
+
+        service = EnhancedAzureStorageService()
+        service.containers = {'pdfs': 'reports-pdfs', 'data': 'reports-data'}
+        with mock.patch.object(EnhancedAzureStorageService, 'is_available', return_value=True):
+            info = service.get_storage_info()
+
+        self.assertEqual(info['container_stats'], {
+            'pdfs': {'blob_count': 2, 'total_size': 8},
+            'data': {'blob_count': 0, 'total_size': 0},
+        })
+
+
+class RangeHeaderTests(SimpleTestCase):
+
+    def test_full_blob_when_not_a_single_byte_range(self):
+        self.assertIsNone(parse_range_header(None, 100))
+        self.assertIsNone(parse_range_header('', 100))
+        self.assertIsNone(parse_range_header('items=0-10', 100))
+        self.assertIsNone(parse_range_header('bytes=0-10,20-30', 100))
+        self.assertIsNone(parse_range_header('bytes=a-b', 100))
+
+    def test_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range_header('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=90-500', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=-500', 100), (0, 99))
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=100-', 'bytes=50-10', 'bytes=-0'):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range_header(header, 100)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header('bytes=-10', 0)
+
+
+class ETagTests(SimpleTestCase):
+
+    def test_matches(self):
+        self.assertTrue(etag_matches('"0x1"', '"0x1"'))
+        self.assertTrue(etag_matches('"0x0", "0x1"', '"0x1"'))
+        self.assertTrue(etag_matches('W/"0x1"', '"0x1"'))
+        self.assertTrue(etag_matches('"0x1"', 'W/"0x1"'))
+        self.assertTrue(etag_matches('*', '"0x1"'))
+
+    def test_does_not_match(self):
+        self.assertFalse(etag_matches(None, '"0x1"'))
+        self.assertFalse(etag_matches('', '"0x1"'))
+        self.assertFalse(etag_matches('"0x2"', '"0x1"'))
+
+
+class FakeDownloader:
+
+    def __init__(self, data):
+        self.data = data
+
+    def chunks(self):
+        yield self.data
+
+
+class FakeStreamingStorage:
+    """Cliente de blobs en memoria con las llamadas que usa stream_blob_response"""
+
+    def __init__(self, data, etag='0x1'):
+        self.data = data
+        self.etag = etag
+        self.property_reads = 0
+        self.blob_service_client = self
+
+    def get_blob_client(self, container, blob_name):
+        return self
+
+    def get_blob_properties(self):
+        self.property_reads += 1
+        return types.SimpleNamespace(
+            size=len(self.data), etag=self.etag, last_modified=None,
+            content_settings=types.SimpleNamespace(content_type='application/pdf', content_disposition=None)
+        )
+
+    def download_blob(self, offset=0, length=None, etag=None, match_condition=None):
+        if etag != f'"{self.etag}"':
+            raise ValueError('ETag cambiado')
+        end = len(self.data) if length is None else offset + length
+        return FakeDownloader(self.data[offset:end])
+
+
+class StreamBlobResponseTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        report_cache.local.clear()
+        self.storage = FakeStreamingStorage(b'0123456789')
+        self.factory = RequestFactory()
+
+    def respond(self, **headers):
+        request = self.factory.get('/pdf', headers=headers)
+        return stream_blob_response(request, self.storage, 'pdfs', 'a.pdf')
+
+    def test_full_and_partial_downloads(self):
+        response = self.respond()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['ETag'], '"0x1"')
+
+        response = self.respond(Range='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+        self.assertEqual(self.respond(Range='bytes=20-').status_code, 416)
+        # Las propiedades se leyeron una sola vez (quedan en caché)
+        self.assertEqual(self.storage.property_reads, 1)
+
+    def test_repeated_download_is_not_modified(self):
+        response = self.respond(**{'If-None-Match': '"0x1"'})
+        self.assertEqual(response.status_code, 304)
+        # If-Range con otro ETag: se sirve el blob completo
+        response = self.respond(Range='bytes=2-4', **{'If-Range': '"0x0"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_replaced_blob_refreshes_cached_properties(self):
+        self.respond()
+        self.storage.etag = '0x2'
+        response = self.respond()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"0x2"')
+
+
+
+class SASUrlCacheTests(SimpleTestCase):
+    key = 'a2V5'
+
+    def setUp(self):
+        cache.clear()
+        report_cache.local.clear()
+        self.sas = SASUrlCache()
+        patcher = mock.patch.object(SASUrlCache, '_mint', wraps=SASUrlCache._mint)
+        self.mint = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_is_reused_until_close_to_expiry(self):
+        url = self.sas.get_url('account1', self.key, 'pdfs', 'a.pdf', hours=24)
+        self.assertTrue(url.startswith('https://account1.blob.core.windows.net/pdfs/a.pdf?'))
+        self.assertEqual(self.sas.get_url('account1', self.key, 'pdfs', 'a.pdf', hours=24), url)
+        self.assertEqual(self.mint.call_count, 1)
+
+        # Otro blob, permiso o validez es otro token
+        self.sas.get_url('account1', self.key, 'pdfs', 'b.pdf', hours=24)
+        self.sas.get_url('account1', self.key, 'pdfs', 'a.pdf', hours=24, permission='rw')
+        self.sas.get_url('account1', self.key, 'pdfs', 'a.pdf', hours=1)
+        self.assertEqual(self.mint.call_count, 4)
+
+        # Dentro del margen de caducidad se firma uno nuevo
+        late = time.time() + 24 * 3600 - 60
+        with mock.patch('apps.storage.services.sas_cache.time', mock.Mock(time=mock.Mock(return_value=late))):
+            self.sas.get_url('account1', self.key, 'pdfs', 'a.pdf', hours=24)
+        self.assertEqual(self.mint.call_count, 5)
+
+    def test_rotated_key_is_not_served_old_tokens(self):
+        old_url = self.sas.get_url('account1', self.key, 'pdfs', 'a.pdf')
+        new_url = self.sas.get_url('account1', 'bmV3LWtleQ==', 'pdfs', 'a.pdf')
+        self.assertNotEqual(new_url, old_url)
+        self.assertEqual(self.mint.call_count, 2)
+
+    def test_no_url_without_credentials(self):
+        self.assertIsNone(self.sas.get_url('account1', '', 'pdfs', 'a.pdf'))
+        self.mint.assert_not_called()
+
+
+class FilesListTests(TestCase):
+
+    def test_files_are_listed_page_by_page(self):
+        user = User.objects.create(email='files@example.com', username='files')
+        for i in range(3):
+            CSVFile.objects.create(user=user, original_filename=f'{i}.csv', file_size=1)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        first = client.get(reverse('files-list'), {'limit': 2}).data
+        second = client.get(first['next']).data
+        self.assertEqual(len(first['results']), 2)
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        self.assertEqual({row['original_filename'] for row in first['results'] + second['results']},
+                         {'0.csv', '1.csv', '2.csv'})
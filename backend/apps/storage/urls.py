@@ -1,10 +1,13 @@
 # apps/storage/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FilesListView, FileUploadViewWithRealAnalysis
+from .views import FilesListView, FileUploadViewWithRealAnalysis, FileStatusView, FileProgressView, FileDeltaView
 
 # No usar router para APIView, solo para ViewSets
 urlpatterns = [
     path('', FilesListView.as_view(), name='files-list'),
     path('upload/', FileUploadViewWithRealAnalysis.as_view(), name='file-upload'),
+    path('<uuid:file_id>/status/', FileStatusView.as_view(), name='file-status'),
+    path('<uuid:file_id>/progress/', FileProgressView.as_view(), name='file-progress'),
+    path('<uuid:file_id>/delta/', FileDeltaView.as_view(), name='file-delta'),
 ]
\ No newline at end of file
@@ -4,11 +4,24 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import NotFound
+from apps.core.pagination import KeysetPagination
 from apps.reports.models import CSVFile
 from rest_framework import serializers
 from django.utils import timezone
-from apps.reports.analyzers.csv_analyzer import analyze_csv_content
-import pandas as pd
+from django.conf import settings
+from django.urls import reverse
+from apps.reports.analyzers.csv_analyzer import analyze_csv_stream
+from apps.reports.analyzers.advisor_snapshot import get_snapshot_path
+from apps.reports.analyzers.advisor_delta import (
+    DELTA_ON_UPLOAD, attach_advisor_delta, compute_advisor_delta, get_stored_delta
+)
+from apps.storage.services.upload_staging import stage_uploaded_file
+from apps.storage.services.content_index import (
+    ContentHashUploadHandler, get_upload_content_hash, find_processed_duplicate, reuse_processed_csv
+)
+from apps.storage.services.passthrough_upload import PassThroughUploadHandler, PassThroughUploadedFile
+from apps.reports.utils.progress import ProgressReporter, get_progress_for_user
 import logging
 import uuid
 import csv
@@ -24,16 +37,37 @@ class CSVFileSerializer(serializers.ModelSerializer):
             'rows_count', 'columns_count', 'analysis_data', 'upload_date'
         ]
 
+class AdvisorDeltaSerializer(serializers.Serializer):
+    """Delta entre dos exports (ver AdvisorDelta.to_dict)"""
+    version = serializers.IntegerField()
+    key_columns = serializers.ListField(child=serializers.CharField())
+    counts = serializers.DictField(child=serializers.IntegerField())
+    by_category = serializers.DictField()
+    by_impact = serializers.DictField()
+    annual_savings = serializers.DictField()
+    top_added = serializers.ListField(child=serializers.DictField())
+    top_resolved = serializers.ListField(child=serializers.DictField())
+    previous_file_id = serializers.CharField()
+    previous_filename = serializers.CharField()
+    previous_upload_date = serializers.CharField()
+    computed_at = serializers.CharField()
+
+class CSVFileKeysetPagination(KeysetPagination):
+    ordering_fields = ('upload_date',)
+    default_ordering = '-upload_date'
+
+
 class FilesListView(APIView):
-    """Vista que lista CSVFiles para el frontend"""
+    """Vista que lista CSVFiles para el frontend (paginada por cursor sobre (upload_date, id))"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         try:
             user = request.user
             
-            # Obtener CSVFiles usando el campo correcto
-            csv_files = CSVFile.objects.filter(user=user).order_by('-upload_date')
+            # Solo la página pedida (?limit= y ?cursor=), sin recorrer todos los archivos del usuario
+            paginator = CSVFileKeysetPagination()
+            csv_files = paginator.paginate_queryset(CSVFile.objects.filter(user=user), request, view=self)
             
             files_data = []
             
@@ -56,20 +90,30 @@ class FilesListView(APIView):
             
             logger.info(f"Devolviendo {len(files_data)} archivos para el usuario {user.username}")
             
-            return Response({
-                'results': files_data,
-                'count': len(files_data)
-            })
+            return paginator.get_paginated_response(files_data)
             
+        except NotFound:
+            raise
         except Exception as e:
             logger.error(f"Error obteniendo archivos: {str(e)}")
             return Response({
                 'results': [],
-                'count': 0,
+                'next': None,
+                'previous': None,
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def build_analysis_summary(analysis_results):
+    """Métricas clave del análisis que se devuelven al frontend"""
+    return {
+        'total_recommendations': analysis_results.get('basic_metrics', {}).get('total_recommendations', 0),
+        'categories_found': list(analysis_results.get('category_analysis', {}).get('counts', {}).keys()),
+        'data_quality_score': analysis_results.get('basic_metrics', {}).get('data_quality_score', 0),
+        'estimated_monthly_savings': analysis_results.get('dashboard_metrics', {}).get('estimated_monthly_optimization', 0)
+    }
+
+
 class FileUploadViewWithRealAnalysis(APIView):
     """
     Vista de upload modificada para realizar análisis real del CSV inmediatamente
@@ -81,25 +125,39 @@ class FileUploadViewWithRealAnalysis(APIView):
         try:
             logger.info(f"Upload con análisis real - usuario: {request.user.username}")
             
+            # Pass-through: los handlers se cambian antes de leer el cuerpo de la petición
+            if self._wants_passthrough(request):
+                request._request.upload_handlers = [
+                    ContentHashUploadHandler(request._request),
+                    PassThroughUploadHandler(request._request),
+                ]
+            
             # Verificar archivo
             uploaded_file = request.FILES.get('file')
+            rejection = getattr(request._request, 'upload_rejection', None)
+            if rejection:
+                return Response({'error': rejection}, status=status.HTTP_400_BAD_REQUEST)
             if not uploaded_file:
                 return Response({
                     'error': 'No se recibió ningún archivo'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Validar CSV
-            if not uploaded_file.name.lower().endswith('.csv'):
-                return Response({
-                    'error': 'Solo se permiten archivos CSV'
-                }, status=status.HTTP_400_BAD_REQUEST)
+            if isinstance(uploaded_file, PassThroughUploadedFile):
+                return self._complete_passthrough(request, uploaded_file)
             
-            # Validar tamaño (50MB max)
-            max_size = 50 * 1024 * 1024
-            if uploaded_file.size > max_size:
-                return Response({
-                    'error': 'El archivo debe ser menor a 50MB'
-                }, status=status.HTTP_400_BAD_REQUEST)
+            validation_error = self._validate_upload(uploaded_file)
+            if validation_error:
+                return validation_error
+            
+            # Mismo contenido ya procesado: se reutiliza el análisis sin volver a parsear
+            content_hash = get_upload_content_hash(request, uploaded_file)
+            duplicate = find_processed_duplicate(content_hash, request.user)
+            if duplicate is not None:
+                return self._reuse_duplicate(request, uploaded_file, content_hash, duplicate)
+            
+            # Modo asíncrono: el análisis se hace en un worker y la petición no depende del tamaño
+            if self._wants_async(request):
+                return self._enqueue_processing(request, uploaded_file, content_hash)
             
             logger.info(f"Procesando CSV con análisis real: {uploaded_file.name}")
             
@@ -109,31 +167,34 @@ class FileUploadViewWithRealAnalysis(APIView):
                 original_filename=uploaded_file.name,
                 file_size=uploaded_file.size,
                 content_type=uploaded_file.content_type or 'text/csv',
+                content_hash=content_hash,
                 processing_status='processing'
             )
             
             try:
-                # Leer contenido del archivo
-                file_content = uploaded_file.read().decode('utf-8-sig')
+                # Una sola pasada en streaming sobre el archivo subido (sin decodificarlo completo en memoria);
+                # la misma pasada deja el snapshot Parquet para las lecturas posteriores
+                logger.info("Iniciando análisis completo del CSV en streaming...")
+                analysis_results = analyze_csv_stream(uploaded_file, snapshot_path=get_snapshot_path(csv_file.id))
+                if 'error' in analysis_results:
+                    raise ValueError(analysis_results['error'])
                 
-                # Análisis básico con pandas para validar
-                df = pd.read_csv(io.StringIO(file_content))
-                csv_file.rows_count = len(df)
-                csv_file.columns_count = len(df.columns)
+                csv_file.rows_count = analysis_results['metadata']['rows_read']
+                csv_file.columns_count = analysis_results['metadata']['csv_columns']
                 
-                logger.info(f"CSV básico procesado: {len(df)} filas, {len(df.columns)} columnas")
+                logger.info(f"CSV procesado: {csv_file.rows_count} filas, {csv_file.columns_count} columnas")
                 
                 # ANÁLISIS REAL usando el nuevo servicio
                 try:
-                    logger.info("Iniciando análisis completo del CSV...")
-                    analysis_results = analyze_csv_content(file_content)
-                    
                     # Guardar resultados del análisis
                     csv_file.analysis_data = analysis_results
                     csv_file.processing_status = 'completed'
                     csv_file.processed_date = timezone.now()
                     csv_file.save()
                     
+                    if DELTA_ON_UPLOAD:
+                        attach_advisor_delta(csv_file)
+                    
                     logger.info(f"Análisis completo exitoso para {uploaded_file.name}")
                     
                     # Preparar respuesta con análisis incluido
@@ -148,12 +209,7 @@ class FileUploadViewWithRealAnalysis(APIView):
                         'processed_date': csv_file.processed_date.isoformat(),
                         
                         # Incluir métricas clave del análisis
-                        'analysis_summary': {
-                            'total_recommendations': analysis_results.get('basic_metrics', {}).get('total_recommendations', 0),
-                            'categories_found': list(analysis_results.get('category_analysis', {}).get('counts', {}).keys()),
-                            'data_quality_score': analysis_results.get('basic_metrics', {}).get('data_quality_score', 0),
-                            'estimated_monthly_savings': analysis_results.get('dashboard_metrics', {}).get('estimated_monthly_optimization', 0)
-                        },
+                        'analysis_summary': build_analysis_summary(analysis_results),
                         
                         'message': '¡Archivo procesado y analizado exitosamente! Los datos reales ya están disponibles en el dashboard.'
                     }
@@ -166,8 +222,8 @@ class FileUploadViewWithRealAnalysis(APIView):
                     # Guardar con análisis básico en caso de error del análisis avanzado
                     csv_file.analysis_data = {
                         'basic_metrics': {
-                            'total_recommendations': len(df),
-                            'total_columns': len(df.columns),
+                            'total_recommendations': csv_file.rows_count or 0,
+                            'total_columns': csv_file.columns_count or 0,
                             'data_quality_score': 75.0,
                             'last_updated': timezone.now().isoformat()
                         },
@@ -201,4 +257,250 @@ class FileUploadViewWithRealAnalysis(APIView):
             logger.error(f"Error general en upload: {str(e)}")
             return Response({
                 'error': f'Error interno: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def _validate_upload(self, uploaded_file):
+        """Validar extensión y tamaño; devuelve la respuesta de error o None"""
+        # Validar CSV
+        if not uploaded_file.name.lower().endswith('.csv'):
+            return Response({
+                'error': 'Solo se permiten archivos CSV'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Validar tamaño (el análisis es streaming, la memoria no depende del tamaño)
+        max_size = getattr(settings, 'MAX_UPLOAD_FILE_SIZE', 500 * 1024 * 1024)
+        if uploaded_file.size > max_size:
+            return Response({
+                'error': f'El archivo debe ser menor a {max_size // (1024 * 1024)}MB'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return None
+    
+    def _wants_passthrough(self, request):
+        """Modo pass-through con ?mode=passthrough, o por defecto según CSV_PASSTHROUGH_UPLOAD"""
+        mode = request.query_params.get('mode')
+        if mode is None:
+            return getattr(settings, 'CSV_PASSTHROUGH_UPLOAD', False)
+        return mode == 'passthrough'
+    
+    def _complete_passthrough(self, request, uploaded_file):
+        """
+        Registrar un upload pass-through: el archivo ya está en el block blob y el
+        análisis y el snapshot se calcularon mientras llegaban los chunks (la
+        extensión y el tamaño ya los validó PassThroughUploadHandler)
+        """
+        content_hash = get_upload_content_hash(request, uploaded_file)
+        duplicate = find_processed_duplicate(content_hash, request.user)
+        if duplicate is not None:
+            uploaded_file.discard()
+            return self._reuse_duplicate(request, uploaded_file, content_hash, duplicate)
+        
+        analysis_results = uploaded_file.analysis_results
+        if not analysis_results or 'error' in analysis_results:
+            uploaded_file.discard()
+            error = (analysis_results or {}).get('error', 'Análisis no disponible')
+            logger.error(f"Error procesando CSV pass-through: {error}")
+            return Response({
+                'error': f'Error procesando archivo: {error}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        csv_file = CSVFile.objects.create(
+            id=uploaded_file.csv_file_id,
+            user=request.user,
+            original_filename=uploaded_file.name,
+            file_size=uploaded_file.size,
+            content_type=uploaded_file.content_type or 'text/csv',
+            content_hash=content_hash,
+            azure_blob_url=uploaded_file.blob_url,
+            azure_blob_name=uploaded_file.blob_name,
+            rows_count=analysis_results['metadata']['rows_read'],
+            columns_count=analysis_results['metadata']['csv_columns'],
+            analysis_data=analysis_results,
+            processing_status='completed',
+            processed_date=timezone.now()
+        )
+        
+        if DELTA_ON_UPLOAD:
+            attach_advisor_delta(csv_file)
+        
+        logger.info(f"Upload pass-through registrado: {csv_file.id} -> {uploaded_file.blob_name}")
+        return Response({
+            'id': str(csv_file.id),
+            'original_filename': csv_file.original_filename,
+            'file_size': csv_file.file_size,
+            'status': csv_file.processing_status,
+            'rows_count': csv_file.rows_count,
+            'columns_count': csv_file.columns_count,
+            'upload_date': csv_file.upload_date.isoformat(),
+            'processed_date': csv_file.processed_date.isoformat(),
+            'analysis_summary': build_analysis_summary(analysis_results),
+            'message': '¡Archivo procesado y analizado exitosamente! Los datos reales ya están disponibles en el dashboard.'
+        }, status=status.HTTP_201_CREATED)
+    
+    def _wants_async(self, request):
+        """Modo asíncrono si se pide con ?async=true (o campo 'async'), o por defecto según CSV_ASYNC_UPLOAD"""
+        value = request.query_params.get('async', request.data.get('async'))
+        if value is None:
+            return getattr(settings, 'CSV_ASYNC_UPLOAD', False)
+        return str(value).lower() in ('1', 'true', 'yes')
+    
+    def _reuse_duplicate(self, request, uploaded_file, content_hash, duplicate):
+        """Crear el CSVFile reutilizando el análisis, snapshot y blobs de un upload idéntico"""
+        csv_file = CSVFile.objects.create(
+            user=request.user,
+            original_filename=uploaded_file.name,
+            file_size=uploaded_file.size,
+            content_type=uploaded_file.content_type or 'text/csv',
+            content_hash=content_hash,
+            processing_status='processing'
+        )
+        reuse_processed_csv(csv_file, duplicate)
+        if DELTA_ON_UPLOAD:
+            attach_advisor_delta(csv_file)
+        
+        return Response({
+            'id': str(csv_file.id),
+            'original_filename': csv_file.original_filename,
+            'file_size': csv_file.file_size,
+            'status': csv_file.processing_status,
+            'rows_count': csv_file.rows_count,
+            'columns_count': csv_file.columns_count,
+            'upload_date': csv_file.upload_date.isoformat(),
+            'processed_date': csv_file.processed_date.isoformat(),
+            'analysis_summary': build_analysis_summary(csv_file.analysis_data),
+            'deduplicated': True,
+            'message': 'Este archivo ya había sido analizado; se reutilizó el análisis existente.'
+        }, status=status.HTTP_201_CREATED)
+    
+    def _enqueue_processing(self, request, uploaded_file, content_hash=''):
+        """Guardar el archivo en staging, encolar process_csv_file y responder 202"""
+        from apps.reports.tasks import process_csv_file
+        
+        csv_file = CSVFile.objects.create(
+            user=request.user,
+            original_filename=uploaded_file.name,
+            file_size=uploaded_file.size,
+            content_type=uploaded_file.content_type or 'text/csv',
+            content_hash=content_hash,
+            processing_status='pending'
+        )
+        
+        try:
+            staged_path = stage_uploaded_file(uploaded_file, csv_file.id)
+        except Exception as e:
+            logger.error(f"Error guardando archivo en staging: {str(e)}")
+            csv_file.processing_status = 'failed'
+            csv_file.error_message = str(e)
+            csv_file.save(update_fields=['processing_status', 'error_message'])
+            return Response({
+                'error': f'Error guardando archivo: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        # Estado inicial para que el primer sondeo ya tenga respuesta
+        ProgressReporter('csv', csv_file.id, user_id=request.user.id).update('queued', total_bytes=csv_file.file_size)
+        
+        try:
+            task = process_csv_file.delay(str(csv_file.id), staged_path)
+            logger.info(f"CSV {csv_file.id} encolado para análisis (task {task.id})")
+        except Exception as e:
+            # Sin broker disponible: procesar en la propia petición para no perder el upload
+            logger.warning(f"⚠️ No se pudo encolar el análisis, procesando en línea: {str(e)}")
+            task = process_csv_file.apply(args=[str(csv_file.id), staged_path])
+            csv_file.refresh_from_db()
+        
+        status_url = request.build_absolute_uri(reverse('file-status', args=[csv_file.id]))
+        return Response({
+            'id': str(csv_file.id),
+            'original_filename': csv_file.original_filename,
+            'file_size': csv_file.file_size,
+            'status': csv_file.processing_status,
+            'task_id': task.id,
+            'status_url': status_url,
+            'progress_url': request.build_absolute_uri(reverse('file-progress', args=[csv_file.id])),
+            'message': 'Archivo recibido. El análisis se está procesando en segundo plano.'
+        }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+
+class FileStatusView(APIView):
+    """Estado del procesamiento de un CSVFile (recurso que consulta el frontend tras un upload asíncrono)"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, file_id):
+        csv_file = CSVFile.objects.filter(id=file_id, user=request.user).first()
+        if csv_file is None:
+            return Response({'error': 'Archivo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        
+        response_data = {
+            'id': str(csv_file.id),
+            'original_filename': csv_file.original_filename,
+            'status': csv_file.processing_status,
+            'rows_count': csv_file.rows_count,
+            'columns_count': csv_file.columns_count,
+            'upload_date': csv_file.upload_date.isoformat(),
+            'processed_date': csv_file.processed_date.isoformat() if csv_file.processed_date else None,
+        }
+        
+        if csv_file.processing_status == 'completed':
+            response_data['analysis_summary'] = build_analysis_summary(csv_file.analysis_data or {})
+        elif csv_file.processing_status == 'failed':
+            response_data['error'] = csv_file.error_message
+        
+        return Response(response_data)
+
+
+class FileProgressView(APIView):
+    """Progreso fino del análisis de un CSVFile (se lee de caché, sin consultar la tabla de archivos)"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, file_id):
+        state = get_progress_for_user('csv', file_id, request.user)
+        if state is None:
+            return Response({
+                'id': str(file_id),
+                'status': 'unknown',
+                'message': 'No hay progreso registrado para este archivo'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(state)
+
+
+class FileDeltaView(APIView):
+    """
+    Cambios de un CSVFile respecto a otro export del mismo usuario
+    (por defecto el anterior; ?against=<id> para elegir otro)
+    
+    Solo lectura: el delta guardado es el que se calculó al subir el archivo
+    contra su export anterior; cualquier otra comparación se calcula al vuelo
+    sin guardarse.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, file_id):
+        csv_file = CSVFile.objects.filter(id=file_id, user=request.user).first()
+        if csv_file is None:
+            return Response({'error': 'Archivo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        
+        previous = None
+        against = request.query_params.get('against')
+        if against:
+            try:
+                previous = CSVFile.objects.filter(id=uuid.UUID(against), user=request.user).first()
+            except ValueError:
+                previous = None
+            if previous is None:
+                return Response({'error': 'Archivo de comparación no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        
+        delta = get_stored_delta(csv_file.analysis_data, previous.id if previous else None)
+        if delta is None and csv_file.processing_status == 'completed':
+            try:
+                delta = compute_advisor_delta(csv_file, previous)
+            except Exception as e:
+                logger.error(f"Error calculando el delta de {csv_file.id}: {e}")
+                delta = None
+        
+        if delta is None:
+            return Response({
+                'id': str(csv_file.id),
+                'message': 'No hay un export anterior con el que comparar este archivo'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({'id': str(csv_file.id), 'delta': AdvisorDeltaSerializer(delta).data})
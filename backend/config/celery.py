@@ -1,6 +1,8 @@
 # config/celery.py
 import os
+import logging
 from celery import Celery
+from celery.signals import worker_process_init
 from django.conf import settings
 
 # Establecer el módulo de configuración de Django para Celery
@@ -14,6 +16,19 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Autodiscovery de tareas en las apps
 app.autodiscover_tasks()
 
+@worker_process_init.connect
+def warm_pdf_renderer(**kwargs):
+    """Preparar el render de PDFs en cada proceso worker"""
+    try:
+        from apps.storage.services.pdf_generator_service import PDF_GENERATORS, pdf_render_pool, weasyprint_renderer
+        # El worker ya es un proceso aparte del web: renderiza en el propio proceso
+        pdf_render_pool.enabled = False
+        # Cargar fuentes y hoja de estilos de WeasyPrint al arrancar
+        if PDF_GENERATORS.get('weasyprint') and getattr(settings, 'PDF_RENDERER_WARMUP', True):
+            weasyprint_renderer.warm()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"No se pudo preparar el renderer PDF: {e}")
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
@@ -238,6 +238,9 @@ if USE_AZURE_STORAGE:
     AZURE_STORAGE_ACCOUNT_NAME = config('AZURE_STORAGE_ACCOUNT_NAME', default='')
     AZURE_STORAGE_ACCOUNT_KEY = config('AZURE_STORAGE_ACCOUNT_KEY', default='')
     AZURE_STORAGE_CONTAINER_NAME = config('AZURE_STORAGE_CONTAINER_NAME', default='reports')
+    AZURE_STORAGE_POOL_SIZE = config('AZURE_STORAGE_POOL_SIZE', default=20, cast=int)  # Conexiones HTTP por proceso (cliente compartido)
+    AZURE_STORAGE_MAX_CONCURRENCY = config('AZURE_STORAGE_MAX_CONCURRENCY', default=4, cast=int)  # Bloques en paralelo por subida/descarga
+    AZURE_STORAGE_RETRY_TOTAL = config('AZURE_STORAGE_RETRY_TOTAL', default=5, cast=int)
     
     # Verificar que las credenciales estén configuradas
     if not AZURE_STORAGE_ACCOUNT_NAME or not AZURE_STORAGE_ACCOUNT_KEY:
@@ -389,6 +392,11 @@ X_FRAME_OPTIONS = 'DENY'
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+FILE_UPLOAD_HANDLERS = [
+    'apps.storage.services.content_index.ContentHashUploadHandler',  # Hash del contenido durante la subida
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
 FILE_UPLOAD_PERMISSIONS = 0o644
 
@@ -403,8 +411,25 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@azurereports.
 
 # Report generation settings
 MAX_CSV_ROWS = config('MAX_CSV_ROWS', default=100000, cast=int)
+MAX_UPLOAD_FILE_SIZE = config('MAX_UPLOAD_FILE_SIZE', default=500 * 1024 * 1024, cast=int)  # 500MB
+CSV_ANALYSIS_CHUNK_SIZE = config('CSV_ANALYSIS_CHUNK_SIZE', default=50000, cast=int)  # Filas por chunk
+ADVISOR_SNAPSHOT_DIR = config('ADVISOR_SNAPSHOT_DIR', default=str(MEDIA_ROOT / 'snapshots'))  # Snapshots Parquet por CSV
+UPLOAD_STAGING_DIR = config('UPLOAD_STAGING_DIR', default=str(MEDIA_ROOT / 'staging'))  # Uploads pendientes de análisis
+CSV_ASYNC_UPLOAD = config('CSV_ASYNC_UPLOAD', default=False, cast=bool)  # Analizar uploads en Celery por defecto
+CSV_DELTA_ON_UPLOAD = config('CSV_DELTA_ON_UPLOAD', default=True, cast=bool)  # Delta contra el export anterior
+CSV_PASSTHROUGH_UPLOAD = config('CSV_PASSTHROUGH_UPLOAD', default=False, cast=bool)  # Upload directo a block blob + parser
+LOCAL_BLOB_STORE_DIR = config('LOCAL_BLOB_STORE_DIR', default=str(MEDIA_ROOT / 'blobs'))  # Sustituto local de Azure
 REPORT_TIMEOUT = config('REPORT_TIMEOUT', default=300, cast=int)  # 5 minutos
 PDF_MAX_PAGES = config('PDF_MAX_PAGES', default=50, cast=int)
+PDF_RENDERER_WARMUP = config('PDF_RENDERER_WARMUP', default=True, cast=bool)  # Cargar fuentes/CSS de WeasyPrint al arrancar cada worker
+PDF_RENDER_POOL_SIZE = config('PDF_RENDER_POOL_SIZE', default=2, cast=int)  # Procesos de render por proceso web (0 = en el propio proceso)
+PDF_ASYNC_GENERATION = config('PDF_ASYNC_GENERATION', default=False, cast=bool)  # generate-pdf devuelve un job (202) por defecto
+PDF_BATCH_CONCURRENCY = config('PDF_BATCH_CONCURRENCY', default=4, cast=int)  # Reportes de un lote generándose a la vez
+PDF_BATCH_MAX_REPORTS = config('PDF_BATCH_MAX_REPORTS', default=100, cast=int)
+REPORT_PIPELINE_WORKERS = config('REPORT_PIPELINE_WORKERS', default=2, cast=int)  # Etapas de un reporte en paralelo (PDF y DataFrame)
+DATAFRAME_EXPORT_CHUNK_ROWS = config('DATAFRAME_EXPORT_CHUNK_ROWS', default=20000, cast=int)  # Filas serializadas de cada vez al exportar DataFrames a Azure
+BLOB_PROPERTIES_TIMEOUT = config('BLOB_PROPERTIES_TIMEOUT', default=600, cast=int)  # Caché de tamaño/ETag de los blobs servidos por streaming
+SAS_EXPIRY_MARGIN = config('SAS_EXPIRY_MARGIN', default=3600, cast=int)  # Vida mínima restante para reutilizar un SAS token
 
 # Analytics
 ENABLE_ANALYTICS = config('ENABLE_ANALYTICS', default=True, cast=bool)
@@ -412,6 +437,7 @@ ANALYTICS_RETENTION_DAYS = config('ANALYTICS_RETENTION_DAYS', default=90, cast=i
 
 # Configuraciones para reportes mejorados
 REPORT_CACHE_TIMEOUT = 3600  # 1 hora
+TASK_PROGRESS_TIMEOUT = config('TASK_PROGRESS_TIMEOUT', default=3600, cast=int)  # Vida del progreso publicado en caché
 REPORT_MAX_CSV_SIZE = 10 * 1024 * 1024  # 10MB
 REPORT_ALLOWED_FORMATS = ['csv', 'xlsx']
 
@@ -425,3 +451,11 @@ CACHES = {
         }
     }
 }
+
+# Caché de reportes en dos niveles (ver apps/reports/utils/tiered_cache.py)
+REPORT_LOCAL_CACHE_MAX_BYTES = config('REPORT_LOCAL_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)  # LRU por proceso
+REPORT_LOCAL_CACHE_TTL = config('REPORT_LOCAL_CACHE_TTL', default=300, cast=int)
+REPORT_CACHE_LOCK_TIMEOUT = config('REPORT_CACHE_LOCK_TIMEOUT', default=120, cast=int)  # Render más largo esperado
+REPORT_CACHE_GENERATION_TTL = config('REPORT_CACHE_GENERATION_TTL', default=5, cast=int)  # Retraso máximo de una invalidación entre procesos
+REPORT_CACHE_GENERATION_TIMEOUT = config('REPORT_CACHE_GENERATION_TIMEOUT', default=24 * 3600, cast=int)  # Vida de los contadores de generación (> REPORT_CACHE_TIMEOUT)
+PDF_ARTIFACT_INDEX_TIMEOUT = config('PDF_ARTIFACT_INDEX_TIMEOUT', default=24 * 3600, cast=int)  # Índice de PDFs por contenido (ver pdf_artifact_cache.py)
@@ -4,6 +4,33 @@ import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { fetchWithAuth, buildApiUrl } from '../config/api';
 import toast from 'react-hot-toast';
 
+// Filas por página al recorrer un listado paginado por cursor (máximo del backend)
+const PAGE_LIMIT = 100;
+
+// Listado paginado por cursor: con params.limit solo esa página; si no, sigue `next` hasta el final
+const fetchPaginatedList = async (endpoint, params = {}) => {
+  const searchParams = new URLSearchParams({ limit: PAGE_LIMIT, ...params });
+  let url = buildApiUrl(endpoint) + `?${searchParams}`;
+  const results = [];
+
+  while (url) {
+    const response = await fetchWithAuth(url);
+
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+
+    const data = await response.json();
+    if (Array.isArray(data)) {
+      return data;
+    }
+    results.push(...(data?.results || []));
+    url = params.limit ? null : data?.next;
+  }
+
+  return results;
+};
+
 // 📁 SERVICIO DE ARCHIVOS
 const fileService = {
   async uploadFile(file) {
@@ -35,19 +62,10 @@ const fileService = {
 
   async getFiles(params = {}) {
     try {
-      const searchParams = new URLSearchParams(params);
-      const url = buildApiUrl('/files/') + `?${searchParams}`;
-      
-      console.log('📁 Fetching files from:', url);
-      const response = await fetchWithAuth(url);
-      
-      if (!response.ok) {
-        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-      }
-      
-      const data = await response.json();
-      console.log('✅ Files loaded:', data);
-      return data?.results || data || [];
+      console.log('📁 Fetching files:', params);
+      const files = await fetchPaginatedList('/files/', params);
+      console.log('✅ Files loaded:', files);
+      return files;
       
     } catch (error) {
       console.error('❌ Error loading files:', error);
@@ -103,19 +121,10 @@ const reportService = {
 
   async getReports(params = {}) {
     try {
-      const searchParams = new URLSearchParams(params);
-      const url = buildApiUrl('/reports/') + `?${searchParams}`;
-      
-      console.log('📋 Fetching reports from:', url);
-      const response = await fetchWithAuth(url);
-      
-      if (!response.ok) {
-        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-      }
-      
-      const data = await response.json();
-      console.log('✅ Reports loaded:', data);
-      return data?.results || data || [];
+      console.log('📋 Fetching reports:', params);
+      const reports = await fetchPaginatedList('/reports/', params);
+      console.log('✅ Reports loaded:', reports);
+      return reports;
       
     } catch (error) {
       console.error('❌ Error loading reports:', error);